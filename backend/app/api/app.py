@@ -16,6 +16,9 @@ from ..routes.ai_structure import router as ai_structure_router
 from ..routes.analyse import router as analyse_router
 from ..routes.backup import router as backup_router
 from .endpoints import health_router
+from .compression import CompressionMiddleware
+from .archive_session import ArchiveSessionMiddleware
+from ..config import COMPRESSION_MIN_SIZE, COMPRESSION_LEVEL
 
 # Configuration du logger
 logger = logging.getLogger("toolbox.api")
@@ -44,6 +47,16 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Compression des réponses négociée avec Accept-Encoding (flux compris)
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=COMPRESSION_MIN_SIZE,
+        compresslevel=COMPRESSION_LEVEL,
+    )
+
+    # Archives zip/tar ouvertes une seule fois par requête
+    app.add_middleware(ArchiveSessionMiddleware)
+
     # Middleware pour logger les requêtes
     @app.middleware("http")
     async def log_requests(request: Request, call_next):
@@ -0,0 +1,26 @@
+"""
+Session d'archives couvrant chaque requête HTTP
+"""
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..utils.archives import archive_session
+
+
+class ArchiveSessionMiddleware:
+    """
+    Garde les archives zip/tar ouvertes le temps d'une requête.
+
+    Les membres d'une même archive lus pendant la requête (scan, lecture,
+    réponse en flux comprise) partagent une seule ouverture de l'archive et
+    une seule lecture de son index.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with archive_session():
+            await self.app(scope, receive, send)
@@ -0,0 +1,205 @@
+"""
+Compression des réponses HTTP (gzip, deflate) négociée avec Accept-Encoding
+"""
+import zlib
+import logging
+from typing import Dict, Optional, Tuple
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.compression")
+
+# Codecs proposés, par ordre de préférence à qualité égale (wbits zlib : 31 = gzip, 15 = zlib/deflate HTTP)
+SUPPORTED_ENCODINGS: Dict[str, int] = {"gzip": 31, "deflate": 15}
+
+# Types déjà compressés (archives de sauvegarde, médias) ou diffusés en continu
+EXCLUDED_CONTENT_TYPES = frozenset({
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-7z-compressed",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/zstd",
+    "application/octet-stream",
+    "text/event-stream",
+    "font/woff",
+    "font/woff2",
+})
+EXCLUDED_CONTENT_FAMILIES = ("image/", "audio/", "video/")
+
+# Au-delà de cette taille, un corps complet est compressé hors de la boucle d'événements
+THREAD_MINIMUM_SIZE = 256 * 1024
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Choisit le codec à utiliser d'après l'en-tête Accept-Encoding (valeurs q comprises).
+
+    Args:
+        accept_encoding: Valeur de l'en-tête
+
+    Returns:
+        "gzip", "deflate", ou None si aucun codec supporté n'est accepté
+    """
+    qualities: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+
+    best: Tuple[float, int, Optional[str]] = (0.0, 0, None)
+    for rank, encoding in enumerate(SUPPORTED_ENCODINGS):
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        candidate = (quality, -rank, encoding)
+        if quality > 0 and candidate > best:
+            best = candidate
+    return best[2]
+
+
+def _is_excluded(headers: Headers) -> bool:
+    # Fichier servi avec reprise (FileResponse) : compresser supprimerait Content-Length
+    # et fausserait les positions des requêtes Range
+    if "accept-ranges" in headers or "content-range" in headers:
+        return True
+    media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+    return media_type in EXCLUDED_CONTENT_TYPES or media_type.startswith(EXCLUDED_CONTENT_FAMILIES)
+
+
+class CompressionMiddleware:
+    """
+    Compresse les réponses selon le codec négocié.
+
+    - les petites réponses (moins de minimum_size octets) sont envoyées telles quelles ;
+    - les réponses en flux (StreamingResponse) sont compressées morceau par
+      morceau, chaque morceau étant vidé (Z_SYNC_FLUSH) pour être reçu sans attendre ;
+    - les réponses déjà encodées, partielles (206), sans corps ou d'un type déjà
+      compressé (zip, gzip, images...) ne sont pas modifiées, ni les fichiers
+      servis avec support de Range (FileResponse : Accept-Ranges), qui gardent
+      leur Content-Length et l'envoi par sendfile/pathsend.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, compresslevel: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.minimum_size, self.compresslevel)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Intercepte les messages ASGI d'une réponse et compresse son corps."""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int, compresslevel: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.start_message: Optional[Message] = None
+        # None tant que la décision n'est pas prise, puis True (compresser) ou False (transmettre)
+        self.compressing: Optional[bool] = None
+        self.compressor = None
+
+    def _new_compressor(self):
+        return zlib.compressobj(self.compresslevel, zlib.DEFLATED, SUPPORTED_ENCODINGS[self.encoding])
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            status = message["status"]
+            if (
+                "content-encoding" in headers
+                or status in (204, 206, 304)
+                or status < 200
+                or _is_excluded(headers)
+            ):
+                self.compressing = False
+                await self._send(message)
+            else:
+                # Attendre le premier morceau du corps pour décider
+                self.start_message = message
+            return
+
+        if self.compressing is False:
+            await self._send(message)
+            return
+
+        if message_type != "http.response.body":
+            # pathsend (sendfile) ou autre extension : le fichier part tel quel
+            self.compressing = False
+            await self._send(self.start_message)
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressing is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+
+            if not more_body:
+                if len(body) < self.minimum_size:
+                    self.compressing = False
+                    await self._send(self.start_message)
+                    await self._send(message)
+                    return
+                if len(body) >= THREAD_MINIMUM_SIZE:
+                    compressed = await anyio.to_thread.run_sync(self._compress_all, body)
+                else:
+                    compressed = self._compress_all(body)
+                headers["Content-Encoding"] = self.encoding
+                headers["Content-Length"] = str(len(compressed))
+                self.compressing = True
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": compressed, "more_body": False})
+                return
+
+            # Réponse en flux : taille inconnue, compression au fil de l'eau
+            headers["Content-Encoding"] = self.encoding
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            self.compressing = True
+            self.compressor = self._new_compressor()
+            await self._send(self.start_message)
+
+        if self.compressor is None:
+            return
+
+        chunk = self.compressor.compress(body)
+        if more_body:
+            chunk += self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            chunk += self.compressor.flush(zlib.Z_FINISH)
+            self.compressor = None
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _compress_all(self, body: bytes) -> bytes:
+        compressor = self._new_compressor()
+        return compressor.compress(body) + compressor.flush(zlib.Z_FINISH)
@@ -25,5 +25,41 @@ API_PORT = int(os.getenv("API_PORT", 8000))
 TEMP_DIR = BASE_DIR / "temp"
 TEMP_DIR.mkdir(exist_ok=True)
 
+# Lecture parallèle des fichiers (format-content)
+# Nombre de threads de lecture (1 = lecture séquentielle)
+READ_WORKERS = int(os.getenv("READ_WORKERS", 8))
+# Volume maximal de données lues en avance et pas encore émises (64 MB par défaut)
+READ_MAX_INFLIGHT_BYTES = int(os.getenv("READ_MAX_INFLIGHT_BYTES", 64 * 1024 * 1024))
+
+# Nombre de dossiers racines scannés en parallèle
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", 4))
+
+# Cache mémoire du contenu des fichiers (256 MB par défaut, 0 pour désactiver)
+CONTENT_CACHE_MAX_BYTES = int(os.getenv("CONTENT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Résultats de scan conservés côté serveur (pagination par curseur, sessions de scan)
+# Nombre maximal de résultats gardés et durée de vie sans consultation (secondes)
+SCAN_RESULTS_MAX_ENTRIES = int(os.getenv("SCAN_RESULTS_MAX_ENTRIES", 16))
+SCAN_RESULTS_TTL = int(os.getenv("SCAN_RESULTS_TTL", 3600))
+# Mémoire estimée maximale occupée par ces résultats (128 MB par défaut)
+SCAN_RESULTS_MAX_BYTES = int(os.getenv("SCAN_RESULTS_MAX_BYTES", 128 * 1024 * 1024))
+
+# Volume maximal préchargé dans le cache après un scan (prefetch=true), 128 MB par défaut
+PREFETCH_MAX_BYTES = int(os.getenv("PREFETCH_MAX_BYTES", 128 * 1024 * 1024))
+
+# Cache mémoire du contenu compacté (format-content avec compaction), 64 MB par défaut
+COMPACTION_CACHE_MAX_BYTES = int(os.getenv("COMPACTION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Nombre maximal d'instantanés de format-content gardés sous TEMP_DIR/copy_snapshots
+SNAPSHOT_MAX_FILES = int(os.getenv("SNAPSHOT_MAX_FILES", 100))
+
+# Durée de vie (secondes) des sorties de format-content écrites sous TEMP_DIR/copy_artifacts
+ARTIFACT_TTL = int(os.getenv("ARTIFACT_TTL", 3600))
+
+# Compression des réponses (gzip/deflate selon Accept-Encoding)
+# Taille minimale d'une réponse compressée (octets) et niveau zlib (1 = rapide, 9 = compact)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", 6))
+
 # Autres configurations
 # La variable MAX_FILE_SIZE est déjà définie plus haut 
\ No newline at end of file
@@ -1,13 +1,41 @@
 from fastapi import APIRouter, HTTPException, Body, Query
-from typing import Dict, Any, List, Optional, Union
+from fastapi.responses import StreamingResponse, FileResponse
+from typing import Dict, Any, Iterator, List, Literal, Optional, Set, Tuple, Union
 from pydantic import BaseModel, Field
 import os
 import re
+import json
+import stat
+import time
 import logging
+from contextlib import closing, nullcontext
+from functools import partial
 from pathlib import Path
 
-from ..utils.file_utils import scan_directory, read_file_content, format_file_for_copy
+from ..utils.file_utils import (
+    scan_directory, read_file_content, format_file_for_copy,
+    format_duplicate_reference, content_digest
+)
+from ..utils.file_record import FileRecord, records_to_dicts
+from ..utils.archives import is_archive_root, stat_path
 from ..utils.path_utils import is_valid_directory, sanitize_path, format_path_error
+from ..utils.scan_filter import ScanFilter
+from ..utils.scan_coordinator import scan_roots
+from ..utils.read_pool import iter_read_files
+from ..utils.content_cache import content_cache, read_file_content_cached
+from ..utils.scan_progress import ScanProgress
+from ..utils.prefetch import prefetcher
+from ..config import MAX_FILE_SIZE
+from ..utils.artifacts import ArtifactWriter, get_artifact_path, delete_artifact, collect_expired_artifacts
+from ..utils.snapshot import load_snapshot, save_snapshot, classify_against_snapshot, stat_signature
+from ..utils.budget import resolve_budget, select_within_budget, omitted_entry, estimate_tokens, MIN_BLOCK_SIZE
+from ..utils.result_store import scan_result_store, get_page, normalize_filters, InvalidCursorError
+from ..utils.trigram_index import search_index
+from ..utils.content_match import ContentMatcher, filter_by_content
+from ..utils.compaction import compact_file_content, compaction_cache
+from ..services.copy_job_service import (
+    start_copy_job, get_copy_job, cancel_copy_job, get_job_status, get_job_matches
+)
 
 # Configuration du logger
 logger = logging.getLogger("toolbox.copy")
@@ -23,6 +51,9 @@ class AdvancedCopyRule(BaseModel):
     exclude_extensions: List[str] = Field(default=[], description="Extensions à exclure")
     exclude_patterns: List[str] = Field(default=[], description="Motifs à exclure dans les noms de fichiers")
     exclude_directories: List[str] = Field(default=[], description="Sous-dossiers à exclure")
+    respect_gitignore: bool = Field(default=False, description="Appliquer les règles .gitignore et .git/info/exclude pendant le scan")
+    large_files: Literal["skip", "excerpt"] = Field(default="skip", description="Fichiers plus gros que MAX_FILE_SIZE : ignorés, ou exportés en extrait (début et fin)")
+    include_content_patterns: List[str] = Field(default=[], description="Expressions régulières cherchées dans le contenu (par ligne) : seuls les fichiers où l'une d'elles apparaît sont gardés")
 
 
 class AdvancedCopyRequest(BaseModel):
@@ -30,6 +61,21 @@ class AdvancedCopyRequest(BaseModel):
     files: List[str] = Field(default=[], description="Liste des fichiers spécifiques")
     rules: AdvancedCopyRule = Field(default_factory=AdvancedCopyRule, description="Règles de filtrage")
     recursive: bool = Field(default=True, description="Chercher dans les sous-dossiers")
+    source: Literal["filesystem", "git_index"] = Field(default="filesystem", description="Source des fichiers : parcours du système de fichiers ou fichiers suivis lus dans .git/index")
+    read_workers: Optional[int] = Field(default=None, ge=1, le=64, description="Nombre de threads de lecture pour format-content et le filtre sur le contenu (config.READ_WORKERS par défaut)")
+    excerpt_kb: int = Field(default=16, ge=1, le=1024, description="Taille en Ko du début et de la fin lus pour un extrait (rules.large_files = excerpt)")
+    prefetch: bool = Field(default=False, description="Pour /advanced/scan et /advanced/scan/jobs : précharger en arrière-plan le contenu des fichiers trouvés dans le cache")
+    deduplicate_content: bool = Field(default=False, description="N'émettre qu'une fois les contenus identiques ; les copies suivantes renvoient au premier fichier")
+    create_snapshot: bool = Field(default=False, description="Pour format-content : enregistrer un instantané des fichiers exportés")
+    since_snapshot: Optional[str] = Field(default=None, description="Pour format-content : n'exporter que les changements depuis cet instantané")
+    budget_bytes: Optional[int] = Field(default=None, ge=1, description="Pour format-content : taille maximale du contenu formaté, en octets")
+    budget_tokens: Optional[int] = Field(default=None, ge=1, description="Pour format-content : budget en tokens estimés (environ 4 octets par token)")
+    budget_order: Literal["smallest", "recent", "scan"] = Field(default="smallest", description="Ordre de sélection dans le budget : plus petits, plus récents ou ordre du scan")
+    priority_extensions: List[str] = Field(default=[], description="Extensions sélectionnées en premier dans le budget, par ordre de priorité")
+    output: Literal["inline", "artifact"] = Field(default="inline", description="Pour format-content : contenu dans la réponse, ou écrit dans un fichier à télécharger (refusé par les variantes en flux et en tâche)")
+    session_token: Optional[str] = Field(default=None, description="Pour format-content : jeton renvoyé par /advanced/scan, pour réutiliser sa liste de fichiers sans nouveau parcours")
+    page_size: Optional[int] = Field(default=None, ge=1, le=1000, description="Pour /advanced/scan : garder les résultats côté serveur et ne renvoyer que la première page (triée par chemin)")
+    compaction: Literal["none", "whitespace", "strip", "skeleton"] = Field(default="none", description="Pour format-content : compactage de chaque fichier avant formatage (Python : strip retire commentaires et docstrings, skeleton ne garde que les signatures ; autres fichiers : espaces)")
 
 
 class FileMatch(BaseModel):
@@ -38,6 +84,7 @@ class FileMatch(BaseModel):
     size: int = Field(..., description="Taille du fichier en octets")
     size_human: str = Field(default="", description="Taille du fichier formatée (Ko ou Mo)")
     extension: str = Field(..., description="Extension du fichier (sans le point)")
+    excerpt: bool = Field(default=False, description="Fichier plus gros que MAX_FILE_SIZE, exporté en extrait")
 
 
 class PathError(BaseModel):
@@ -53,12 +100,49 @@ class AdvancedCopyResult(BaseModel):
     formatted_content: str = Field(default="", description="Contenu formaté des fichiers")
     total_subdirectories: int = Field(default=0, description="Nombre total de sous-dossiers")
     invalid_paths: Optional[List[PathError]] = Field(default=None, description="Chemins invalides avec détails d'erreur")
+    session_token: Optional[str] = Field(default=None, description="Jeton de la liste de fichiers conservée côté serveur (à repasser à format-content)")
+    result_id: Optional[str] = Field(default=None, description="Identifiant du résultat conservé (mode paginé)")
+    next_cursor: Optional[str] = Field(default=None, description="Curseur de la page suivante (mode paginé)")
+    snapshot_id: Optional[str] = Field(default=None, description="Identifiant de l'instantané enregistré (create_snapshot)")
+    changes: Optional[Dict[str, Any]] = Field(default=None, description="Fichiers ajoutés, modifiés, supprimés et nombre d'inchangés depuis since_snapshot")
+    artifact: Optional[Dict[str, Any]] = Field(default=None, description="Fichier de sortie (output = artifact) : identifiant, taille et URL de téléchargement")
+    budget: Optional[Dict[str, int]] = Field(default=None, description="Budget appliqué : limite, octets utilisés et tokens estimés")
+    omitted: Optional[List[Dict[str, Any]]] = Field(default=None, description="Fichiers écartés par le budget (chemin, taille, raison)")
+    duplicate_files: Optional[int] = Field(default=None, description="Fichiers remplacés par une référence au premier contenu identique (deduplicate_content)")
+    compaction: Optional[Dict[str, Any]] = Field(default=None, description="Compactage appliqué : mode, fichiers compactés, octets avant et après")
 
 
-@router.post("/advanced/scan", response_model=AdvancedCopyResult)
-async def scan_for_files(request: AdvancedCopyRequest):
+class SearchRequest(AdvancedCopyRequest):
+    query: str = Field(..., min_length=1, description="Texte ou expression régulière à chercher dans le contenu des fichiers")
+    regex: bool = Field(default=False, description="query est une expression régulière (syntaxe Python, ^ et $ en début et fin de ligne)")
+    case_sensitive: bool = Field(default=True, description="Respecter la casse (l'insensibilité à la casse vaut pour toutes les lettres)")
+    max_results: int = Field(default=100, ge=1, le=1000, description="Nombre maximal de fichiers retournés")
+    max_lines: int = Field(default=5, ge=0, le=100, description="Nombre maximal de lignes citées par fichier")
+
+
+def _compile_rules(request: AdvancedCopyRequest) -> ScanFilter:
+    """Compile les règles une seule fois pour toute la requête (400 si un motif est invalide)."""
+    try:
+        return ScanFilter.from_rules(request.rules)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _run_scan(
+    request: AdvancedCopyRequest,
+    scan_filter: Optional[ScanFilter] = None,
+    progress: Optional[ScanProgress] = None
+) -> Dict[str, Any]:
     """
-    Scanne les fichiers selon les critères spécifiés
+    Exécute le scan décrit par la requête (appelé par la route et par les tâches de fond).
+    
+    Args:
+        request: Requête de scan
+        scan_filter: Règles déjà compilées (compilées depuis la requête sinon)
+        progress: Suivi d'avancement et annulation de la tâche
+        
+    Returns:
+        Résultat au format AdvancedCopyResult
     """
     logger.info(f"Démarrage du scan avec {len(request.directories)} dossiers et {len(request.files)} fichiers")
     
@@ -66,143 +150,102 @@ async def scan_for_files(request: AdvancedCopyRequest):
     total_subdirectories = 0
     invalid_paths = []
     
-    # Analyser les dossiers spécifiés
+    if scan_filter is None:
+        scan_filter = _compile_rules(request)
+    
+    # Valider les dossiers spécifiés
+    roots = []
     for directory in request.directories:
         dir_path = sanitize_path(directory)
         logger.info(f"Traitement du dossier: {dir_path}")
         
         try:
-            if not is_valid_directory(dir_path):
+            # Une archive zip/tar (ou un de ses dossiers) se scanne comme un dossier
+            if not is_valid_directory(dir_path) and not is_archive_root(dir_path):
                 logger.warning(f"Dossier non valide: {dir_path}")
                 invalid_paths.append(format_path_error(directory, "not_found"))
                 continue
-                
-            # Calculer le nombre total de sous-dossiers
-            if request.recursive:
-                try:
-                    for root, dirs, _ in os.walk(dir_path, onerror=lambda e: None):
-                        # Filtrer les sous-dossiers exclus
-                        if request.rules.exclude_directories:
-                            dirs[:] = [d for d in dirs if d not in request.rules.exclude_directories 
-                                    and not any(Path(os.path.join(root, d)).match(f"**/{excluded}/**") 
-                                                for excluded in request.rules.exclude_directories)]
-                        
-                        total_subdirectories += len(dirs)
-                except Exception as walk_error:
-                    # Ajouter l'erreur mais continuer l'analyse
-                    logger.error(f"Erreur lors du parcours de {dir_path}: {str(walk_error)}")
-                    invalid_paths.append(format_path_error(directory, f"Erreur lors du parcours: {str(walk_error)}"))
-                
-            # Rechercher les fichiers correspondants
-            logger.info(f"Scan du dossier: {dir_path} (récursif={request.recursive})")
-            scan_result = scan_directory(
-                directory=dir_path,
-                exclude_extensions=request.rules.exclude_extensions,
-                exclude_patterns=request.rules.exclude_patterns,
-                exclude_directories=request.rules.exclude_directories,
-                recursive=request.recursive
-            )
-            
-            # Récupérer les fichiers trouvés et les erreurs
-            dir_matches = scan_result["files"]
-            
-            # Ajouter les erreurs de scan aux chemins invalides
-            for error_msg in scan_result.get("errors", []):
-                logger.warning(f"Erreur pendant le scan: {error_msg}")
-                invalid_paths.append(format_path_error(directory, error_msg))
-            
-            logger.info(f"Trouvé {len(dir_matches)} fichiers dans {dir_path}")
-            
-            # Ajouter la taille formatée pour chaque fichier
-            for match in dir_matches:
-                size = match["size"]
-                if size < 1024:
-                    size_human = f"{size} octets"
-                elif size < 1024 * 1024:
-                    size_human = f"{size / 1024:.1f} Ko"
-                else:
-                    size_human = f"{size / (1024 * 1024):.1f} Mo"
-                
-                match["size_human"] = size_human
-                
-            matches.extend(dir_matches)
+            roots.append((directory, dir_path))
         except Exception as e:
-            # Ajouter l'erreur avec le chemin formaté mais continuer avec les autres dossiers
             logger.error(f"Erreur générale lors du traitement de {dir_path}: {str(e)}")
             invalid_paths.append(format_path_error(directory, str(e)))
     
-    # Ajouter les fichiers spécifiques s'ils respectent les règles
-    for file_path in request.files:
+    # Scanner les racines en parallèle (racines imbriquées absorbées, doublons retirés),
+    # le nombre de sous-dossiers étant compté pendant le même parcours
+    roots_result = scan_roots(roots, scan_filter, recursive=request.recursive, source=request.source, progress=progress)
+    total_subdirectories = roots_result["subdirectories"]
+    seen_files = roots_result["seen"]
+    
+    # Ajouter les erreurs de scan aux chemins invalides
+    for directory, error_msg in roots_result["errors"]:
+        logger.warning(f"Erreur pendant le scan: {error_msg}")
+        invalid_paths.append(format_path_error(directory, error_msg))
+    
+    matches.extend(roots_result["files"])
+    logger.info(f"Trouvé {len(matches)} fichiers dans {len(roots)} dossiers")
+    
+    # Ajouter les fichiers spécifiques s'ils respectent les règles (sauf si la tâche est annulée)
+    explicit_files = [] if progress is not None and progress.cancelled else request.files
+    for file_path in explicit_files:
         try:
             file_path = sanitize_path(file_path)
             logger.info(f"Traitement du fichier: {file_path}")
             
             file = Path(file_path)
             try:
-                if not file.exists() or not file.is_file():
-                    logger.warning(f"Fichier non trouvé: {file_path}")
-                    invalid_paths.append(format_path_error(file_path, "not_found"))
-                    continue
+                # Un seul stat, membres d'archives compris
+                file_stat = stat_path(file_path)
+            except (FileNotFoundError, NotADirectoryError):
+                file_stat = None
             except (PermissionError, OSError) as e:
                 logger.error(f"Erreur d'accès au fichier {file_path}: {str(e)}")
                 invalid_paths.append(format_path_error(file_path, f"Erreur d'accès: {str(e)}"))
                 continue
+            if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
+                logger.warning(f"Fichier non trouvé: {file_path}")
+                invalid_paths.append(format_path_error(file_path, "not_found"))
+                continue
                 
             # Vérifier si le fichier correspond aux règles
             extension = file.suffix[1:] if file.suffix else ""
             filename = file.name
             
-            # Vérification des extensions
-            if extension in request.rules.exclude_extensions:
-                logger.info(f"Fichier exclu (extension): {file_path}")
-                continue
-                
-            # Vérification des motifs
-            exclude_match = False
-            if request.rules.exclude_patterns:
-                exclude_match = any(re.search(pattern, filename) for pattern in request.rules.exclude_patterns)
-            if exclude_match:
-                logger.info(f"Fichier exclu (motif): {file_path}")
+            # Vérification des extensions et des motifs
+            reason = scan_filter.exclusion_reason(filename, extension)
+            if reason is not None:
+                logger.info(f"Fichier exclu ({reason}): {file_path}")
                 continue
             
             # Vérification des sous-dossiers exclus
-            file_is_excluded = False
-            if request.rules.exclude_directories:
-                file_dir = os.path.dirname(str(file))
-                for excluded_dir in request.rules.exclude_directories:
-                    if os.path.basename(file_dir) == excluded_dir or f"/{excluded_dir}/" in f"{file_dir}/":
-                        file_is_excluded = True
-                        break
-            if file_is_excluded:
+            if scan_filter.is_directory_excluded(os.path.dirname(str(file))):
                 logger.info(f"Fichier exclu (dossier parent): {file_path}")
                 continue
                 
-            # Calculer la taille formatée pour ce fichier spécifique
-            try:
-                file_size = file.stat().st_size
-                if file_size < 1024:
-                    file_size_human = f"{file_size} octets"
-                elif file_size < 1024 * 1024:
-                    file_size_human = f"{file_size / 1024:.1f} Ko"
-                else:
-                    file_size_human = f"{file_size / (1024 * 1024):.1f} Mo"
-                    
-                # Ajouter le fichier aux résultats
-                matches.append({
-                    "path": str(file).replace("\\", "/"),
-                    "name": filename,
-                    "size": file_size,
-                    "size_human": file_size_human,
-                    "extension": extension
-                })
-                logger.info(f"Fichier ajouté aux résultats: {file_path}")
-            except (PermissionError, OSError) as e:
-                logger.error(f"Erreur d'accès au fichier {file_path}: {str(e)}")
-                invalid_paths.append(format_path_error(file_path, f"Erreur d'accès: {str(e)}"))
+            file_size = file_stat.st_size
+            
+            # Fichier déjà trouvé dans un des dossiers scannés (par chemin pour un membre d'archive, sans inode)
+            output_path = str(file).replace("\\", "/")
+            identity = (file_stat.st_dev, file_stat.st_ino) if file_stat.st_ino else output_path
+            if identity in seen_files or output_path in seen_files:
+                logger.info(f"Fichier déjà présent dans les résultats: {file_path}")
+                continue
+            seen_files.add(identity)
+            
+            # Ajouter le fichier aux résultats
+            file_info = FileRecord.from_path(
+                output_path, file_size, extension,
+                excerpt=file_size > MAX_FILE_SIZE and scan_filter.include_large_files
+            )
+            matches.append(file_info)
+            logger.info(f"Fichier ajouté aux résultats: {file_path}")
         except Exception as e:
             logger.error(f"Erreur générale lors du traitement du fichier {file_path}: {str(e)}")
             invalid_paths.append(format_path_error(file_path, str(e)))
     
+    # Filtre sur le contenu en dernier, une fois les règles sur les noms appliquées
+    if scan_filter.content_patterns:
+        matches = filter_by_content(matches, ContentMatcher(scan_filter.content_patterns), request.read_workers, progress)
+    
     logger.info(f"Scan terminé: {len(matches)} fichiers trouvés, {len(invalid_paths)} chemins invalides")
     
     result = {
@@ -219,55 +262,495 @@ async def scan_for_files(request: AdvancedCopyRequest):
     return result
 
 
-@router.post("/advanced/format-content", response_model=AdvancedCopyResult)
-async def format_files_content(request: AdvancedCopyRequest):
+def _scan_fingerprint(request: AdvancedCopyRequest) -> str:
+    """Empreinte des paramètres qui déterminent la liste de fichiers d'un scan."""
+    parameters = {
+        "directories": request.directories,
+        "files": request.files,
+        "rules": request.rules.model_dump(),
+        "recursive": request.recursive,
+        "source": request.source
+    }
+    return json.dumps(parameters, sort_keys=True, ensure_ascii=False)
+
+
+def _scan_or_resume(
+    request: AdvancedCopyRequest,
+    scan_filter: Optional[ScanFilter] = None,
+    progress: Optional[ScanProgress] = None
+) -> Dict[str, Any]:
     """
-    Récupère et formate le contenu des fichiers sélectionnés selon les critères
+    Reprend la liste de fichiers d'une session de scan, ou scanne à nouveau.
+    
+    Avec session_token, la liste conservée par /advanced/scan est réutilisée
+    sans parcours. Une requête réduite au jeton (sans dossiers ni fichiers)
+    exige une session valide ; sinon les paramètres doivent être ceux du scan
+    d'origine, et une session expirée entraîne simplement un nouveau scan.
+    
+    Args:
+        request: Requête de format-content
+        scan_filter: Règles déjà compilées (pour un éventuel nouveau scan)
+        progress: Suivi d'avancement de la tâche
+        
+    Returns:
+        Résultat au format AdvancedCopyResult
     """
-    logger.info("Début du formatage du contenu des fichiers")
+    token = request.session_token
+    if not token:
+        return _run_scan(request, scan_filter, progress)
     
-    # D'abord, on obtient les fichiers correspondants
-    scan_result = await scan_for_files(request)
-    matches = scan_result["matches"]
-    total_subdirectories = scan_result["total_subdirectories"]
-    invalid_paths = scan_result.get("invalid_paths", [])
+    token_only = not request.directories and not request.files
+    stored = scan_result_store.get(token)
+    if stored is None:
+        if token_only:
+            raise HTTPException(status_code=404, detail=f"Session de scan {token} non trouvée ou expirée")
+        logger.info(f"Session de scan {token} expirée, nouveau scan")
+        return _run_scan(request, scan_filter, progress)
     
-    logger.info(f"Formatage du contenu pour {len(matches)} fichiers")
+    if not token_only and stored.fingerprint != _scan_fingerprint(request):
+        raise HTTPException(status_code=409, detail=f"Les paramètres ne correspondent pas à la session de scan {token}")
     
-    # Ensuite, on récupère et formate le contenu
-    formatted_content = ""
-    for file_match in matches:
+    logger.info(f"Reprise de la session de scan {token} ({len(stored.matches)} fichiers, sans nouveau parcours)")
+    result = {
+        "matches": stored.matches,
+        "total_matches": len(stored.matches),
+        "formatted_content": "",
+        "total_subdirectories": stored.total_subdirectories,
+        "session_token": token
+    }
+    if stored.invalid_paths:
+        # Copie : les erreurs de lecture y seront ajoutées
+        result["invalid_paths"] = list(stored.invalid_paths)
+    return result
+
+
+@router.post("/advanced/scan", response_model=AdvancedCopyResult)
+async def scan_for_files(request: AdvancedCopyRequest):
+    """
+    Scanne les fichiers selon les critères spécifiés
+    
+    La liste de fichiers est conservée côté serveur : session_token permet à
+    format-content de la réutiliser sans nouveau parcours.
+    
+    Avec page_size, seule la première page (triée par chemin) est renvoyée,
+    avec result_id (égal à session_token) et next_cursor pour parcourir la
+    suite via GET /advanced/results/{result_id}.
+    """
+    # Une nouvelle sélection remplace la précédente : son préchargement est inutile
+    prefetcher.cancel()
+    
+    result = _run_scan(request)
+    if request.prefetch:
+        _start_prefetch(request, result["matches"])
+    
+    result_id = scan_result_store.put(result, _scan_fingerprint(request))
+    result["session_token"] = result_id
+    if request.page_size is None:
+        return {**result, "matches": records_to_dicts(result["matches"])}
+    
+    page = get_page(scan_result_store.get(result_id), limit=request.page_size)
+    logger.info(f"Résultat {result_id} conservé ({result['total_matches']} fichiers), première page de {len(page['matches'])}")
+    return {**result, "matches": records_to_dicts(page["matches"]), "result_id": result_id, "next_cursor": page["next_cursor"]}
+
+
+@router.get("/advanced/results/{result_id}")
+async def get_scan_results_page(
+    result_id: str,
+    cursor: Optional[str] = Query(default=None, description="Curseur renvoyé par la page précédente"),
+    limit: int = Query(default=100, ge=1, le=1000, description="Nombre maximal de fichiers"),
+    sort: Literal["path", "size", "extension"] = Query(default="path", description="Clé de tri"),
+    order: Literal["asc", "desc"] = Query(default="asc", description="Ordre de tri"),
+    extension: List[str] = Query(default=[], description="Extensions à garder (sans le point)"),
+    q: Optional[str] = Query(default=None, description="Texte à chercher dans le chemin (insensible à la casse)"),
+    min_size: Optional[int] = Query(default=None, ge=0, description="Taille minimale en octets"),
+    max_size: Optional[int] = Query(default=None, ge=0, description="Taille maximale en octets")
+):
+    """
+    Retourne une page d'un résultat de scan conservé, triée et filtrée côté serveur.
+    
+    Le curseur n'est valable que pour le tri et les filtres avec lesquels il a été obtenu.
+    """
+    stored = scan_result_store.get(result_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"Résultat de scan {result_id} non trouvé ou expiré")
+    
+    filters = normalize_filters(extension, q, min_size, max_size)
+    try:
+        page = get_page(stored, cursor=cursor, limit=limit, sort=sort, order=order, filters=filters)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "result_id": result_id,
+        "total_matches": len(stored.matches),
+        "total": page["total"],
+        "total_subdirectories": stored.total_subdirectories,
+        "next_cursor": page["next_cursor"],
+        "matches": records_to_dicts(page["matches"])
+    }
+
+
+def _excerpt_bytes(request: AdvancedCopyRequest) -> Optional[int]:
+    """Taille des extraits si le mode extrait est actif, None sinon."""
+    return request.excerpt_kb * 1024 if request.rules.large_files == "excerpt" else None
+
+
+def _start_prefetch(request: AdvancedCopyRequest, matches: List[Dict[str, Any]]) -> None:
+    """Précharge les fichiers trouvés avec la même lecture que format-content."""
+    excerpt_bytes = _excerpt_bytes(request)
+    read_func = partial(read_file_content_cached, excerpt_bytes=excerpt_bytes) if excerpt_bytes else read_file_content_cached
+    prefetcher.start(matches, read_func)
+
+
+def _compaction_stats(request: AdvancedCopyRequest) -> Optional[Dict[str, Any]]:
+    """Compteurs du compactage à renvoyer dans la réponse, None sans compactage."""
+    if request.compaction == "none":
+        return None
+    return {"mode": request.compaction, "files": 0, "bytes_before": 0, "bytes_after": 0}
+
+
+def _iter_formatted_files(
+    matches: List[Dict[str, Any]],
+    invalid_paths: List[Dict[str, Any]],
+    read_workers: Optional[int] = None,
+    duplicates: Optional[Dict[str, str]] = None,
+    digests: Optional[Dict[str, bytes]] = None,
+    excerpt_bytes: Optional[int] = None,
+    compaction: Optional[Dict[str, Any]] = None,
+    withheld: Optional[Set[str]] = None
+) -> Iterator[Tuple[Dict[str, Any], str, Optional[str]]]:
+    """
+    Lit et formate les fichiers, dans l'ordre de matches.
+    
+    Les lectures passent par le cache de contenu et sont faites en parallèle
+    par iter_read_files, mais chaque bloc
+    est produit dans l'ordre d'origine dès que son fichier a été lu, ce qui
+    permet de l'envoyer sans attendre les suivants. Les erreurs de lecture
+    sont ajoutées à invalid_paths au fil de l'eau.
+    
+    Args:
+        matches: Fichiers à lire (résultat de scan_for_files)
+        invalid_paths: Liste des chemins invalides à compléter
+        read_workers: Nombre de threads de lecture (config.READ_WORKERS par défaut)
+        duplicates: Si fourni, active le dédoublonnage par contenu : un fichier
+            identique à un fichier déjà émis est remplacé par une référence, et
+            le dictionnaire est complété (chemin -> chemin du premier fichier)
+        digests: Si fourni, complété avec l'empreinte du contenu de chaque fichier texte lu
+        excerpt_bytes: Taille des extraits des fichiers plus gros que MAX_FILE_SIZE (refusés sinon)
+        compaction: Si fourni (voir _compaction_stats), chaque contenu texte est
+            compacté selon son "mode" avant formatage, et les compteurs sont complétés ;
+            empreintes et dédoublonnage portent sur le contenu d'origine
+        withheld: Chemins que l'appelant n'a finalement pas émis (budget, delta) ;
+            un contenu n'est retenu comme original pour le dédoublonnage qu'une
+            fois son bloc émis, pour ne jamais renvoyer à un fichier absent
+        
+    Yields:
+        Tuple (fichier, bloc formaté, message d'erreur ou None)
+    """
+    read_func = partial(read_file_content_cached, excerpt_bytes=excerpt_bytes) if excerpt_bytes else read_file_content_cached
+    reader = iter_read_files(matches, read_func=read_func, max_workers=read_workers)
+    # Empreinte du contenu -> premier fichier émis avec ce contenu
+    first_by_digest: Dict[bytes, str] = {}
+    for file_match, content, read_error in reader:
         file_path = file_match["path"]
         try:
-            logger.info(f"Lecture du fichier: {file_path}")
-            content = read_file_content(file_path)
+            if read_error is not None:
+                raise read_error
             
             # Si le contenu commence par "[Erreur", c'est une erreur de lecture
             if content.startswith("[Erreur") or content.startswith("[Fichier non") or content.startswith("[Contenu binaire"):
                 logger.warning(f"Problème lors de la lecture de {file_path}: {content}")
-                formatted_content += f"=== {file_path} ({file_match['size_human']}) ===\n{content}\n\n---\n\n"
+                block = f"=== {file_path} ({file_match['size_human']}) ===\n{content}\n\n---\n\n"
                 
                 # Ajouter aux chemins invalides si c'est une erreur
                 if not content.startswith("[Contenu binaire"):
                     invalid_paths.append(format_path_error(file_path, content))
+                    yield file_match, block, content
+                else:
+                    yield file_match, block, None
             else:
-                formatted_content += format_file_for_copy(file_path, content, file_match["size_human"])
+                # Le contenu déjà lu est haché : aucune relecture, les fichiers vides sont toujours émis
+                if digests is not None:
+                    digests[file_path] = content_digest(content)
+                digest = None
+                if duplicates is not None and content:
+                    digest = digests[file_path] if digests is not None else content_digest(content)
+                    original_path = first_by_digest.get(digest)
+                    if original_path is not None:
+                        duplicates[file_path] = original_path
+                        yield file_match, format_duplicate_reference(file_path, original_path, file_match["size_human"]), None
+                        continue
+                if compaction is not None:
+                    compacted = compact_file_content(file_path, content, compaction["mode"], file_match["extension"])
+                    compaction["files"] += 1
+                    compaction["bytes_before"] += len(content.encode("utf-8"))
+                    compaction["bytes_after"] += len(compacted.encode("utf-8"))
+                    content = compacted
+                yield file_match, format_file_for_copy(file_path, content, file_match["size_human"]), None
+                # Reprise du générateur : l'appelant a décidé d'émettre ou non le bloc
+                if digest is not None and (withheld is None or file_path not in withheld):
+                    first_by_digest.setdefault(digest, file_path)
         except Exception as e:
             # En cas d'erreur, on mentionne le fichier qu'on n'a pas pu lire
             error_msg = f"Erreur lors de la lecture: {str(e)}"
             logger.error(f"Erreur lors de la lecture de {file_path}: {str(e)}")
-            formatted_content += f"=== {file_path} ({file_match['size_human']}) ===\n{error_msg}\n\n---\n\n"
             # Ajouter aux chemins invalides
             invalid_paths.append(format_path_error(file_path, error_msg))
+            yield file_match, f"=== {file_path} ({file_match['size_human']}) ===\n{error_msg}\n\n---\n\n", error_msg
+
+
+def _load_previous_snapshot(request: AdvancedCopyRequest) -> Optional[Dict[str, Any]]:
+    """Manifeste de l'instantané since_snapshot (404 s'il n'existe pas), None sans delta."""
+    if not request.since_snapshot:
+        return None
+    previous_manifest = load_snapshot(request.since_snapshot)
+    if previous_manifest is None:
+        raise HTTPException(status_code=404, detail=f"Instantané {request.since_snapshot} non trouvé")
+    return previous_manifest
+
+
+def _prepare_export(
+    request: AdvancedCopyRequest,
+    matches: List[Dict[str, Any]],
+    previous_manifest: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Prépare l'export du contenu, commun à format-content et à ses variantes (flux, tâche).
+    
+    En mode delta, seuls les fichiers nouveaux ou dont le stat() a changé
+    sont à lire ; avec un budget, les fichiers sont choisis sur leurs
+    métadonnées avant toute lecture.
+    
+    Args:
+        request: Requête de format-content
+        matches: Fichiers scannés
+        previous_manifest: Manifeste de since_snapshot (voir _load_previous_snapshot)
+        
+    Returns:
+        État de l'export, complété par _iter_export_blocks
+    """
+    to_read = matches
+    delta = None
+    if previous_manifest is not None:
+        delta = classify_against_snapshot(matches, previous_manifest)
+        to_read = [match for match in matches if match["path"] not in delta["unchanged"]]
+        logger.info(
+            f"Delta depuis {request.since_snapshot}: {len(delta['added'])} ajoutés, "
+            f"{len(delta['changed'])} à vérifier, {len(delta['unchanged'])} inchangés, {len(delta['deleted'])} supprimés"
+        )
+    
+    budget = resolve_budget(request.budget_bytes, request.budget_tokens)
+    omitted = []
+    if budget is not None:
+        to_read, omitted = select_within_budget(
+            to_read, budget, request.budget_order, request.priority_extensions, _excerpt_bytes(request)
+        )
+    
+    return {
+        "matches": matches,
+        "to_read": to_read,
+        "previous_manifest": previous_manifest,
+        "delta": delta,
+        "budget": budget,
+        "used_bytes": 0,
+        "omitted": omitted,
+        "modified": [],
+        "duplicates": {} if request.deduplicate_content else None,
+        "digests": {} if (request.create_snapshot or delta is not None) else None,
+        "compaction": _compaction_stats(request)
+    }
+
+
+def _iter_export_blocks(
+    request: AdvancedCopyRequest,
+    export: Dict[str, Any],
+    invalid_paths: List[Dict[str, Any]]
+) -> Iterator[Tuple[Dict[str, Any], str, Optional[str]]]:
+    """
+    Produit les blocs à émettre d'un export préparé par _prepare_export, dans l'ordre du scan.
+    
+    Un fichier seulement « touché » depuis l'instantané (même empreinte)
+    n'est pas émis, chaque bloc est compté dans le budget (les lectures
+    restantes sont annulées une fois le budget épuisé), et les fichiers
+    supprimés depuis l'instantané sont annoncés en dernier. export est
+    complété au fil de l'eau.
+    
+    Args:
+        request: Requête de format-content
+        export: État de l'export
+        invalid_paths: Liste des chemins invalides à compléter
+        
+    Yields:
+        Tuple (fichier, bloc formaté, message d'erreur ou None)
+    """
+    to_read = export["to_read"]
+    delta = export["delta"]
+    previous_manifest = export["previous_manifest"]
+    budget = export["budget"]
+    duplicates = export["duplicates"]
+    digests = export["digests"]
+    withheld = set()
+    processed = 0
+    with closing(_iter_formatted_files(
+        to_read, invalid_paths, request.read_workers, duplicates, digests,
+        excerpt_bytes=_excerpt_bytes(request), compaction=export["compaction"], withheld=withheld
+    )) as formatted:
+        for file_match, block, error in formatted:
+            processed += 1
+            path = file_match["path"]
+            if delta is not None and path in previous_manifest:
+                # Fichier seulement « touché » : même contenu, on ne l'émet pas
+                previous_digest = previous_manifest[path][2]
+                if previous_digest is not None and path in digests and digests[path].hex() == previous_digest:
+                    delta["unchanged"][path] = previous_manifest[path]
+                    withheld.add(path)
+                    if duplicates:
+                        duplicates.pop(path, None)
+                    continue
+            
+            if budget is not None:
+                # L'estimation peut différer du bloc réel (décodage, fichier binaire)
+                block_size = len(block.encode("utf-8"))
+                if export["used_bytes"] + block_size > budget:
+                    export["omitted"].append(omitted_entry(file_match, "budget"))
+                    withheld.add(path)
+                    if duplicates:
+                        duplicates.pop(path, None)
+                    continue
+                export["used_bytes"] += block_size
+            
+            if delta is not None and path in previous_manifest:
+                export["modified"].append(path)
+            yield file_match, block, error
+            
+            if budget is not None and budget - export["used_bytes"] < MIN_BLOCK_SIZE:
+                # Budget épuisé : les lectures restantes sont annulées
+                export["omitted"].extend(omitted_entry(rest, "budget") for rest in to_read[processed:])
+                break
+    
+    if delta is not None:
+        for path in delta["deleted"]:
+            yield {"path": path, "size": 0, "size_human": "", "deleted": True}, f"=== {path} ===\n[Fichier supprimé]\n\n---\n\n", None
+
+
+def _export_report(export: Dict[str, Any], result: Dict[str, Any]) -> None:
+    """Ajoute au résultat les compteurs de l'export : doublons, compactage, budget et changements."""
+    duplicates = export["duplicates"]
+    if duplicates is not None:
+        result["duplicate_files"] = len(duplicates)
+        if duplicates:
+            logger.info(f"{len(duplicates)} fichiers au contenu identique remplacés par une référence")
+    compaction = export["compaction"]
+    if compaction is not None:
+        result["compaction"] = compaction
+        logger.info(f"Compactage ({compaction['mode']}): {compaction['bytes_before']} -> {compaction['bytes_after']} octets")
+    budget = export["budget"]
+    if budget is not None:
+        result["budget"] = {
+            "limit_bytes": budget,
+            "used_bytes": export["used_bytes"],
+            "estimated_tokens": estimate_tokens(export["used_bytes"])
+        }
+        result["omitted"] = export["omitted"]
+        logger.info(f"Budget utilisé: {export['used_bytes']}/{budget} octets, {len(export['omitted'])} fichiers écartés")
+    delta = export["delta"]
+    if delta is not None:
+        result["changes"] = {
+            "added": [match["path"] for match in delta["added"]],
+            "modified": export["modified"],
+            "deleted": delta["deleted"],
+            "unchanged": len(delta["unchanged"])
+        }
+
+
+def _save_export_snapshot(export: Dict[str, Any]) -> str:
+    """
+    Enregistre l'instantané des fichiers exportés et retourne son identifiant.
+    
+    Un fichier écarté par le budget garde son entrée précédente (s'il en a
+    une), pour rester à exporter ; un fichier inchangé reprend l'empreinte de
+    l'instantané précédent, sans relecture.
+    """
+    previous_manifest = export["previous_manifest"]
+    delta = export["delta"]
+    digests = export["digests"]
+    entries = {}
+    signatures = delta["signatures"] if delta is not None else {}
+    omitted_paths = {entry["path"] for entry in export["omitted"]}
+    for match in export["matches"]:
+        path = match["path"]
+        if path in omitted_paths:
+            if previous_manifest is not None and path in previous_manifest:
+                entries[path] = previous_manifest[path]
+            continue
+        if delta is not None and path in delta["unchanged"]:
+            previous = delta["unchanged"][path]
+            signature = signatures.get(path, (previous[0], previous[1]))
+            entries[path] = (signature[0], signature[1], previous[2])
+            continue
+        signature = signatures.get(path) or stat_signature(path)
+        if signature is None:
+            continue
+        digest = digests.get(path)
+        entries[path] = (signature[0], signature[1], digest.hex() if digest is not None else None)
+    return save_snapshot(entries)
+
+
+@router.post("/advanced/format-content", response_model=AdvancedCopyResult)
+async def format_files_content(request: AdvancedCopyRequest):
+    """
+    Récupère et formate le contenu des fichiers sélectionnés selon les critères
+    
+    - create_snapshot : enregistre un manifeste (chemin, taille, mtime_ns,
+      empreinte) et renvoie son snapshot_id
+    - since_snapshot : n'émet que les fichiers ajoutés ou modifiés depuis cet
+      instantané, suivis de la liste des fichiers supprimés ; les fichiers dont
+      la taille et le mtime_ns n'ont pas changé ne sont pas lus
+    """
+    logger.info("Début du formatage du contenu des fichiers")
+    
+    if request.output == "artifact":
+        collect_expired_artifacts()
+    
+    previous_manifest = _load_previous_snapshot(request)
+    
+    # D'abord, on obtient les fichiers correspondants
+    scan_result = _scan_or_resume(request)
+    matches = scan_result["matches"]
+    total_subdirectories = scan_result["total_subdirectories"]
+    invalid_paths = scan_result.get("invalid_paths", [])
+    
+    export = _prepare_export(request, matches, previous_manifest)
+    logger.info(f"Formatage du contenu pour {len(export['to_read'])} fichiers")
+    
+    # Ensuite, on récupère et formate le contenu (assemblé en une seule fois, ou écrit au fil de l'eau)
+    # En mode artefact, chaque bloc est écrit sur disque au lieu d'être gardé en mémoire
+    blocks = []
+    writer = ArtifactWriter() if request.output == "artifact" else None
+    emit = writer.write if writer is not None else blocks.append
+    with writer if writer is not None else nullcontext():
+        with closing(_iter_export_blocks(request, export, invalid_paths)) as formatted:
+            for _, block, _ in formatted:
+                emit(block)
+    formatted_content = "".join(blocks)
     
     logger.info("Formatage du contenu terminé")
     
     result = {
-        "matches": matches,
+        "matches": records_to_dicts(matches),
         "total_matches": len(matches),
         "formatted_content": formatted_content,
         "total_subdirectories": total_subdirectories
     }
+    _export_report(export, result)
+    if writer is not None:
+        result["artifact"] = {
+            "artifact_id": writer.artifact_id,
+            "size": writer.size,
+            "download_url": f"{router.prefix}/advanced/artifacts/{writer.artifact_id}"
+        }
+    if request.create_snapshot:
+        result["snapshot_id"] = _save_export_snapshot(export)
     
     # Ajouter les erreurs de chemin s'il y en a
     if invalid_paths:
@@ -276,6 +759,358 @@ async def format_files_content(request: AdvancedCopyRequest):
     return result
 
 
+@router.post("/advanced/format-content/stream")
+async def stream_files_content(
+    request: AdvancedCopyRequest,
+    output_format: Literal["ndjson", "text"] = Query(default="ndjson", alias="format", description="Format du flux (ndjson ou text)")
+):
+    """
+    Variante en flux de format-content : chaque fichier est envoyé dès qu'il est lu.
+    
+    - ndjson : une ligne JSON par fichier ({"type": "file", ...}) puis une ligne
+      de synthèse ({"type": "summary", ...}) avec les chemins invalides
+    - text : les blocs formatés bruts, concaténés
+    
+    Le budget et since_snapshot s'appliquent comme pour format-content ; en
+    ndjson, la synthèse indique le budget utilisé, les fichiers écartés, les
+    changements et le snapshot_id (create_snapshot, ndjson seulement),
+    l'instantané n'étant enregistré qu'une fois le flux entièrement envoyé.
+    
+    La mémoire reste bornée par la taille du plus gros fichier.
+    """
+    logger.info(f"Début du formatage en flux du contenu des fichiers (format={output_format})")
+    
+    if request.output == "artifact":
+        raise HTTPException(status_code=400, detail="output=artifact n'est disponible qu'avec /advanced/format-content")
+    if request.create_snapshot and output_format == "text":
+        raise HTTPException(status_code=400, detail="create_snapshot exige le format ndjson (le snapshot_id est renvoyé dans la synthèse)")
+    previous_manifest = _load_previous_snapshot(request)
+    
+    scan_result = _scan_or_resume(request)
+    matches = scan_result["matches"]
+    total_subdirectories = scan_result["total_subdirectories"]
+    invalid_paths = scan_result.get("invalid_paths", [])
+    
+    export = _prepare_export(request, matches, previous_manifest)
+    duplicates = export["duplicates"]
+    logger.info(f"Formatage en flux pour {len(export['to_read'])} fichiers")
+    
+    def generate_text() -> Iterator[str]:
+        for _, block, _ in _iter_export_blocks(request, export, invalid_paths):
+            yield block
+        logger.info("Formatage en flux terminé")
+    
+    def generate_ndjson() -> Iterator[str]:
+        for file_match, block, error in _iter_export_blocks(request, export, invalid_paths):
+            line = {
+                "type": "file",
+                "path": file_match["path"],
+                "size": file_match["size"],
+                "size_human": file_match["size_human"],
+                "content": block
+            }
+            if error:
+                line["error"] = error
+            if duplicates and file_match["path"] in duplicates:
+                line["duplicate_of"] = duplicates[file_match["path"]]
+            if file_match.get("deleted"):
+                line["deleted"] = True
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        
+        summary = {
+            "type": "summary",
+            "total_matches": len(matches),
+            "total_subdirectories": total_subdirectories,
+            "invalid_paths": invalid_paths or None
+        }
+        _export_report(export, summary)
+        if request.create_snapshot:
+            summary["snapshot_id"] = _save_export_snapshot(export)
+        logger.info("Formatage en flux terminé")
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+    
+    # Le générateur synchrone est exécuté dans le pool de threads par Starlette
+    if output_format == "text":
+        return StreamingResponse(generate_text(), media_type="text/plain; charset=utf-8")
+    return StreamingResponse(generate_ndjson(), media_type="application/x-ndjson")
+
+
+def _get_job_or_404(job_id: str) -> Dict[str, Any]:
+    job = get_copy_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Tâche avec ID {job_id} non trouvée")
+    return job
+
+
+@router.post("/advanced/search")
+async def search_files_content(request: SearchRequest):
+    """
+    Cherche un texte ou une expression régulière dans le contenu des fichiers sélectionnés.
+    
+    Les fichiers sont ceux du scan décrit par la requête (ou de la session
+    session_token). Leur contenu est indexé par trigrammes sur disque, et
+    l'index n'est mis à jour que pour les fichiers nouveaux ou modifiés
+    (taille, mtime) ; seuls les fichiers contenant tous les trigrammes de la
+    requête sont relus pour vérifier la correspondance.
+    """
+    if request.regex:
+        try:
+            re.compile(request.query)
+        except re.error as e:
+            raise HTTPException(status_code=400, detail=f"Expression régulière invalide: {str(e)}")
+    
+    start = time.perf_counter()
+    scan_result = _scan_or_resume(request)
+    matches = scan_result["matches"]
+    
+    index_update = search_index.update(matches, request.read_workers)
+    found = search_index.search(
+        matches, index_update.pop("ids"), request.query,
+        regex=request.regex,
+        ignore_case=not request.case_sensitive,
+        max_results=request.max_results,
+        max_lines=request.max_lines,
+        read_workers=request.read_workers
+    )
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+    logger.info(
+        f"Recherche de {request.query!r}: {len(found['results'])} fichiers trouvés, "
+        f"{found['candidates']} candidats sur {len(matches)} ({elapsed_ms} ms)"
+    )
+    
+    result = {
+        "query": request.query,
+        "total_matches": len(matches),
+        "candidates": found["candidates"],
+        "matches": found["results"],
+        "truncated": found["truncated"],
+        "index": index_update,
+        "elapsed_ms": elapsed_ms
+    }
+    if scan_result.get("session_token"):
+        result["session_token"] = scan_result["session_token"]
+    if scan_result.get("invalid_paths"):
+        result["invalid_paths"] = scan_result["invalid_paths"]
+    return result
+
+
+@router.get("/advanced/search/index")
+async def get_search_index_stats():
+    """Retourne l'état de l'index de recherche (fichiers indexés, taille sur disque)"""
+    return search_index.stats()
+
+
+@router.delete("/advanced/search/index")
+async def clear_search_index():
+    """Supprime l'index de recherche ; il est reconstruit à la prochaine recherche"""
+    search_index.clear()
+    return {"status": "ok"}
+
+
+@router.post("/advanced/scan/jobs")
+async def start_scan_job(request: AdvancedCopyRequest):
+    """
+    Variante en tâche de fond de /advanced/scan : retourne immédiatement un ID de tâche.
+    
+    L'avancement se suit avec GET /advanced/jobs/{job_id} et les fichiers déjà
+    trouvés se consultent par pages avec GET /advanced/jobs/{job_id}/results.
+    """
+    scan_filter = _compile_rules(request)
+    # Une nouvelle sélection remplace la précédente : son préchargement est inutile
+    prefetcher.cancel()
+    
+    def run_scan_job(job: Dict[str, Any]) -> Dict[str, Any]:
+        result = _run_scan(request, scan_filter, job["progress"])
+        if not job["progress"].cancelled:
+            # Session réutilisable par format-content, comme pour /advanced/scan
+            result["session_token"] = scan_result_store.put(result, _scan_fingerprint(request))
+            if request.prefetch:
+                _start_prefetch(request, result["matches"])
+        return result
+    
+    job_id = start_copy_job("scan", run_scan_job)
+    return {"job_id": job_id, "status": "en_cours"}
+
+
+@router.post("/advanced/format-content/jobs")
+async def start_format_content_job(request: AdvancedCopyRequest):
+    """
+    Variante en tâche de fond de /advanced/format-content : scan puis lecture des fichiers.
+    
+    Le contenu formaté jusqu'ici se récupère avec GET /advanced/jobs/{job_id}/content.
+    
+    Le budget, since_snapshot et create_snapshot s'appliquent comme pour
+    format-content (compteurs dans le contenu de la tâche terminée) ; une
+    tâche annulée n'enregistre pas d'instantané.
+    """
+    if request.output == "artifact":
+        raise HTTPException(status_code=400, detail="output=artifact n'est disponible qu'avec /advanced/format-content")
+    scan_filter = _compile_rules(request)
+    previous_manifest = _load_previous_snapshot(request)
+    
+    def run_format(job: Dict[str, Any]) -> Dict[str, Any]:
+        progress = job["progress"]
+        result = _scan_or_resume(request, scan_filter, progress)
+        if progress.cancelled:
+            return result
+        
+        invalid_paths = result.get("invalid_paths", [])
+        export = _prepare_export(request, result["matches"], previous_manifest)
+        logger.info(f"Formatage du contenu pour {len(export['to_read'])} fichiers (tâche {job['id']})")
+        with closing(_iter_export_blocks(request, export, invalid_paths)) as blocks:
+            for file_match, block, _ in blocks:
+                job["blocks"].append(block)
+                progress.add_read(file_match["size"])
+                if progress.cancelled:
+                    logger.info(f"Formatage annulé après {len(job['blocks'])} fichiers (tâche {job['id']})")
+                    break
+        
+        result["formatted_content"] = "".join(job["blocks"])
+        _export_report(export, result)
+        # Un instantané partiel marquerait comme exportés des fichiers jamais lus
+        if request.create_snapshot and not progress.cancelled:
+            result["snapshot_id"] = _save_export_snapshot(export)
+        if invalid_paths:
+            result["invalid_paths"] = invalid_paths
+        return result
+    
+    job_id = start_copy_job("format-content", run_format)
+    return {"job_id": job_id, "status": "en_cours"}
+
+
+@router.get("/advanced/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Retourne l'état d'une tâche : statut, dossiers/fichiers/octets traités, durée
+    """
+    return get_job_status(_get_job_or_404(job_id))
+
+
+@router.get("/advanced/jobs/{job_id}/results")
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(default=0, ge=0, description="Index du premier fichier"),
+    limit: int = Query(default=100, ge=1, le=1000, description="Nombre maximal de fichiers")
+):
+    """
+    Retourne une page des fichiers trouvés.
+    
+    Tant que la tâche tourne, les fichiers sont ceux trouvés jusqu'ici, dans
+    l'ordre de découverte ("partial": true) ; une fois terminée, c'est le
+    résultat final, dédoublonné et dans l'ordre des racines.
+    """
+    job = _get_job_or_404(job_id)
+    partial = job["result"] is None
+    matches = get_job_matches(job)
+    total = len(matches)
+    
+    # Même forme que les pages de /advanced/results (champ excerpt compris)
+    page = records_to_dicts(matches[offset:offset + limit])
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "partial": partial,
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "matches": page
+    }
+
+
+@router.get("/advanced/jobs/{job_id}/content")
+async def get_job_content(job_id: str):
+    """
+    Retourne le contenu formaté d'une tâche format-content (partiel tant qu'elle tourne)
+    """
+    job = _get_job_or_404(job_id)
+    if job["kind"] != "format-content":
+        raise HTTPException(status_code=400, detail=f"La tâche {job_id} ne produit pas de contenu formaté")
+    response = {
+        "job_id": job_id,
+        "status": job["status"],
+        "partial": job["result"] is None,
+        "formatted_content": "".join(job["blocks"])
+    }
+    if job["result"] is not None:
+        # Compteurs de l'export, comme dans la réponse de format-content
+        for key in ("duplicate_files", "compaction", "budget", "omitted", "changes", "snapshot_id"):
+            if key in job["result"]:
+                response[key] = job["result"][key]
+    return response
+
+
+@router.post("/advanced/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    Demande l'annulation d'une tâche ; les résultats trouvés jusque-là restent consultables
+    """
+    if cancel_copy_job(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Tâche avec ID {job_id} non trouvée")
+    return get_job_status(get_copy_job(job_id))
+
+
+@router.get("/advanced/artifacts/{artifact_id}")
+async def download_artifact(artifact_id: str):
+    """
+    Télécharge la sortie d'un format-content écrit sur disque (output = artifact).
+    
+    FileResponse gère les requêtes Range (reprise de téléchargement, depuis
+    Starlette 0.39, d'où fastapi>=0.115.3 dans requirements.txt) et transmet
+    le fichier par morceaux, ou par l'extension ASGI pathsend (sendfile) quand
+    le serveur la propose : la mémoire reste constante quelle que soit la taille.
+    """
+    collect_expired_artifacts()
+    path = get_artifact_path(artifact_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Artefact {artifact_id} non trouvé ou expiré")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=f"format-content-{artifact_id}.txt")
+
+
+@router.delete("/advanced/artifacts/{artifact_id}")
+async def remove_artifact(artifact_id: str):
+    """
+    Supprime un artefact sans attendre son expiration
+    """
+    if not delete_artifact(artifact_id):
+        raise HTTPException(status_code=404, detail=f"Artefact {artifact_id} non trouvé ou expiré")
+    return {"status": "ok", "artifact_id": artifact_id}
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Retourne les compteurs du cache de contenu (hits, misses, évictions, occupation)
+    """
+    return content_cache.stats()
+
+
+@router.delete("/cache")
+async def clear_cache():
+    """
+    Vide le cache de contenu (et celui du contenu compacté)
+    """
+    content_cache.clear()
+    compaction_cache.clear()
+    logger.info("Cache de contenu vidé")
+    return {"status": "ok", "cache": content_cache.stats()}
+
+
+@router.get("/advanced/sessions/stats")
+async def get_session_stats():
+    """
+    Retourne l'occupation des sessions de scan conservées (nombre, mémoire estimée, TTL)
+    """
+    return scan_result_store.stats()
+
+
+@router.get("/cache/prefetch")
+async def get_prefetch_stats():
+    """
+    Retourne l'état du préchargement lancé par le dernier scan (prefetch=true)
+    """
+    return prefetcher.stats()
+
+
 @router.get("/health")
 async def health_check():
     """
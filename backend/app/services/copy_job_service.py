@@ -0,0 +1,169 @@
+import time
+import uuid
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from ..utils.archives import archive_session
+from ..utils.scan_progress import ScanProgress
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.copy_jobs")
+
+# Tâches de copie en cours ou terminées (dans un vrai projet, utiliser une BD)
+COPY_JOBS: Dict[str, Dict[str, Any]] = {}
+
+# Nombre de tâches terminées conservées en mémoire
+MAX_FINISHED_JOBS = 50
+
+_jobs_lock = threading.Lock()
+
+
+def _prune_finished_jobs() -> None:
+    """Oublie les tâches terminées les plus anciennes au-delà de MAX_FINISHED_JOBS."""
+    finished = [job for job in COPY_JOBS.values() if job["status"] != "en_cours"]
+    if len(finished) <= MAX_FINISHED_JOBS:
+        return
+    finished.sort(key=lambda job: job["end_time"] or job["start_time"])
+    for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+        COPY_JOBS.pop(job["id"], None)
+
+
+def start_copy_job(kind: str, target: Callable[[Dict[str, Any]], Dict[str, Any]]) -> str:
+    """
+    Lance une tâche de copie en arrière-plan.
+
+    Args:
+        kind: Type de tâche ("scan" ou "format-content")
+        target: Fonction exécutée dans le thread ; reçoit la tâche (dont "progress")
+            et retourne le résultat final
+
+    Returns:
+        ID de la tâche
+    """
+    job_id = f"copy_{uuid.uuid4().hex[:12]}"
+    job = {
+        "id": job_id,
+        "kind": kind,
+        "status": "en_cours",
+        "start_time": time.time(),
+        "end_time": None,
+        "error": None,
+        "message": "Scan en cours",
+        "progress": ScanProgress(),
+        "result": None,
+        # Blocs formatés produits jusqu'ici (tâches format-content)
+        "blocks": [],
+    }
+
+    with _jobs_lock:
+        _prune_finished_jobs()
+        COPY_JOBS[job_id] = job
+
+    def run_job():
+        try:
+            # Les archives ouvertes par la tâche restent ouvertes jusqu'à sa fin
+            with archive_session():
+                result = target(job)
+            cancelled = job["progress"].cancelled
+            job.update({
+                "result": result,
+                "status": "annulé" if cancelled else "terminé",
+                "message": "Tâche annulée, résultats partiels disponibles" if cancelled else "Tâche terminée",
+                "end_time": time.time(),
+            })
+        except Exception as e:
+            error_msg = getattr(e, "detail", None) or str(e)
+            logger.error(f"Erreur dans la tâche {job_id}: {error_msg}")
+            job.update({
+                "status": "erreur",
+                "error": error_msg,
+                "message": f"Erreur: {error_msg}",
+                "end_time": time.time(),
+            })
+        logger.info(f"Tâche {job_id} ({kind}) : {job['status']}")
+
+    thread = threading.Thread(target=run_job, name=f"toolbox-{job_id}")
+    thread.daemon = True
+    thread.start()
+
+    logger.info(f"Tâche {job_id} ({kind}) démarrée")
+    return job_id
+
+
+def get_copy_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Récupère une tâche de copie.
+
+    Args:
+        job_id: ID de la tâche
+
+    Returns:
+        La tâche ou None si non trouvée
+    """
+    return COPY_JOBS.get(job_id)
+
+
+def cancel_copy_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Demande l'annulation d'une tâche ; le parcours s'arrête avant le dossier suivant.
+
+    Args:
+        job_id: ID de la tâche
+
+    Returns:
+        La tâche ou None si non trouvée
+    """
+    job = COPY_JOBS.get(job_id)
+    if job is not None and job["status"] == "en_cours":
+        job["progress"].cancel()
+        job["message"] = "Annulation demandée"
+        logger.info(f"Annulation demandée pour la tâche {job_id}")
+    return job
+
+
+def get_job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Retourne l'état sérialisable d'une tâche (sans les résultats).
+
+    Args:
+        job: Tâche de copie
+
+    Returns:
+        Dictionnaire avec statut, avancement et durée
+    """
+    result = job["result"]
+    end_time = job["end_time"] or time.time()
+    status = {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "message": job["message"],
+        "error": job["error"],
+        "cancel_requested": job["progress"].cancelled,
+        "progress": job["progress"].snapshot(),
+        "elapsed": round(end_time - job["start_time"], 3),
+    }
+    if result is not None:
+        status["total_matches"] = result["total_matches"]
+        status["total_subdirectories"] = result["total_subdirectories"]
+        status["invalid_paths"] = result.get("invalid_paths")
+        status["session_token"] = result.get("session_token")
+    return status
+
+
+def get_job_matches(job: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Retourne les fichiers d'une tâche : le résultat final s'il existe, sinon
+    les fichiers trouvés jusqu'ici (non dédoublonnés entre racines).
+
+    Args:
+        job: Tâche de copie
+
+    Returns:
+        Liste des fichiers
+    """
+    result = job["result"]
+    if result is not None:
+        return result["matches"]
+    return job["progress"].partial
@@ -0,0 +1,504 @@
+"""
+Archives zip et tar parcourues comme des dossiers virtuels, sans extraction.
+
+Un membre d'archive est désigné par le chemin de l'archive suivi du nom du
+membre : "/depot/sources.tar.gz/src/main.py". La liste des membres est lue
+dans le répertoire central (zip) ou les en-têtes (tar), et chaque membre
+n'est décompressé qu'au moment où on le lit.
+"""
+import io
+import os
+import re
+import stat
+import time
+import errno
+import tarfile
+import zipfile
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.archives")
+
+# Suffixes reconnus comme archives (les formats tar compressés sont lus par tarfile)
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# Segment de chemin se terminant par un suffixe d'archive (suivi d'un séparateur ou de la fin)
+_ARCHIVE_SEGMENT_RE = re.compile(
+    r"\.(?:zip|tar|tgz|tbz2|txz|tar\.gz|tar\.bz2|tar\.xz)(?=[/\\]|$)",
+    re.IGNORECASE
+)
+
+# Nombre d'index de membres (métadonnées seules) gardés entre les sessions
+INDEX_CACHE_SIZE = 8
+
+# Nombre d'archives gardées ouvertes pendant les sessions, et durée d'inactivité avant fermeture (secondes)
+HANDLE_CACHE_SIZE = 8
+HANDLE_IDLE_SECONDS = 30
+
+# Tar compressé : membres décompressés au passage et gardés pour les lecteurs en retard (octets)
+TAR_READAHEAD_BYTES = 16 * 1024 * 1024
+
+ArchiveMember = Union[zipfile.ZipInfo, tarfile.TarInfo]
+
+
+class MemberStat(NamedTuple):
+    """
+    Équivalent de os.stat_result pour un membre d'archive.
+
+    st_ino vaut 0 (les membres se dédoublonnent par chemin) et st_mtime_ns est
+    celui de l'archive : toute modification de l'archive invalide les caches
+    et instantanés de ses membres.
+    """
+    st_mode: int
+    st_ino: int
+    st_dev: int
+    st_size: int
+    st_mtime: float
+    st_mtime_ns: int
+
+
+def _member_name(name: str) -> Optional[str]:
+    """Normalise le nom d'un membre ; None pour un nom absolu ou qui remonte hors de l'archive."""
+    name = name.replace("\\", "/")
+    while name.startswith("./"):
+        name = name[2:]
+    if not name or name.startswith("/") or ".." in name.split("/"):
+        return None
+    return name
+
+
+class _ArchiveHandle:
+    """
+    Archive ouverte, avec l'index de ses membres (fichiers réguliers seulement).
+
+    Un index déjà connu évite de relire les en-têtes : un tar (compressé ou
+    non) n'est alors parcouru que jusqu'au membre lu.
+
+    Un tar compressé ne se relit pas à rebours sans tout redécompresser
+    depuis le début : ses membres sont lus en entier, dans l'ordre du flux,
+    et ceux dépassés pour atteindre le membre demandé sont gardés (jusqu'à
+    TAR_READAHEAD_BYTES) pour les lecteurs parallèles arrivés en retard.
+    """
+
+    def __init__(self, path: str, members: Optional[Dict[str, ArchiveMember]] = None):
+        self.path = path
+        self.lock = threading.Lock()
+        # Lecteurs en cours (voir ArchiveCache), dernière utilisation, retrait du cache
+        self.users = 0
+        self.last_used = time.monotonic()
+        self.evicted = False
+        # Tar compressé : position dans le flux et membres décompressés d'avance (offset_data -> contenu)
+        self.sequential = not path.lower().endswith((".zip", ".tar"))
+        self._position = 0
+        self._ahead: Dict[int, bytes] = {}
+        self._ahead_bytes = 0
+        self._by_offset: Optional[List[tarfile.TarInfo]] = None
+        try:
+            if path.lower().endswith(".zip"):
+                self.archive = zipfile.ZipFile(path)
+            else:
+                # Seul le premier en-tête est lu à l'ouverture
+                self.archive = tarfile.open(path, "r:*")
+            self.members = members if members is not None else self._read_index()
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            if hasattr(self, "archive"):
+                self.archive.close()
+            raise OSError(errno.EINVAL, f"Archive illisible: {str(e)}", path)
+
+    def _read_index(self) -> Dict[str, ArchiveMember]:
+        if isinstance(self.archive, zipfile.ZipFile):
+            infos = ((info.filename, info) for info in self.archive.infolist() if not info.is_dir())
+        else:
+            infos = ((info.name, info) for info in self.archive.getmembers() if info.isreg())
+        members = {}
+        skipped = 0
+        for name, info in infos:
+            normalized = _member_name(name)
+            if normalized is None:
+                skipped += 1
+                continue
+            members[normalized] = info
+        if skipped:
+            logger.warning(f"{skipped} membres hors de l'archive ignorés dans {self.path}")
+        return members
+
+    @staticmethod
+    def member_size(info: ArchiveMember) -> int:
+        return info.file_size if isinstance(info, zipfile.ZipInfo) else info.size
+
+    def open(self, info: ArchiveMember, shared: bool = False) -> BinaryIO:
+        if isinstance(self.archive, zipfile.ZipFile):
+            # ZipFile partage le fichier sous-jacent entre lecteurs sous son propre verrou
+            return self.archive.open(info)
+        # Lecture dans l'ordre du flux pour une archive partagée (ouverte pour un seul membre sinon)
+        if shared and self.sequential and info.size <= TAR_READAHEAD_BYTES:
+            with self.lock:
+                return io.BytesIO(self._read_in_order(info))
+        with self.lock:
+            reader = self.archive.extractfile(info)
+        return _LockedReader(reader, self.lock)
+
+    def _read_in_order(self, info: tarfile.TarInfo) -> bytes:
+        """Lit un membre d'un tar compressé sans revenir en arrière dans le flux si possible (sous verrou)."""
+        data = self._ahead.pop(info.offset_data, None)
+        if data is not None:
+            self._ahead_bytes -= len(data)
+            return data
+        if info.offset_data > self._position:
+            if self._by_offset is None:
+                self._by_offset = sorted(self.members.values(), key=lambda member: member.offset_data)
+            # Membres entre la position courante et le membre demandé : décompressés de toute façon
+            for passed in self._by_offset:
+                if passed.offset_data >= info.offset_data:
+                    break
+                if passed.offset_data < self._position or passed.offset_data in self._ahead:
+                    continue
+                if self._ahead_bytes + passed.size > TAR_READAHEAD_BYTES:
+                    break
+                content = self.archive.extractfile(passed).read()
+                self._ahead[passed.offset_data] = content
+                self._ahead_bytes += len(content)
+        data = self.archive.extractfile(info).read()
+        self._position = info.offset_data + info.size
+        return data
+
+    def close(self) -> None:
+        try:
+            self.archive.close()
+        except Exception as e:
+            logger.debug(f"Fermeture de {self.path} impossible: {str(e)}")
+
+
+class _LockedReader:
+    """Lecteur d'un membre tar : le flux de l'archive est partagé, chaque accès est verrouillé."""
+
+    def __init__(self, raw: BinaryIO, lock: threading.Lock):
+        self._raw = raw
+        self._lock = lock
+
+    def read(self, size: int = -1) -> bytes:
+        with self._lock:
+            return self._raw.read(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        with self._lock:
+            return self._raw.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._raw.tell()
+
+    def close(self) -> None:
+        self._raw.close()
+
+    def __enter__(self) -> "_LockedReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class _MemberReader:
+    """Lecteur d'un membre qui libère l'archive à sa fermeture."""
+
+    def __init__(self, raw: BinaryIO, release):
+        self._raw = raw
+        self._release = release
+
+    def read(self, size: int = -1) -> bytes:
+        return self._raw.read(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._raw.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._raw.tell()
+
+    def close(self) -> None:
+        # Une seule libération, même si le lecteur est fermé plusieurs fois
+        release, self._release = self._release, None
+        try:
+            self._raw.close()
+        finally:
+            if release is not None:
+                release()
+
+    def __enter__(self) -> "_MemberReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ArchiveCache:
+    """
+    Archives ouvertes, gardées le temps des sessions en cours.
+
+    Une session (archive_session()) couvre une requête ou une tâche de fond :
+    pendant les sessions, chaque archive n'est ouverte (et son index lu)
+    qu'une fois et reste partagée. Les sessions se chevauchent (requêtes,
+    préchargement, tâches) : une archive est donc aussi fermée, dès qu'aucun
+    lecteur ne l'utilise, quand elle a été modifiée (taille ou date), quand
+    elle est inactive depuis HANDLE_IDLE_SECONDS ou au-delà des
+    HANDLE_CACHE_SIZE plus récentes. Toutes sont fermées à la fin de la
+    dernière session. Hors session, l'archive est ouverte et refermée à
+    chaque accès.
+
+    Les index des INDEX_CACHE_SIZE dernières archives sont gardés au-delà
+    des sessions : le stat d'un membre n'ouvre alors pas l'archive.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = 0
+        # Archives ouvertes en session, de la moins à la plus récemment utilisée
+        self._handles: "OrderedDict[Tuple[str, int, int], _ArchiveHandle]" = OrderedDict()
+        self._indexes: "OrderedDict[Tuple[str, int, int], Dict[str, ArchiveMember]]" = OrderedDict()
+
+    @contextmanager
+    def session(self) -> Iterator[None]:
+        with self._lock:
+            self._sessions += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._sessions -= 1
+                to_close = self._evict(close_all=self._sessions == 0)
+            self._close(to_close)
+
+    @contextmanager
+    def acquire(self, archive_path: str) -> Iterator[_ArchiveHandle]:
+        """Fournit l'archive ouverte (partagée en session, fermée à la sortie sinon)."""
+        handle, cached = self._get(archive_path)
+        try:
+            yield handle
+        finally:
+            if cached:
+                self._release(handle)
+            else:
+                handle.close()
+
+    def _drop(self, key: Tuple[str, int, int]) -> List[_ArchiveHandle]:
+        """Retire une archive du cache (sous verrou) ; retourne les archives à fermer tout de suite."""
+        handle = self._handles.pop(key)
+        handle.evicted = True
+        # Encore lue : fermée par _release une fois le dernier lecteur fermé
+        return [handle] if handle.users == 0 else []
+
+    def _evict(self, close_all: bool = False) -> List[_ArchiveHandle]:
+        """Retire (sous verrou) les archives en trop ou inactives, ou toutes ; retourne celles à fermer."""
+        now = time.monotonic()
+        to_close = []
+        for key, handle in list(self._handles.items()):
+            idle = handle.users == 0 and (
+                len(self._handles) > HANDLE_CACHE_SIZE or now - handle.last_used > HANDLE_IDLE_SECONDS
+            )
+            if close_all or idle:
+                to_close.extend(self._drop(key))
+        return to_close
+
+    @staticmethod
+    def _close(handles: List[_ArchiveHandle]) -> None:
+        for handle in handles:
+            handle.close()
+        if handles:
+            logger.debug(f"{len(handles)} archives fermées")
+
+    def _release(self, handle: _ArchiveHandle) -> None:
+        """Libère une archive obtenue en session (fin d'acquire ou fermeture d'un membre)."""
+        with self._lock:
+            handle.users -= 1
+            handle.last_used = time.monotonic()
+            to_close = self._evict()
+            if handle.evicted and handle.users == 0 and handle not in to_close:
+                to_close.append(handle)
+        self._close(to_close)
+
+    @staticmethod
+    def _key(archive_path: str) -> Tuple[str, int, int]:
+        st = os.stat(archive_path)
+        return archive_path, st.st_size, st.st_mtime_ns
+
+    def _cached_index(self, key: Tuple[str, int, int]) -> Optional[Dict[str, ArchiveMember]]:
+        with self._lock:
+            members = self._indexes.get(key)
+            if members is not None:
+                self._indexes.move_to_end(key)
+            return members
+
+    def _get(self, archive_path: str) -> Tuple[_ArchiveHandle, bool]:
+        """
+        Archive ouverte pour ce chemin et indicateur « partagée » : une archive
+        partagée se libère avec _release, une autre se ferme après usage.
+        """
+        key = self._key(archive_path)
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None:
+                handle.users += 1
+                self._handles.move_to_end(key)
+                return handle, True
+            in_session = self._sessions > 0
+        handle = _ArchiveHandle(archive_path, self._cached_index(key))
+        to_close = []
+        with self._lock:
+            self._indexes[key] = handle.members
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > INDEX_CACHE_SIZE:
+                self._indexes.popitem(last=False)
+            if not in_session or self._sessions == 0:
+                return handle, False
+            existing = self._handles.get(key)
+            if existing is None:
+                # Version précédente de l'archive (taille ou date différente) : plus jamais lue
+                for stale_key in [other for other in self._handles if other[0] == archive_path]:
+                    to_close.extend(self._drop(stale_key))
+                self._handles[key] = existing = handle
+            existing.users += 1
+            to_close.extend(self._evict())
+        if existing is not handle:
+            # Ouverte en même temps par un autre thread
+            to_close.append(handle)
+        self._close(to_close)
+        return existing, True
+
+    def open_member(self, archive_path: str, member: str) -> BinaryIO:
+        """
+        Ouvre un membre en lecture binaire (read, seek, tell, close).
+
+        Raises:
+            FileNotFoundError: Si le membre n'existe pas dans l'archive
+            OSError: Si l'archive est illisible
+        """
+        handle, cached = self._get(archive_path)
+        release = partial(self._release, handle) if cached else handle.close
+        try:
+            info = handle.members.get(member)
+            if info is None:
+                raise FileNotFoundError(errno.ENOENT, "Membre absent de l'archive", f"{archive_path}/{member}")
+            raw = handle.open(info, shared=cached)
+        except BaseException:
+            release()
+            raise
+        return _MemberReader(raw, release)
+
+    def stat_member(self, archive_path: str, member: str) -> MemberStat:
+        """
+        Retourne le stat d'un membre (taille du membre, date de l'archive).
+
+        Raises:
+            FileNotFoundError: Si le membre n'existe pas dans l'archive
+        """
+        archive_stat = os.stat(archive_path)
+        members = self._cached_index((archive_path, archive_stat.st_size, archive_stat.st_mtime_ns))
+        if members is None:
+            with self.acquire(archive_path) as handle:
+                members = handle.members
+        info = members.get(member)
+        if info is None:
+            raise FileNotFoundError(errno.ENOENT, "Membre absent de l'archive", f"{archive_path}/{member}")
+        return MemberStat(
+            stat.S_IFREG | 0o444, 0, archive_stat.st_dev, _ArchiveHandle.member_size(info),
+            archive_stat.st_mtime, archive_stat.st_mtime_ns
+        )
+
+
+def split_archive_path(path: str) -> Optional[Tuple[str, str]]:
+    """
+    Sépare un chemin en (archive, membre) s'il traverse une archive existante.
+
+    Args:
+        path: Chemin réel ou virtuel ("archive.zip/dossier/fichier")
+
+    Returns:
+        (chemin de l'archive, nom du membre avec "/" ou "" pour l'archive
+        elle-même), ou None si le chemin ne traverse aucune archive
+    """
+    for match in _ARCHIVE_SEGMENT_RE.finditer(path):
+        archive_path = path[:match.end()]
+        if os.path.isfile(archive_path):
+            return archive_path, path[match.end():].replace("\\", "/").strip("/")
+    return None
+
+
+def is_archive_root(path: str) -> bool:
+    """
+    Indique si un chemin désigne une archive, ou un dossier dans une archive, à scanner.
+
+    Args:
+        path: Chemin fourni comme dossier racine
+
+    Returns:
+        True si l'archive est lisible et (le cas échéant) contient ce dossier
+    """
+    location = split_archive_path(path)
+    if location is None:
+        return False
+    archive_path, member_dir = location
+    try:
+        with archive_cache.acquire(archive_path) as handle:
+            if not member_dir:
+                return True
+            prefix = member_dir + "/"
+            return any(name.startswith(prefix) for name in handle.members)
+    except OSError as e:
+        logger.warning(f"Archive {archive_path} illisible: {str(e)}")
+        return False
+
+
+def iter_archive_members(archive_path: str) -> Iterator[Tuple[str, int]]:
+    """
+    Liste les membres (fichiers réguliers) d'une archive dans leur ordre de stockage.
+
+    Raises:
+        OSError: Si l'archive est illisible
+    """
+    with archive_cache.acquire(archive_path) as handle:
+        members = [(name, handle.member_size(info)) for name, info in handle.members.items()]
+    yield from members
+
+
+def stat_path(path: str) -> Union[os.stat_result, MemberStat]:
+    """
+    os.stat, étendu aux membres d'archives.
+
+    Raises:
+        OSError: Comme os.stat (FileNotFoundError pour un membre absent)
+    """
+    try:
+        return os.stat(path)
+    except OSError:
+        location = split_archive_path(path)
+        if location is None or not location[1]:
+            raise
+    return archive_cache.stat_member(*location)
+
+
+def open_path(path: str) -> BinaryIO:
+    """
+    open(path, "rb"), étendu aux membres d'archives.
+
+    Raises:
+        OSError: Comme open (FileNotFoundError pour un membre absent)
+    """
+    try:
+        return open(path, "rb")
+    except (FileNotFoundError, NotADirectoryError):
+        location = split_archive_path(path)
+        if location is None or not location[1]:
+            raise
+    return archive_cache.open_member(*location)
+
+
+# Cache des archives ouvertes, partagé par les routes et les tâches
+archive_cache = ArchiveCache()
+
+
+def archive_session():
+    """Garde les archives ouvertes jusqu'à la fin du bloc (requête ou tâche de fond)."""
+    return archive_cache.session()
@@ -0,0 +1,118 @@
+"""
+Sorties de format-content écrites sur disque (artefacts), téléchargées ensuite par le client.
+"""
+import os
+import re
+import time
+import uuid
+import logging
+from pathlib import Path
+from typing import Optional
+
+from ..config import TEMP_DIR, ARTIFACT_TTL
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.artifacts")
+
+# Dossier des artefacts
+ARTIFACT_DIR = TEMP_DIR / "copy_artifacts"
+
+_ARTIFACT_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Taille du tampon d'écriture
+_WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class ArtifactWriter:
+    """
+    Écrit une sortie bloc par bloc dans un fichier temporaire, renommé à la fermeture.
+
+    Un artefact n'est visible (et téléchargeable) qu'une fois complet ; en cas
+    d'erreur, le fichier partiel est supprimé.
+    """
+
+    def __init__(self):
+        ARTIFACT_DIR.mkdir(parents=True, exist_ok=True)
+        self.artifact_id = uuid.uuid4().hex
+        self.path = ARTIFACT_DIR / f"{self.artifact_id}.txt"
+        self._temp_path = self.path.with_suffix(".part")
+        self._file = open(self._temp_path, "w", encoding="utf-8", newline="", buffering=_WRITE_BUFFER_SIZE)
+        self.size = 0
+
+    def write(self, block: str) -> None:
+        self._file.write(block)
+
+    def __enter__(self) -> "ArtifactWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._file.close()
+        if exc_type is not None:
+            try:
+                self._temp_path.unlink()
+            except OSError:
+                pass
+            return
+        os.replace(self._temp_path, self.path)
+        self.size = self.path.stat().st_size
+        logger.info(f"Artefact {self.artifact_id} écrit ({self.size} octets)")
+
+
+def get_artifact_path(artifact_id: str) -> Optional[Path]:
+    """
+    Retourne le chemin d'un artefact existant.
+
+    Args:
+        artifact_id: Identifiant de l'artefact
+
+    Returns:
+        Chemin du fichier, ou None si l'artefact est inconnu ou expiré
+    """
+    if not _ARTIFACT_ID_RE.match(artifact_id):
+        return None
+    path = ARTIFACT_DIR / f"{artifact_id}.txt"
+    return path if path.is_file() else None
+
+
+def delete_artifact(artifact_id: str) -> bool:
+    """
+    Supprime un artefact.
+
+    Returns:
+        True si l'artefact existait
+    """
+    path = get_artifact_path(artifact_id)
+    if path is None:
+        return False
+    try:
+        path.unlink()
+    except OSError:
+        return False
+    logger.info(f"Artefact {artifact_id} supprimé")
+    return True
+
+
+def collect_expired_artifacts(ttl: float = ARTIFACT_TTL) -> int:
+    """
+    Supprime les artefacts (et les écritures abandonnées) plus vieux que ttl secondes.
+
+    Args:
+        ttl: Durée de vie en secondes depuis la dernière modification
+
+    Returns:
+        Nombre de fichiers supprimés
+    """
+    if not ARTIFACT_DIR.is_dir():
+        return 0
+    limit = time.time() - ttl
+    removed = 0
+    for entry in os.scandir(ARTIFACT_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < limit:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        logger.info(f"{removed} artefacts expirés supprimés")
+    return removed
@@ -0,0 +1,112 @@
+"""
+Sélection des fichiers à exporter dans un budget d'octets ou de tokens, avant toute lecture.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .archives import stat_path
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.budget")
+
+# Estimation usuelle : un token vaut environ 4 octets de texte
+BYTES_PER_TOKEN = 4
+
+# Octets ajoutés par format_file_for_copy autour du contenu, hors chemin et taille
+_BLOCK_OVERHEAD = len("===  () ===\n\n") + len("\n\n---\n\n")
+
+# Lignes d'annonce d'un extrait (voir read_file_excerpt)
+_EXCERPT_OVERHEAD = 200
+
+# En dessous de ce reste, aucun bloc ne peut plus tenir dans le budget
+MIN_BLOCK_SIZE = _BLOCK_OVERHEAD
+
+
+def tokens_to_bytes(tokens: int) -> int:
+    return tokens * BYTES_PER_TOKEN
+
+
+def estimate_tokens(size: int) -> int:
+    return (size + BYTES_PER_TOKEN - 1) // BYTES_PER_TOKEN
+
+
+def estimate_block_size(file_match: Dict[str, Any], excerpt_bytes: Optional[int] = None) -> int:
+    """Taille estimée du bloc formaté d'un fichier, à partir de sa seule taille sur disque."""
+    size = file_match["size"]
+    if file_match.get("excerpt") and excerpt_bytes:
+        # Un extrait lit au plus deux fois excerpt_bytes, plus ses lignes d'annonce
+        size = min(size, 2 * excerpt_bytes + _EXCERPT_OVERHEAD)
+    return size + len(file_match["path"].encode("utf-8")) + len(file_match.get("size_human", "")) + _BLOCK_OVERHEAD
+
+
+def _rank_key(order: str, priority: Dict[str, int], mtimes: Dict[str, int]):
+    def key(item: Tuple[int, Dict[str, Any]]):
+        index, file_match = item
+        rank = priority.get(file_match["extension"].lower(), len(priority))
+        if order == "smallest":
+            return (rank, file_match["size"], index)
+        if order == "recent":
+            return (rank, -mtimes.get(file_match["path"], 0), index)
+        return (rank, index)
+    return key
+
+
+def select_within_budget(
+    matches: List[Dict[str, Any]],
+    budget_bytes: int,
+    order: str = "smallest",
+    priority_extensions: Sequence[str] = (),
+    excerpt_bytes: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Choisit les fichiers à lire sans dépasser le budget, d'après les métadonnées du scan.
+
+    Les fichiers sont classés par extension prioritaire (dans l'ordre donné),
+    puis selon `order` ; chaque fichier dont le bloc estimé tient encore dans
+    le budget est retenu, les autres sont écartés sans être lus.
+
+    Args:
+        matches: Fichiers scannés
+        budget_bytes: Budget en octets de sortie formatée
+        order: "smallest" (plus petits d'abord), "recent" (plus récents d'abord, un stat
+            par fichier) ou "scan" (ordre du scan)
+        priority_extensions: Extensions à placer en tête, par ordre de priorité
+        excerpt_bytes: Taille des extraits, pour estimer les fichiers lus en extrait
+
+    Returns:
+        Tuple (fichiers retenus dans l'ordre du scan, fichiers écartés avec "reason")
+    """
+    priority = {}
+    for ext in priority_extensions:
+        priority.setdefault(ext.lower().lstrip("."), len(priority))
+
+    mtimes = {}
+    if order == "recent":
+        for file_match in matches:
+            try:
+                mtimes[file_match["path"]] = stat_path(file_match["path"]).st_mtime_ns
+            except OSError:
+                pass
+
+    remaining = budget_bytes
+    selected_indexes = set()
+    for index, file_match in sorted(enumerate(matches), key=_rank_key(order, priority, mtimes)):
+        cost = estimate_block_size(file_match, excerpt_bytes)
+        if cost <= remaining:
+            selected_indexes.add(index)
+            remaining -= cost
+
+    selected = [file_match for index, file_match in enumerate(matches) if index in selected_indexes]
+    omitted = [omitted_entry(file_match, "budget") for index, file_match in enumerate(matches) if index not in selected_indexes]
+    logger.info(f"Budget de {budget_bytes} octets : {len(selected)} fichiers retenus, {len(omitted)} écartés")
+    return selected, omitted
+
+
+def omitted_entry(file_match: Dict[str, Any], reason: str) -> Dict[str, Any]:
+    return {"path": file_match["path"], "size": file_match["size"], "reason": reason}
+
+
+def resolve_budget(budget_bytes: Optional[int], budget_tokens: Optional[int]) -> Optional[int]:
+    """Budget effectif en octets (le plus strict des deux s'ils sont tous deux fournis)."""
+    budgets = [value for value in (budget_bytes, tokens_to_bytes(budget_tokens) if budget_tokens is not None else None) if value is not None]
+    return min(budgets) if budgets else None
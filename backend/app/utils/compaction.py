@@ -0,0 +1,295 @@
+"""
+Compactage du contenu des fichiers avant formatage (export vers un LLM).
+"""
+import io
+import ast
+import logging
+import tokenize
+from typing import Dict, List, Optional, Set
+
+from ..config import COMPACTION_CACHE_MAX_BYTES
+from .content_cache import ContentCache
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.compaction")
+
+# Modes de compactage :
+# - none : contenu verbatim
+# - whitespace : espaces de fin de ligne retirés, lignes vides consécutives fusionnées
+# - strip : Python sans commentaires, docstrings, lignes vides ni corps des longs littéraux
+# - skeleton : Python réduit aux imports, signatures, attributs de classe et résumés de docstrings
+COMPACTION_MODES = ("none", "whitespace", "strip", "skeleton")
+
+# Extensions traitées comme du Python (les autres fichiers ont le compactage des espaces)
+PYTHON_EXTENSIONS = frozenset({"py", "pyi", "pyw"})
+
+# Un littéral de données (liste, dict...) sur plus de lignes que ceci est abrégé en mode strip
+LITERAL_MAX_LINES = 12
+# Lignes gardées au début d'un littéral abrégé
+LITERAL_KEEP_LINES = 3
+
+# Au-delà de cette longueur, la valeur d'une affectation est remplacée par "..." dans le squelette
+SKELETON_VALUE_MAX_LENGTH = 80
+
+# Depuis Python 3.12, une f-string est découpée en FSTRING_START, FSTRING_MIDDLE... FSTRING_END
+_FSTRING_START = getattr(tokenize, "FSTRING_START", None)
+_FSTRING_END = getattr(tokenize, "FSTRING_END", None)
+
+
+def collapse_whitespace(text: str) -> str:
+    """
+    Compactage générique : espaces de fin de ligne retirés, lignes vides consécutives fusionnées.
+
+    Args:
+        text: Contenu du fichier
+
+    Returns:
+        Contenu compacté (sans ligne vide au début ni à la fin)
+    """
+    lines = []
+    for line in text.split("\n"):
+        line = line.rstrip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+def _docstring_node(owner: ast.AST) -> Optional[ast.Expr]:
+    body = getattr(owner, "body", None)
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) and isinstance(body[0].value.value, str):
+        return body[0]
+    return None
+
+
+def _is_data_literal(node: ast.AST) -> bool:
+    """Littéral composé uniquement de constantes (et de littéraux de constantes)."""
+    if isinstance(node, ast.Constant):
+        return True
+    if isinstance(node, ast.UnaryOp) and isinstance(node.operand, ast.Constant):
+        return True
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return all(_is_data_literal(element) for element in node.elts)
+    if isinstance(node, ast.Dict):
+        return all(key is not None and _is_data_literal(key) for key in node.keys) and all(
+            _is_data_literal(value) for value in node.values
+        )
+    return False
+
+
+def _drop_docstring(owner: ast.AST, lines: List[str], replaced: Dict[int, str], dropped: Set[int]) -> None:
+    """Retire les lignes de la docstring d'un module, d'une classe ou d'une fonction."""
+    docstring = _docstring_node(owner)
+    if docstring is None or docstring.lineno == getattr(owner, "lineno", 0):
+        return
+    first, last = docstring.lineno, docstring.end_lineno
+    # Ne retirer que des lignes occupées par la seule docstring
+    if lines[first - 1][:docstring.col_offset].strip() or lines[last - 1][docstring.end_col_offset:].strip():
+        return
+    dropped.update(range(first, last + 1))
+    if len(owner.body) == 1 and not isinstance(owner, ast.Module):
+        dropped.discard(first)
+        replaced[first] = " " * docstring.col_offset + "..."
+
+
+def _elide_literal(node: ast.expr, lines: List[str], replaced: Dict[int, str], dropped: Set[int]) -> bool:
+    """Abrège un long littéral de données après ses premières lignes ; False s'il est gardé."""
+    if not _is_data_literal(node):
+        return False
+    # Éléments (début, fin) ; la coupe se fait entre deux éléments sur des lignes distinctes
+    if isinstance(node, ast.Dict):
+        spans = [(key.lineno, value.end_lineno) for key, value in zip(node.keys, node.values)]
+    else:
+        spans = [(element.lineno, element.end_lineno) for element in node.elts]
+    head = node.lineno + LITERAL_KEEP_LINES
+    cut = next((index for index, (_, end) in enumerate(spans) if end >= head), None)
+    if cut is None or spans[cut][0] <= (spans[cut - 1][1] if cut else node.lineno) or spans[-1][1] >= node.end_lineno:
+        return False
+    first, last = spans[cut][0], spans[-1][1]
+    # Éléments entre parenthèses (absentes de l'AST) : coupe non sûre, littéral gardé
+    if not lines[first - 2].rstrip().endswith((",", "[", "{", "(")) or last + 1 != node.end_lineno \
+            or not lines[last].lstrip().startswith(("]", "}", ")")):
+        return False
+    indent = len(lines[first - 1]) - len(lines[first - 1].lstrip())
+    placeholder = "...: ..." if isinstance(node, ast.Dict) else "..."
+    replaced[first] = " " * indent + f"{placeholder},  # {len(spans) - cut} éléments omis"
+    dropped.update(range(first + 1, last + 1))
+    return True
+
+
+def strip_python(source: str) -> str:
+    """
+    Retire les commentaires, docstrings et lignes vides d'un source Python.
+
+    Les commentaires sont repérés par tokenize (jamais à l'intérieur d'une
+    chaîne), les docstrings et littéraux par ast. Un bloc qui ne contenait
+    que sa docstring garde "..." pour rester valide, et la fin d'un long
+    littéral de données est remplacée par "..." suivi du nombre d'éléments
+    omis. Le contenu des chaînes sur plusieurs lignes est conservé tel quel.
+
+    Args:
+        source: Source Python (fins de ligne "\\n")
+
+    Returns:
+        Source compacté
+
+    Raises:
+        SyntaxError: Si le source n'est pas analysable
+    """
+    tree = ast.parse(source)
+    lines = source.split("\n")
+    dropped: Set[int] = set()
+    replaced: Dict[int, str] = {}
+
+    # Un seul parcours : les expressions sur peu de lignes (l'immense majorité) ne sont pas visitées
+    pending: List[ast.AST] = [tree]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, ast.expr):
+            if node.end_lineno - node.lineno + 1 <= LITERAL_MAX_LINES:
+                continue
+            if isinstance(node, (ast.List, ast.Tuple, ast.Set, ast.Dict)) and _elide_literal(node, lines, replaced, dropped):
+                continue
+        elif isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            _drop_docstring(node, lines, replaced, dropped)
+        pending.extend(ast.iter_child_nodes(node))
+
+    comments: Dict[int, int] = {}
+    string_lines: Set[int] = set()
+    # Ligne de début de chaque f-string ouverte (imbriquées depuis Python 3.12)
+    fstring_starts: List[int] = []
+    for token in tokenize.generate_tokens(io.StringIO(source).readline):
+        if token.type == tokenize.COMMENT:
+            comments[token.start[0]] = token.start[1]
+        elif token.type == tokenize.STRING and token.end[0] > token.start[0]:
+            # Lignes d'une chaîne sur plusieurs lignes, sauf la dernière : contenu à préserver
+            string_lines.update(range(token.start[0], token.end[0]))
+        elif token.type == _FSTRING_START:
+            fstring_starts.append(token.start[0])
+        elif token.type == _FSTRING_END:
+            string_lines.update(range(fstring_starts.pop(), token.end[0]))
+
+    output: List[str] = []
+    for number, line in enumerate(lines, 1):
+        if number in replaced:
+            output.append(replaced[number])
+            continue
+        if number in dropped:
+            continue
+        if number in comments:
+            line = line[:comments[number]]
+        if number not in string_lines:
+            line = line.rstrip()
+            if not line:
+                continue
+        output.append(line)
+    return "\n".join(output)
+
+
+def _summary(owner: ast.AST) -> List[ast.stmt]:
+    """Docstring réduite à sa première ligne, sous forme d'instruction."""
+    docstring = ast.get_docstring(owner) if _docstring_node(owner) is not None else None
+    summary = docstring.strip().split("\n")[0].strip() if docstring else ""
+    return [ast.Expr(ast.Constant(summary))] if summary else []
+
+
+def _skeleton_body(owner: ast.AST) -> List[ast.stmt]:
+    body: List[ast.stmt] = _summary(owner)
+    for node in owner.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            body.append(node)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            node.body = _summary(node) + [ast.Expr(ast.Constant(...))]
+            body.append(node)
+        elif isinstance(node, ast.ClassDef):
+            node.body = _skeleton_body(node)
+            body.append(node)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            if node.value is not None and len(ast.unparse(node.value)) > SKELETON_VALUE_MAX_LENGTH:
+                node.value = ast.Constant(...)
+            body.append(node)
+    if not body and not isinstance(owner, ast.Module):
+        body.append(ast.Expr(ast.Constant(...)))
+    return body
+
+
+def python_skeleton(source: str) -> str:
+    """
+    Réduit un source Python à son squelette.
+
+    Sont gardés les imports, les affectations de module et de classe (valeur
+    longue remplacée par "..."), les classes et les signatures de fonctions
+    avec leurs décorateurs ; chaque corps de fonction devient "..." précédé
+    de la première ligne de sa docstring. Le reste du code de module est omis.
+
+    Args:
+        source: Source Python
+
+    Returns:
+        Squelette (reformaté par ast.unparse, sans commentaires)
+
+    Raises:
+        SyntaxError: Si le source n'est pas analysable
+    """
+    tree = ast.parse(source)
+    tree.body = _skeleton_body(tree)
+    return ast.unparse(tree)
+
+
+def compact_content(content: str, mode: str, extension: str = "") -> str:
+    """
+    Compacte un contenu selon le mode et le langage (d'après l'extension).
+
+    Les modes strip et skeleton s'appliquent aux fichiers Python analysables ;
+    les autres fichiers (et un Python invalide ou tronqué en extrait) ont le
+    compactage générique des espaces.
+
+    Args:
+        content: Contenu du fichier
+        mode: Un des COMPACTION_MODES
+        extension: Extension du fichier (sans le point)
+
+    Returns:
+        Contenu compacté
+    """
+    if mode == "none":
+        return content
+    if mode in ("strip", "skeleton") and extension.lower() in PYTHON_EXTENSIONS:
+        try:
+            return strip_python(content) if mode == "strip" else python_skeleton(content)
+        except (SyntaxError, ValueError, tokenize.TokenError, RecursionError) as e:
+            logger.debug(f"Source Python non analysable, compactage des espaces: {str(e)}")
+    return collapse_whitespace(content)
+
+
+# Contenus compactés, partagés par les requêtes du processus
+compaction_cache = ContentCache(COMPACTION_CACHE_MAX_BYTES)
+
+
+def compact_file_content(file_path: str, content: str, mode: str, extension: str = "") -> str:
+    """
+    Compacte le contenu d'un fichier en passant par le cache de compactage.
+
+    L'entrée est rangée sous (chemin, mode) et n'est valide que pour le même
+    texte (longueur et hash de la chaîne, que Python ne calcule qu'une fois
+    par chaîne) : une nouvelle version du fichier remplace l'ancienne.
+
+    Args:
+        file_path: Chemin du fichier
+        content: Contenu lu
+        mode: Un des COMPACTION_MODES
+        extension: Extension du fichier (sans le point)
+
+    Returns:
+        Contenu compacté
+    """
+    if mode == "none":
+        return content
+    key = (file_path, mode)
+    signature = (len(content), hash(content))
+    compacted = compaction_cache.get(key, signature)
+    if compacted is None:
+        compacted = compact_content(content, mode, extension)
+        compaction_cache.put(key, signature, compacted)
+    return compacted
@@ -0,0 +1,153 @@
+"""
+Cache LRU en mémoire du contenu décodé des fichiers, borné en octets.
+"""
+import os
+import sys
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from ..config import CONTENT_CACHE_MAX_BYTES, MAX_FILE_SIZE
+from .file_utils import read_file_content
+from .archives import stat_path
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.content_cache")
+
+# Préfixes des messages renvoyés par read_file_content en cas d'erreur (jamais mis en cache)
+READ_ERROR_PREFIXES = ("[Erreur", "[Fichier non")
+
+
+def file_signature(st: os.stat_result) -> Tuple[int, int, int, int]:
+    """
+    Identité d'une version de fichier : (st_dev, st_ino, st_size, st_mtime_ns).
+    """
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class ContentCache:
+    """
+    Cache LRU thread-safe dont la taille totale est bornée en octets.
+    
+    Chaque entrée est rangée sous une clé (le chemin du fichier) avec une
+    signature ; une entrée n'est valide que si la signature fournie à la
+    lecture est identique. Une nouvelle version du fichier remplace donc
+    l'ancienne au lieu de s'y ajouter.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, signature: Any) -> Optional[Any]:
+        """
+        Retourne la valeur en cache si sa signature correspond, sinon None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != signature:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, signature: Any, value: Any, size: Optional[int] = None) -> bool:
+        """
+        Ajoute (ou remplace) une entrée et évince les plus anciennes si nécessaire.
+        
+        Args:
+            key: Clé de l'entrée
+            signature: Signature de la version mise en cache
+            value: Valeur à stocker
+            size: Taille en octets (sys.getsizeof(value) par défaut)
+            
+        Returns:
+            True si la valeur a été mise en cache
+        """
+        if size is None:
+            size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return False
+        
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._current_bytes -= previous[2]
+            
+            self._entries[key] = (signature, value, size)
+            self._current_bytes += size
+            
+            while self._current_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        """Vide le cache et remet les compteurs à zéro."""
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs et occupation du cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Cache partagé par toutes les requêtes du processus
+content_cache = ContentCache(CONTENT_CACHE_MAX_BYTES)
+
+
+def read_file_content_cached(file_path: str, excerpt_bytes: Optional[int] = None) -> str:
+    """
+    Lit le contenu d'un fichier en passant par le cache de contenu.
+    
+    Un seul stat suffit pour revalider l'entrée : la clé effective est
+    (chemin, st_dev, st_ino, st_size, st_mtime_ns). Les messages d'erreur de
+    read_file_content ne sont jamais mis en cache.
+    
+    Args:
+        file_path: Chemin du fichier à lire
+        excerpt_bytes: Taille des extraits pour les fichiers plus gros que MAX_FILE_SIZE
+        
+    Returns:
+        Contenu du fichier (ou message d'erreur de read_file_content)
+    """
+    if content_cache.max_bytes <= 0:
+        return read_file_content(file_path, excerpt_bytes)
+    
+    try:
+        signature = file_signature(stat_path(file_path))
+    except OSError:
+        # Laisser read_file_content produire son message d'erreur habituel
+        return read_file_content(file_path, excerpt_bytes)
+    
+    # Un extrait dépend de sa taille : il a sa propre clé
+    key = (file_path, excerpt_bytes) if excerpt_bytes and signature[2] > MAX_FILE_SIZE else file_path
+    content = content_cache.get(key, signature)
+    if content is not None:
+        logger.debug(f"Contenu servi depuis le cache: {file_path}")
+        return content
+    
+    content = read_file_content(file_path, excerpt_bytes)
+    if not content.startswith(READ_ERROR_PREFIXES):
+        content_cache.put(key, signature, content)
+    return content
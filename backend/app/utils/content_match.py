@@ -0,0 +1,249 @@
+"""
+Sélection des fichiers sur leur contenu (règle include_content_patterns), à la manière de grep -l.
+"""
+import io
+import re
+import mmap
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Union
+
+from ..config import READ_WORKERS
+from .archives import open_path
+from .file_utils import SNIFF_BLOCK_SIZE, is_binary_block, _detect_multibyte_encoding, read_file_content
+from .scan_progress import ScanProgress
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.content_match")
+
+# Taille d'une fenêtre de recherche dans un fichier projeté en mémoire (étendue jusqu'à la fin de ligne)
+CHUNK_SIZE = 1024 * 1024
+
+# Recouvrement entre deux fenêtres : une correspondance sur plusieurs lignes est trouvée si elle tient dans cette taille
+MAX_MATCH_SPAN = 64 * 1024
+
+# Drapeaux par défaut d'un motif compilé (sert à repérer les motifs avec drapeaux en ligne)
+_DEFAULT_FLAGS = re.compile(b"").flags
+
+# Échappements dont le sens diffère entre octets et texte décodé : classes Unicode
+# (\w, \b, \s...) et caractères donnés par leur code (contrôle ou non ASCII)
+_TEXT_ONLY_ESCAPES = frozenset("wWbBdDsSNxuU0rfva")
+
+# Drapeaux en ligne, globaux ou limités à un groupe : (?i), (?i:...), (?mi-s:...)
+_INLINE_FLAGS_RE = re.compile(r"\(\?([aiLmsux]*)(?:-[imsx]*)?[:)]")
+
+# Retour chariot seul (ancienne fin de ligne Mac) : traité comme un saut de ligne par read_file_content
+_LONE_CR_RE = re.compile(rb"\r(?!\n)")
+
+
+def _byte_pattern_source(pattern: str) -> Optional[str]:
+    """
+    Réécrit un motif ASCII pour le chercher dans les octets bruts avec le même sens que sur le texte décodé.
+
+    Le texte de read_file_content a des fins de ligne "\\n" : $ accepte donc
+    un "\\r" avant le saut de ligne, et \\n un "\\r" qui le précède. Les motifs
+    dont le sens dépend du décodage (., [^...], \\w, \\b, \\s, insensibilité à
+    la casse, caractères par leur code) restent sur le texte décodé.
+
+    Args:
+        pattern: Motif ASCII
+
+    Returns:
+        Motif à compiler en octets, ou None s'il doit être cherché sur le texte décodé
+    """
+    if "\r" in pattern or any("i" in match.group(1) for match in _INLINE_FLAGS_RE.finditer(pattern)):
+        return None
+    source = []
+    in_class = False
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            escaped = pattern[index + 1:index + 2]
+            if escaped in _TEXT_ONLY_ESCAPES or (escaped == "n" and in_class):
+                return None
+            # \NNN (trois chiffres octaux) désigne un caractère, pas une référence arrière
+            if escaped.isdigit() and pattern[index + 2:index + 4].isdigit():
+                return None
+            source.append("\\r?\\n" if escaped == "n" else char + escaped)
+            index += 2
+            continue
+        if in_class:
+            if char == "]":
+                in_class = False
+        elif char == "[":
+            if pattern[index + 1:index + 2] == "^":
+                return None
+            in_class = True
+            # "]" juste après "[" fait partie de la classe
+            if pattern[index + 1:index + 2] == "]":
+                source.append("[]")
+                index += 2
+                continue
+        elif char == ".":
+            return None
+        elif char == "$":
+            source.append("(?=\\r?$)")
+            index += 1
+            continue
+        source.append(char)
+        index += 1
+    source = "".join(source)
+    try:
+        re.compile(source.encode("ascii"), re.MULTILINE)
+    except re.error:
+        # Par exemple \n réécrit dans un lookbehind, qui doit garder une largeur fixe
+        return None
+    return source
+
+
+class ContentMatcher:
+    """
+    Cherche des expressions régulières dans le contenu brut des fichiers.
+
+    Les motifs ASCII sont compilés en motifs d'octets et cherchés directement
+    dans le fichier projeté en mémoire (mmap), par fenêtres alignées sur les
+    lignes, jusqu'à la première correspondance : un fichier qui ne correspond
+    pas n'est jamais décodé. Les fichiers binaires sont écartés sur leur
+    premier bloc. Le résultat est celui de la recherche sur le texte de
+    read_file_content : les motifs dont le sens dépend du décodage (voir
+    _byte_pattern_source), ceux contenant des caractères non ASCII, les
+    fichiers UTF-16/32 et ceux aux fins de ligne "\\r" seules sont traités
+    sur le texte décodé.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = tuple(patterns)
+        # ^ et $ portent sur chaque ligne, comme grep
+        self._text_patterns = [re.compile(pattern, re.MULTILINE) for pattern in self.patterns]
+        byte_sources = [_byte_pattern_source(pattern) if pattern.isascii() else None for pattern in self.patterns]
+        self._decoded_only = [
+            compiled for source, compiled in zip(byte_sources, self._text_patterns) if source is None
+        ]
+        byte_sources = [source for source in byte_sources if source is not None]
+        # \Z correspondrait à la fin de chaque fenêtre : ces motifs sont cherchés sur le fichier entier
+        self._byte_patterns = self._compile_byte_patterns([source for source in byte_sources if "\\Z" not in source])
+        self._whole_file_patterns = [re.compile(source.encode("ascii"), re.MULTILINE) for source in byte_sources if "\\Z" in source]
+
+    @staticmethod
+    def _compile_byte_patterns(patterns: List[str]) -> List[Pattern]:
+        """Compile les motifs ASCII en motifs d'octets, combinés en un seul quand c'est sûr."""
+        combinable = []
+        separate = []
+        for pattern in patterns:
+            compiled = re.compile(pattern.encode("ascii"), re.MULTILINE)
+            # Les groupes (références arrière) et drapeaux en ligne changent de sens une fois combinés
+            if compiled.groups == 0 and compiled.flags == _DEFAULT_FLAGS | re.MULTILINE:
+                combinable.append(pattern)
+            else:
+                separate.append(compiled)
+        if len(combinable) > 1:
+            combined = "|".join(f"(?:{pattern})" for pattern in combinable)
+            return [re.compile(combined.encode("ascii"), re.MULTILINE)] + separate
+        return [re.compile(pattern.encode("ascii"), re.MULTILINE) for pattern in combinable] + separate
+
+    def matches(self, file_path: str) -> bool:
+        """
+        Indique si le contenu d'un fichier correspond à l'un des motifs.
+
+        Args:
+            file_path: Chemin du fichier
+
+        Returns:
+            True si un motif est trouvé ; False pour un fichier binaire ou illisible
+        """
+        try:
+            with open_path(file_path) as f:
+                head = f.read(SNIFF_BLOCK_SIZE)
+                if is_binary_block(head):
+                    return False
+                if _detect_multibyte_encoding(head) or _LONE_CR_RE.search(head):
+                    return self._matches_text(file_path, self._text_patterns)
+
+                if len(head) < SNIFF_BLOCK_SIZE:
+                    # Petit fichier : déjà entièrement lu
+                    found = any(pattern.search(head) for pattern in self._byte_patterns + self._whole_file_patterns)
+                elif isinstance(f, io.BufferedReader):
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        if hasattr(mapped, "madvise"):
+                            mapped.madvise(mmap.MADV_SEQUENTIAL)
+                        found = self._search_mapped(mapped) or any(
+                            pattern.search(mapped) for pattern in self._whole_file_patterns
+                        )
+                else:
+                    # Membre d'archive : décompressé en mémoire, sans projection possible
+                    data = head + f.read()
+                    found = self._search_mapped(data) or any(
+                        pattern.search(data) for pattern in self._whole_file_patterns
+                    )
+        except (OSError, ValueError) as e:
+            logger.debug(f"Recherche dans {file_path} impossible: {str(e)}")
+            return False
+
+        if found or not self._decoded_only:
+            return found
+        return self._matches_text(file_path, self._decoded_only)
+
+    def _search_mapped(self, mapped: Union[mmap.mmap, bytes]) -> bool:
+        size = len(mapped)
+        start = 0
+        while self._byte_patterns:
+            # Fenêtre arrêtée juste avant un saut de ligne : ^ et $ y gardent leur sens
+            end = size
+            if start + CHUNK_SIZE < size:
+                newline = mapped.find(b"\n", start + CHUNK_SIZE)
+                if newline != -1:
+                    end = newline
+            for pattern in self._byte_patterns:
+                if pattern.search(mapped, start, end):
+                    return True
+            if end >= size:
+                return False
+            # Fenêtre suivante : depuis un début de ligne, en reprenant la fin de la précédente
+            start = mapped.find(b"\n", max(start, end - MAX_MATCH_SPAN)) + 1
+        return False
+
+    @staticmethod
+    def _matches_text(file_path: str, patterns: List[Pattern]) -> bool:
+        content = read_file_content(file_path)
+        if content.startswith(("[Erreur", "[Fichier non", "[Contenu binaire")):
+            return False
+        return any(pattern.search(content) for pattern in patterns)
+
+
+def filter_by_content(
+    matches: List[Dict[str, Any]],
+    matcher: ContentMatcher,
+    max_workers: Optional[int] = None,
+    progress: Optional[ScanProgress] = None
+) -> List[Dict[str, Any]]:
+    """
+    Ne garde que les fichiers dont le contenu correspond, en conservant l'ordre.
+
+    Les fichiers sont examinés dans un pool de threads ; une fois la tâche
+    annulée, les fichiers restants sont écartés sans être ouverts.
+
+    Args:
+        matches: Fichiers trouvés par le scan
+        matcher: Motifs compilés
+        max_workers: Nombre de threads (config.READ_WORKERS par défaut)
+        progress: Suivi d'avancement de la tâche, pour l'annulation
+
+    Returns:
+        Fichiers dont le contenu correspond à l'un des motifs
+    """
+    workers = max_workers if max_workers is not None else READ_WORKERS
+
+    def check(file_match) -> bool:
+        if progress is not None and progress.cancelled:
+            return False
+        return matcher.matches(file_match["path"])
+
+    if workers <= 1 or len(matches) <= 1:
+        kept = [file_match for file_match in matches if check(file_match)]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="toolbox-content-match") as executor:
+            kept = [file_match for file_match, keep in zip(matches, executor.map(check, matches)) if keep]
+
+    logger.info(f"Filtre sur le contenu: {len(kept)} fichiers sur {len(matches)} correspondent")
+    return kept
@@ -0,0 +1,174 @@
+"""
+Enregistrement compact des fichiers trouvés par le scan.
+"""
+import sys
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Extensions rencontrées, codées par un petit entier (0 = sans extension)
+_extension_names: List[str] = [""]
+_extension_codes: Dict[str, int] = {"": 0}
+_extension_lock = threading.Lock()
+
+
+def extension_code(extension: str) -> int:
+    """
+    Retourne le code entier d'une extension (attribué à la première rencontre).
+
+    Args:
+        extension: Extension sans le point
+
+    Returns:
+        Code de l'extension
+    """
+    code = _extension_codes.get(extension)
+    if code is None:
+        with _extension_lock:
+            code = _extension_codes.get(extension)
+            if code is None:
+                code = len(_extension_names)
+                _extension_names.append(extension)
+                _extension_codes[extension] = code
+    return code
+
+
+def intern_prefix(directory: str) -> str:
+    """
+    Retourne le préfixe "dossier/" partagé par tous les fichiers d'un dossier.
+
+    Le préfixe est interné : les fichiers d'un même dossier, y compris entre
+    plusieurs scans, référencent une seule chaîne.
+
+    Args:
+        directory: Chemin du dossier (séparateurs "\\" ou "/")
+
+    Returns:
+        Préfixe normalisé avec "/" et terminé par "/"
+    """
+    prefix = directory.replace("\\", "/")
+    if not prefix.endswith("/"):
+        prefix += "/"
+    return sys.intern(prefix)
+
+
+def format_size_human(size: int) -> str:
+    """
+    Formate une taille en octets, Ko ou Mo.
+
+    Args:
+        size: Taille en octets
+
+    Returns:
+        Taille lisible (ex: "512 octets", "1.5 Ko", "2.0 Mo")
+    """
+    if size < 1024:
+        return f"{size} octets"
+    elif size < 1024 * 1024:
+        return f"{size / 1024:.1f} Ko"
+    return f"{size / (1024 * 1024):.1f} Mo"
+
+
+class FileRecord:
+    """
+    Fichier trouvé par le scan, stocké sans dictionnaire.
+
+    Le chemin est reconstitué à partir du préfixe de dossier interné et du
+    nom, l'extension est un code entier et la taille formatée n'est calculée
+    qu'à la lecture. L'accès par clé (record["path"], record.get("excerpt"),
+    "size_human" in record) reproduit celui des anciens dictionnaires, et
+    to_dict() donne la forme renvoyée par l'API.
+    """
+
+    __slots__ = ("prefix", "name", "size", "ext_code", "excerpt", "identity")
+
+    def __init__(
+        self,
+        prefix: str,
+        name: str,
+        size: int,
+        extension: str = "",
+        excerpt: bool = False,
+        identity: Optional[Tuple[int, int]] = None
+    ):
+        self.prefix = prefix
+        self.name = name
+        self.size = size
+        self.ext_code = extension_code(extension)
+        self.excerpt = excerpt
+        # (st_dev, st_ino), utilisé pour le dédoublonnage entre racines puis effacé
+        self.identity = identity
+
+    @classmethod
+    def from_path(cls, path: str, size: int, extension: str = "", excerpt: bool = False) -> "FileRecord":
+        """Construit un enregistrement à partir d'un chemin complet (séparateurs "/")."""
+        head, separator, name = path.rpartition("/")
+        return cls(sys.intern(head + separator), name, size, extension, excerpt)
+
+    @property
+    def path(self) -> str:
+        return self.prefix + self.name
+
+    @property
+    def extension(self) -> str:
+        return _extension_names[self.ext_code]
+
+    @property
+    def size_human(self) -> str:
+        return format_size_human(self.size)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "path":
+            return self.prefix + self.name
+        if key == "name":
+            return self.name
+        if key == "size":
+            return self.size
+        if key == "extension":
+            return _extension_names[self.ext_code]
+        if key == "size_human":
+            return format_size_human(self.size)
+        if key == "excerpt" and self.excerpt:
+            return True
+        if key == "identity" and self.identity is not None:
+            return self.identity
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def keys(self) -> Iterator[str]:
+        yield from ("path", "name", "size", "size_human", "extension")
+        if self.excerpt:
+            yield "excerpt"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Retourne le fichier sous la forme attendue par l'API (FileMatch).
+
+        Returns:
+            Dictionnaire avec path, name, size, size_human, extension (et excerpt le cas échéant)
+        """
+        file_info = {
+            "path": self.prefix + self.name,
+            "name": self.name,
+            "size": self.size,
+            "size_human": format_size_human(self.size),
+            "extension": _extension_names[self.ext_code],
+        }
+        if self.excerpt:
+            file_info["excerpt"] = True
+        return file_info
+
+    def __repr__(self) -> str:
+        return f"FileRecord({self.prefix + self.name!r}, size={self.size})"
+
+
+def records_to_dicts(matches: List[Any]) -> List[Dict[str, Any]]:
+    """Convertit une liste de fichiers (enregistrements ou dictionnaires) pour la sérialisation."""
+    return [match.to_dict() if isinstance(match, FileRecord) else match for match in matches]
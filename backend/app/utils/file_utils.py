@@ -1,15 +1,36 @@
 import os
 import re
+import stat
+import codecs
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 
-from ..config import MAX_FILE_SIZE
+from ..config import MAX_FILE_SIZE, READ_WORKERS
+from .scan_filter import ScanFilter
+from .gitignore import initial_ignore_chain, is_ignored, load_ignore_file
+from .scan_progress import ScanProgress
+from .file_record import FileRecord, format_size_human, intern_prefix
+from .archives import iter_archive_members, open_path, split_archive_path, stat_path
 
 # Configuration du logger
 logger = logging.getLogger("toolbox.file_utils")
 
 
+def _get_extension(filename: str) -> str:
+    """
+    Retourne l'extension d'un nom de fichier (sans le point).
+    
+    Même sémantique que Path.suffix, sans créer d'objet Path pour chaque fichier.
+    """
+    index = filename.rfind(".")
+    if 0 < index < len(filename) - 1:
+        return filename[index + 1:]
+    return ""
+
+
 def scan_directory(
     directory: str,
     include_extensions: List[str] = [],
@@ -17,11 +38,21 @@ def scan_directory(
     include_patterns: List[str] = [],
     exclude_patterns: List[str] = [],
     exclude_directories: List[str] = [],
-    recursive: bool = True
+    recursive: bool = True,
+    scan_filter: Optional[ScanFilter] = None,
+    with_identity: bool = False,
+    progress: Optional[ScanProgress] = None
 ) -> Dict[str, Any]:
     """
     Scanne un dossier et retourne les fichiers correspondant aux critères.
     
+    Le parcours repose sur os.scandir : le type de chaque entrée (d_type) est
+    réutilisé sans appel système supplémentaire, et les dossiers inaccessibles
+    ne sont détectés qu'au moment où on les liste. Les règles sont évaluées de
+    la moins coûteuse à la plus coûteuse : les sous-dossiers exclus sont
+    écartés avant d'être listés, et un fichier n'est stat() (au plus une fois)
+    qu'après avoir passé les tests sur son nom.
+    
     Args:
         directory: Chemin du dossier à scanner
         include_extensions: Liste des extensions à inclure (sans le point) - DÉPRÉCIÉ
@@ -30,191 +61,157 @@ def scan_directory(
         exclude_patterns: Liste des motifs regex à exclure dans les noms de fichiers
         exclude_directories: Liste des sous-dossiers à exclure
         recursive: Chercher dans les sous-dossiers
+        scan_filter: Filtre compilé à réutiliser (construit depuis les listes d'exclusion sinon)
+        with_identity: Ajouter à chaque fichier la clé "identity" (st_dev, st_ino)
+        progress: Suivi d'avancement à alimenter ; s'il est annulé, le parcours
+            s'arrête avant le dossier suivant et retourne les fichiers déjà trouvés
         
     Returns:
-        Dictionnaire contenant la liste des fichiers correspondant aux critères et les erreurs rencontrées
+        Dictionnaire contenant la liste des fichiers correspondant aux critères, les erreurs
+        rencontrées et le nombre de sous-dossiers non exclus ("subdirectories", 0 sans récursion)
     """
     logger.info(f"Début du scan du dossier {directory} (récursif={recursive})")
     
+    if scan_filter is None:
+        scan_filter = ScanFilter(exclude_extensions, exclude_patterns, exclude_directories)
+    
     results = []
     errors = []  # Liste pour stocker les fichiers et dossiers en erreur
-    dir_path = Path(directory)
     
-    if not dir_path.exists() or not dir_path.is_dir():
+    if not os.path.isdir(directory):
+        # Archive (ou dossier d'une archive) parcourue comme un dossier virtuel
+        location = split_archive_path(directory)
+        if location is not None:
+            return scan_archive(location[0], location[1], recursive, scan_filter, progress)
         err_msg = f"Le dossier {directory} n'existe pas ou n'est pas accessible"
         logger.error(err_msg)
-        return {"files": results, "errors": [err_msg]}
+        return {"files": results, "errors": [err_msg], "subdirectories": 0}
     
-    # Fonction pour parcourir le répertoire de manière sécurisée
-    def safe_walk(directory):
-        try:
-            # Pour les dossiers non récursifs, utiliser un itérateur personnalisé
-            if not recursive:
-                try:
-                    logger.debug(f"Scan non récursif de {directory}")
-                    # Liste des fichiers dans le dossier courant uniquement
-                    files = []
-                    dirs = []
-                    try:
-                        for f in Path(directory).iterdir():
-                            try:
-                                if f.is_file():
-                                    files.append(f.name)
-                                elif f.is_dir():
-                                    dirs.append(f.name)
-                            except (PermissionError, OSError) as e:
-                                err_msg = f"Accès refusé à '{f}': {str(e)}"
-                                logger.warning(err_msg)
-                                errors.append(err_msg)
-                    except (PermissionError, OSError) as e:
-                        err_msg = f"Erreur d'accès au dossier '{directory}': {str(e)}"
-                        logger.error(err_msg)
-                        errors.append(err_msg)
-                    
-                    logger.debug(f"Dossier {directory}: {len(files)} fichiers, {len(dirs)} sous-dossiers")
-                    # Retourner un seul tuple pour ce dossier
-                    yield (directory, dirs, files)
-                except (PermissionError, OSError) as e:
-                    # En cas d'erreur d'accès, noter l'erreur et retourner un tuple vide
-                    err_msg = f"Erreur d'accès au dossier '{directory}': {str(e)}"
-                    logger.error(err_msg)
-                    errors.append(err_msg)
-                    yield (directory, [], [])
-            else:
-                # Pour la récursion, utiliser os.walk avec gestion d'erreur
-                logger.debug(f"Démarrage du scan récursif de {directory}")
-                
-                def onerror(e):
-                    err_msg = f"Erreur lors du parcours de '{e.filename}': {str(e.exception)}"
-                    logger.error(err_msg)
-                    errors.append(err_msg)
-                
-                for root, dirs, files in os.walk(directory, onerror=onerror):
-                    # Filtrer les sous-dossiers que nous ne pouvons pas accéder immédiatement
-                    filtered_dirs = []
-                    for d in dirs[:]:
-                        try:
-                            dir_path = os.path.join(root, d)
-                            # Essayer d'accéder au dossier
-                            os.listdir(dir_path)
-                            filtered_dirs.append(d)
-                        except (PermissionError, OSError) as e:
-                            # Signaler l'erreur et passer au suivant
-                            err_msg = f"Accès refusé au dossier '{dir_path}': {str(e)}"
-                            logger.warning(err_msg)
-                            errors.append(err_msg)
-                            dirs.remove(d)  # Ne pas continuer avec ce dossier
-                    
-                    logger.debug(f"Traitement de {root}: {len(files)} fichiers, {len(dirs)} sous-dossiers")
-                    yield (root, dirs, files)
-        except Exception as e:
-            # Gestion globale des erreurs (fallback)
-            err_msg = f"Erreur générale lors du parcours de '{directory}': {str(e)}"
-            logger.error(err_msg)
-            errors.append(err_msg)
-            yield (directory, [], [])
-    
-    # Utiliser notre fonction de parcours sécurisée
     logger.info(f"Début du parcours de {directory}")
     
     file_counter = 0
     error_counter = 0
     dir_counter = 0
+    subdirectory_counter = 0
+    
+    # Pile des dossiers à visiter (parcours en profondeur, même ordre que os.walk),
+    # chacun avec la chaîne de règles .gitignore qui s'y applique
+    top = os.fspath(directory)
+    use_gitignore = scan_filter.respect_gitignore
+    pending = [(top, initial_ignore_chain(top) if use_gitignore else ())]
+    
+    # Les règles .gitignore portent sur des chemins absolus
+    absolute_top = os.path.abspath(top)
+    
+    def absolute(path: str) -> str:
+        relative = path[len(top):].lstrip("/\\")
+        return os.path.join(absolute_top, relative) if relative else absolute_top
+    
+    # Le dossier racine est testé en entier ; ses sous-dossiers sont ensuite écartés avant d'être listés
+    if scan_filter.is_directory_excluded(top):
+        logger.debug(f"Dossier exclu: {top}")
+        pending = []
     
-    for root, dirs, files in safe_walk(directory):
+    while pending:
+        if progress is not None:
+            if progress.cancelled:
+                logger.info(f"Scan de {directory} annulé après {dir_counter} dossiers")
+                break
+            progress.add_directory()
+        
+        root, ignore_chain = pending.pop()
         dir_counter += 1
-        # Convertir le chemin absolu en chemin relatif pour faciliter les comparaisons
+        
         try:
-            relative_path = os.path.relpath(root, directory)
-            if relative_path != '.':
-                logger.debug(f"Traitement du sous-dossier: {relative_path}")
-        except ValueError:
-            # Gérer les erreurs de calcul de chemin relatif
-            err_msg = f"Erreur de calcul du chemin relatif pour '{root}'"
-            logger.error(err_msg)
+            with os.scandir(root) as iterator:
+                entries = list(iterator)
+        except (PermissionError, OSError) as e:
+            # Détection paresseuse : l'erreur n'est connue qu'au moment de lister le dossier
+            if root == top:
+                err_msg = f"Erreur lors du parcours de '{root}': {str(e)}"
+                logger.error(err_msg)
+            else:
+                err_msg = f"Accès refusé au dossier '{root}': {str(e)}"
+                logger.warning(err_msg)
             errors.append(err_msg)
             error_counter += 1
             continue
-            
-        should_skip_dir = False
         
-        # Filtrer les sous-dossiers à exclure (avant exploration)
-        if exclude_directories:
-            # Vérifier si ce dossier est à exclure
-            should_skip_dir = os.path.basename(root) in exclude_directories or any(
-                f"/{excluded_dir}/" in f"{root}/" 
-                for excluded_dir in exclude_directories
-            )
-            
-            # Filtrer aussi les sous-dossiers pour les prochaines itérations
-            if not should_skip_dir:
-                excluded_count = len(dirs)
-                dirs[:] = [d for d in dirs if d not in exclude_directories]
-                excluded_count -= len(dirs)
-                if excluded_count > 0:
-                    logger.debug(f"Exclusion de {excluded_count} sous-dossiers dans {root}")
+        # Préfixe normalisé du dossier, calculé (et interné) une fois pour tous ses fichiers
+        output_prefix = intern_prefix(str(Path(root)))
+        subdirectories = []
         
-        # Si on doit sauter ce dossier, passer au suivant
-        if should_skip_dir:
-            logger.debug(f"Dossier exclu: {root}")
-            dirs[:] = []  # Vider la liste pour éviter de parcourir les sous-dossiers
-            continue
+        # Un .gitignore dans ce dossier complète la chaîne (sans stat supplémentaire pour le détecter)
+        if use_gitignore:
+            for entry in entries:
+                if entry.name == ".gitignore":
+                    rules = load_ignore_file(absolute(entry.path), absolute(root))
+                    if rules is not None:
+                        ignore_chain = ignore_chain + (rules,)
+                    break
         
-        for filename in files:
+        for entry in entries:
+            filename = entry.name
             try:
-                file_path = os.path.join(root, filename)
-                file = Path(file_path)
-                
-                # Vérifier si le fichier existe et est accessible
                 try:
-                    if not file.exists() or not file.is_file():
-                        logger.debug(f"Fichier inexistant ou non reconnu: {file_path}")
+                    # is_dir() suit les liens comme os.walk ; d_type évite l'appel système
+                    if entry.is_dir():
+                        if recursive:
+                            if scan_filter.is_subdirectory_excluded(filename, entry.path):
+                                logger.debug(f"Dossier exclu: {entry.path}")
+                            elif use_gitignore and (filename == ".git" or is_ignored(ignore_chain, absolute(entry.path), filename, True)):
+                                logger.debug(f"Dossier ignoré par .gitignore: {entry.path}")
+                            else:
+                                # Compté comme os.walk (liens inclus), mais seuls les vrais dossiers sont parcourus
+                                subdirectory_counter += 1
+                                if not entry.is_symlink():
+                                    subdirectories.append(entry.path)
                         continue
                 except (PermissionError, OSError) as e:
-                    err_msg = f"Erreur d'accès au fichier '{file_path}': {str(e)}"
+                    err_msg = f"Erreur d'accès au fichier '{entry.path}': {str(e)}"
                     logger.warning(err_msg)
                     errors.append(err_msg)
                     error_counter += 1
                     continue
                 
-                # Obtenir les stats du fichier avec gestion d'erreur
+                # Règles sur le nom d'abord : aucun appel système pour les fichiers exclus
+                extension = _get_extension(filename)
+                reason = scan_filter.exclusion_reason(filename, extension)
+                if reason is not None:
+                    logger.debug(f"Fichier exclu par {reason}: {entry.path}")
+                    continue
+                if ignore_chain and is_ignored(ignore_chain, absolute(entry.path), filename, False):
+                    logger.debug(f"Fichier ignoré par .gitignore: {entry.path}")
+                    continue
+                
                 try:
-                    file_size = file.stat().st_size
+                    if not entry.is_file():
+                        logger.debug(f"Fichier inexistant ou non reconnu: {entry.path}")
+                        continue
+                    # Seul appel système par fichier (mis en cache par DirEntry pour les liens)
+                    file_size = entry.stat().st_size
                 except (PermissionError, OSError) as e:
-                    # Noter l'erreur et passer au fichier suivant
-                    err_msg = f"Erreur d'accès au fichier '{file_path}': {str(e)}"
+                    err_msg = f"Erreur d'accès au fichier '{entry.path}': {str(e)}"
                     logger.warning(err_msg)
                     errors.append(err_msg)
                     error_counter += 1
                     continue
                 
-                # Ignorer les fichiers trop gros
-                if file_size > MAX_FILE_SIZE:
-                    logger.debug(f"Fichier trop volumineux ignoré: {file_path} ({file_size} octets > {MAX_FILE_SIZE})")
-                    continue
-                    
-                # Vérifier l'extension
-                extension = file.suffix[1:] if file.suffix else ""
-                if extension in exclude_extensions:
-                    logger.debug(f"Fichier exclu par extension: {file_path} (extension: {extension})")
-                    continue
-                    
-                # Vérifier les motifs d'exclusion
-                exclude_match = False
-                if exclude_patterns:
-                    exclude_match = any(re.search(pattern, filename) for pattern in exclude_patterns)
-                if exclude_match:
-                    logger.debug(f"Fichier exclu par motif: {file_path}")
+                # Ignorer les fichiers trop gros (sauf en mode extrait)
+                if file_size > MAX_FILE_SIZE and not scan_filter.include_large_files:
+                    logger.debug(f"Fichier trop volumineux ignoré: {output_prefix}{filename} ({file_size} octets > {MAX_FILE_SIZE})")
                     continue
                     
                 # Ajouter le fichier aux résultats
-                results.append({
-                    "path": str(file).replace("\\", "/"),
-                    "name": filename,
-                    "size": file_size,
-                    "extension": extension
-                })
+                file_info = FileRecord(output_prefix, filename, file_size, extension, excerpt=file_size > MAX_FILE_SIZE)
+                if with_identity:
+                    # Identité (st_dev, st_ino) issue du stat déjà fait, pour dédoublonner entre racines
+                    file_stat = entry.stat()
+                    file_info.identity = (file_stat.st_dev, file_stat.st_ino)
+                results.append(file_info)
                 file_counter += 1
+                if progress is not None:
+                    progress.add_file(file_info)
                 
                 if file_counter % 100 == 0:  # Log tous les 100 fichiers
                     logger.info(f"Progression: {file_counter} fichiers trouvés, {error_counter} erreurs")
@@ -226,27 +223,288 @@ def scan_directory(
                 errors.append(err_msg)
                 error_counter += 1
                 continue
+        
+        logger.debug(f"Traitement de {root}: {len(entries)} entrées, {len(subdirectories)} sous-dossiers")
+        
+        # Empiler à l'envers pour visiter les sous-dossiers dans l'ordre de listage
+        pending.extend((subdirectory, ignore_chain) for subdirectory in reversed(subdirectories))
     
     logger.info(f"Scan terminé pour {directory}: {file_counter} fichiers trouvés, {dir_counter} dossiers traités, {error_counter} erreurs")
-    return {"files": results, "errors": errors}
+    return {"files": results, "errors": errors, "subdirectories": subdirectory_counter}
+
+
+def scan_archive(
+    archive_path: str,
+    member_dir: str = "",
+    recursive: bool = True,
+    scan_filter: Optional[ScanFilter] = None,
+    progress: Optional[ScanProgress] = None
+) -> Dict[str, Any]:
+    """
+    Scanne une archive zip ou tar comme un dossier, sans l'extraire.
+    
+    Les membres sont listés depuis le répertoire central (zip) ou les en-têtes
+    (tar) et reçoivent le chemin virtuel "archive/membre". Les mêmes règles que
+    pour un dossier s'appliquent : dossiers exclus (à chaque niveau),
+    extensions, motifs et taille maximale. Les .gitignore contenus dans
+    l'archive ne sont pas lus.
+    
+    Args:
+        archive_path: Chemin de l'archive
+        member_dir: Dossier de l'archive à scanner ("" pour toute l'archive)
+        recursive: Chercher dans les sous-dossiers
+        scan_filter: Filtre compilé (aucune exclusion par défaut)
+        progress: Suivi d'avancement à alimenter
+        
+    Returns:
+        Dictionnaire au format de scan_directory
+    """
+    logger.info(f"Début du scan de l'archive {archive_path} (dossier '{member_dir}', récursif={recursive})")
+    
+    if scan_filter is None:
+        scan_filter = ScanFilter([], [], [])
+    
+    results = []
+    top = archive_path + ("/" + member_dir if member_dir else "")
+    if scan_filter.is_directory_excluded(top):
+        logger.debug(f"Dossier exclu: {top}")
+        return {"files": results, "errors": [], "subdirectories": 0}
+    
+    try:
+        members = list(iter_archive_members(archive_path))
+    except OSError as e:
+        err_msg = f"Erreur lors de la lecture de l'archive '{archive_path}': {str(e)}"
+        logger.error(err_msg)
+        return {"files": results, "errors": [err_msg], "subdirectories": 0}
+    
+    member_prefix = member_dir + "/" if member_dir else ""
+    # Décision (exclu ou non) et préfixe interné de chaque dossier, calculés une fois
+    directories: Dict[str, Optional[str]] = {"": intern_prefix(top)}
+    
+    def directory_prefix(relative_dir: str) -> Optional[str]:
+        if relative_dir in directories:
+            return directories[relative_dir]
+        parent, _, name = relative_dir.rpartition("/")
+        parent_prefix = directory_prefix(parent)
+        path = f"{top}/{relative_dir}"
+        if parent_prefix is None or scan_filter.is_subdirectory_excluded(name, path):
+            prefix = None
+            if parent_prefix is not None:
+                logger.debug(f"Dossier exclu: {path}")
+        else:
+            prefix = intern_prefix(path)
+            if progress is not None:
+                progress.add_directory()
+        directories[relative_dir] = prefix
+        return prefix
+    
+    for name, file_size in members:
+        if progress is not None and progress.cancelled:
+            logger.info(f"Scan de l'archive {archive_path} annulé")
+            break
+        if not name.startswith(member_prefix):
+            continue
+        relative_dir, _, filename = name[len(member_prefix):].rpartition("/")
+        if relative_dir and not recursive:
+            continue
+        
+        output_prefix = directory_prefix(relative_dir)
+        if output_prefix is None:
+            continue
+        
+        extension = _get_extension(filename)
+        reason = scan_filter.exclusion_reason(filename, extension)
+        if reason is not None:
+            logger.debug(f"Fichier exclu par {reason}: {output_prefix}{filename}")
+            continue
+        if file_size > MAX_FILE_SIZE and not scan_filter.include_large_files:
+            logger.debug(f"Fichier trop volumineux ignoré: {output_prefix}{filename} ({file_size} octets > {MAX_FILE_SIZE})")
+            continue
+        
+        file_info = FileRecord(output_prefix, filename, file_size, extension, excerpt=file_size > MAX_FILE_SIZE)
+        results.append(file_info)
+        if progress is not None:
+            progress.add_file(file_info)
+    
+    subdirectory_counter = sum(1 for relative_dir, prefix in directories.items() if relative_dir and prefix is not None)
+    logger.info(f"Scan terminé pour l'archive {archive_path}: {len(results)} fichiers trouvés sur {len(members)} membres")
+    return {"files": results, "errors": [], "subdirectories": subdirectory_counter}
+
+
+# Taille du premier bloc lu pour détecter les fichiers binaires
+SNIFF_BLOCK_SIZE = 8192
+
+# Signatures (magic numbers) de formats binaires courants
+BINARY_SIGNATURES = (
+    b"\x89PNG\r\n\x1a\n",      # PNG
+    b"\xff\xd8\xff",             # JPEG
+    b"GIF87a", b"GIF89a",        # GIF
+    b"%PDF-",                    # PDF
+    b"PK\x03\x04", b"PK\x05\x06", # ZIP (et docx, jar, whl...)
+    b"\x1f\x8b",                 # gzip
+    b"\xfd7zXZ\x00",             # xz
+    b"7z\xbc\xaf\x27\x1c",         # 7z
+    b"Rar!\x1a\x07",              # RAR
+    b"\x7fELF",                   # ELF (.so, exécutables)
+    b"\xcf\xfa\xed\xfe", b"\xce\xfa\xed\xfe",  # Mach-O
+    b"\xca\xfe\xba\xbe",          # Mach-O universel / classe Java
+    b"SQLite format 3\x00",      # SQLite
+    b"\x00asm",                   # WebAssembly
+    b"OggS",                     # Ogg
+    b"wOFF", b"wOF2",            # Polices web
+)
+
+# Marques d'ordre des octets des encodages Unicode sur plusieurs octets
+_UTF16_32_BOMS = (
+    (b"\xff\xfe\x00\x00", "utf-32"),
+    (b"\x00\x00\xfe\xff", "utf-32"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+)
+
+
+def _detect_multibyte_encoding(head: bytes) -> str:
+    """Retourne l'encodage UTF-16/32 annoncé par une BOM, ou une chaîne vide."""
+    for bom, encoding in _UTF16_32_BOMS:
+        if head.startswith(bom):
+            return encoding
+    return ""
+
+
+def is_binary_block(head: bytes) -> bool:
+    """
+    Indique si le premier bloc d'un fichier correspond à un contenu binaire.
+    
+    Un bloc est considéré binaire s'il commence par une signature connue ou
+    s'il contient un octet nul (sauf texte UTF-16/32 annoncé par une BOM).
+    
+    Args:
+        head: Premiers octets du fichier
+        
+    Returns:
+        True si le contenu est binaire
+    """
+    if head.startswith(BINARY_SIGNATURES):
+        return True
+    return b"\x00" in head and not _detect_multibyte_encoding(head)
+
+
+def _decode_excerpt(head: bytes, tail: bytes, encoding: str) -> Tuple[str, str]:
+    """Décode le début et la fin d'un fichier coupés à des positions arbitraires."""
+    if encoding:
+        # UTF-16/32 : les bords sont alignés sur les unités de code, la fin (sans BOM) prend l'ordre annoncé au début
+        tail_encoding = encoding + ("-le" if head.startswith(b"\xff\xfe") else "-be")
+        return head.decode(encoding, errors="replace"), tail.decode(tail_encoding, errors="replace")
+    
+    # Ne pas couper un caractère UTF-8 : séquence incomplète en fin de début, octets de suite en tête de fin
+    start = 0
+    while start < min(len(tail), 3) and 0x80 <= tail[start] <= 0xBF:
+        start += 1
+    try:
+        decoded_head = codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        decoded_tail = tail[start:].decode("utf-8")
+    except UnicodeDecodeError:
+        decoded_head, decoded_tail = head.decode("latin-1"), tail.decode("latin-1")
+    return decoded_head, decoded_tail
+
+
+def read_file_excerpt(file_path: str, excerpt_bytes: int, st: Optional[os.stat_result] = None) -> str:
+    """
+    Lit seulement le début et la fin d'un fichier, avec une estimation du nombre de lignes.
+    
+    Deux lectures de `excerpt_bytes` au plus (seek en fin de fichier), quelle
+    que soit la taille du fichier ; le nombre de lignes est extrapolé à partir
+    de la densité de sauts de ligne dans ces deux échantillons.
+    
+    Args:
+        file_path: Chemin du fichier à lire
+        excerpt_bytes: Nombre d'octets lus au début et à la fin
+        st: Résultat de os.stat déjà obtenu (optionnel)
+        
+    Returns:
+        Extrait formaté, ou message d'erreur / contenu binaire comme read_file_content
+    """
+    try:
+        if st is None:
+            st = stat_path(file_path)
+        size = st.st_size
+        
+        with open_path(file_path) as f:
+            head = f.read(excerpt_bytes)
+            if is_binary_block(head[:SNIFF_BLOCK_SIZE]):
+                logger.debug(f"Fichier binaire détecté: {file_path}")
+                return f"[Contenu binaire - Taille: {size} octets]"
+            
+            encoding = _detect_multibyte_encoding(head)
+            unit = 4 if "32" in encoding else 2 if encoding else 1
+            tail_start = max(len(head), size - excerpt_bytes)
+            tail_start += -tail_start % unit
+            f.seek(tail_start)
+            tail = f.read(excerpt_bytes)
+    except PermissionError as e:
+        logger.error(f"Erreur d'accès au fichier {file_path}: {str(e)}")
+        return f"[Erreur d'accès - {str(e)}]"
+    except FileNotFoundError as e:
+        logger.error(f"Fichier non trouvé: {file_path}")
+        return f"[Fichier non trouvé - {str(e)}]"
+    except OSError as e:
+        logger.error(f"Erreur générale lors de la lecture de {file_path}: {str(e)}")
+        return f"[Erreur de lecture - {str(e)}]"
+    
+    head_text, tail_text = _decode_excerpt(head, tail, encoding)
+    head_text = head_text.replace("\r\n", "\n").replace("\r", "\n")
+    tail_text = tail_text.replace("\r\n", "\n").replace("\r", "\n")
+    
+    # Estimation des lignes d'après la densité observée dans les échantillons
+    sample_bytes = len(head) + len(tail)
+    sample_lines = head_text.count("\n") + tail_text.count("\n")
+    estimated_lines = max(1, round(sample_lines * size / sample_bytes)) if sample_bytes else 0
+    
+    # Couper aux limites de ligne quand c'est possible
+    if "\n" in head_text:
+        head_text = head_text[:head_text.rindex("\n")]
+    if "\n" in tail_text:
+        tail_text = tail_text[tail_text.index("\n") + 1:]
+    omitted_lines = max(0, estimated_lines - head_text.count("\n") - tail_text.count("\n") - 2)
+    
+    logger.debug(f"Extrait lu: {file_path} ({sample_bytes} octets sur {size})")
+    return (
+        f"[Extrait - Taille: {size} octets, environ {estimated_lines} lignes ; "
+        f"premiers et derniers {excerpt_bytes // 1024} Ko]\n"
+        f"{head_text}\n"
+        f"[... environ {omitted_lines} lignes omises ...]\n"
+        f"{tail_text}"
+    )
 
 
-def read_file_content(file_path: str) -> str:
+def read_file_content(file_path: str, excerpt_bytes: Optional[int] = None) -> str:
     """
     Lit le contenu d'un fichier de manière sécurisée.
     
+    Le fichier est ouvert une seule fois : le premier bloc sert à écarter les
+    fichiers binaires (octet nul, signature connue) avant toute lecture
+    complète, puis le texte est décodé depuis le même tampon (UTF-8, ou
+    latin-1 en repli). Les fins de ligne sont normalisées en "\\n" comme en
+    mode texte.
+    
+    Un membre d'archive ("sources.zip/src/main.py") est lu de la même façon,
+    décompressé à la demande.
+    
     Args:
         file_path: Chemin du fichier à lire
+        excerpt_bytes: Si fourni, un fichier plus gros que MAX_FILE_SIZE est lu en
+            extrait (début et fin, voir read_file_excerpt) au lieu d'être refusé
         
     Returns:
         Contenu du fichier
     """
     logger.debug(f"Lecture du fichier: {file_path}")
-    path = Path(file_path)
     
     try:
+        # Un seul stat pour vérifier l'existence, le type et la taille
         try:
-            if not path.exists() or not path.is_file():
+            st = stat_path(file_path)
+            if not stat.S_ISREG(st.st_mode):
                 err_msg = f"Le fichier {file_path} n'existe pas ou n'est pas un fichier"
                 logger.warning(err_msg)
                 raise FileNotFoundError(err_msg)
@@ -255,38 +513,23 @@ def read_file_content(file_path: str) -> str:
             logger.error(f"Erreur d'accès au fichier {file_path}: {str(e)}")
             return err_msg
             
-        try:
-            if path.stat().st_size > MAX_FILE_SIZE:
-                err_msg = f"Le fichier {file_path} est trop volumineux"
-                logger.warning(err_msg)
-                raise ValueError(err_msg)
-        except (PermissionError, OSError) as e:
-            err_msg = f"[Erreur d'accès - {str(e)}]"
-            logger.error(f"Erreur lors de l'obtention de la taille de {file_path}: {str(e)}")
-            return err_msg
-        
-        # Déterminer l'encodage (en fonction de l'extension)
-        encoding = "utf-8"  # Par défaut
+        if st.st_size > MAX_FILE_SIZE:
+            if excerpt_bytes:
+                return read_file_excerpt(file_path, excerpt_bytes, st)
+            err_msg = f"Le fichier {file_path} est trop volumineux"
+            logger.warning(err_msg)
+            raise ValueError(err_msg)
         
-        # Essayons de lire avec l'encodage déterminé
         try:
-            with open(path, "r", encoding=encoding) as f:
-                content = f.read()
-                logger.debug(f"Fichier lu avec succès: {file_path} (utf-8)")
-                return content
-        except UnicodeDecodeError:
-            # En cas d'erreur, on essaie avec un autre encodage
-            logger.debug(f"Tentative de lecture avec encodage latin-1: {file_path}")
-            try:
-                with open(path, "r", encoding="latin-1") as f:
-                    content = f.read()
-                    logger.debug(f"Fichier lu avec succès: {file_path} (latin-1)")
-                    return content
-            except Exception:
-                # Si ça ne fonctionne toujours pas, on considère que c'est un fichier binaire
-                err_msg = f"[Contenu binaire - Taille: {path.stat().st_size} octets]"
-                logger.warning(f"Fichier binaire détecté: {file_path}")
-                return err_msg
+            with open_path(file_path) as f:
+                head = f.read(SNIFF_BLOCK_SIZE)
+                
+                # Rejeter les binaires avant de lire le reste du fichier
+                if is_binary_block(head):
+                    logger.debug(f"Fichier binaire détecté: {file_path}")
+                    return f"[Contenu binaire - Taille: {st.st_size} octets]"
+                
+                data = head + f.read() if len(head) == SNIFF_BLOCK_SIZE else head
         except PermissionError as e:
             err_msg = f"[Erreur d'accès - {str(e)}]"
             logger.error(f"Erreur de permission lors de la lecture de {file_path}: {str(e)}")
@@ -295,14 +538,22 @@ def read_file_content(file_path: str) -> str:
             err_msg = f"[Fichier non trouvé - {str(e)}]"
             logger.error(f"Fichier non trouvé: {file_path}")
             return err_msg
-        except ValueError as e:
-            err_msg = f"[Erreur de valeur - {str(e)}]"
-            logger.error(f"Erreur de valeur lors de la lecture de {file_path}: {str(e)}")
-            return err_msg
-        except Exception as e:
-            err_msg = f"[Erreur de lecture - {str(e)}]"
-            logger.error(f"Erreur générale lors de la lecture de {file_path}: {str(e)}")
-            return err_msg
+        
+        # Décoder depuis le même tampon, sans rouvrir le fichier
+        encoding = _detect_multibyte_encoding(head) or "utf-8"
+        try:
+            content = data.decode(encoding)
+            logger.debug(f"Fichier lu avec succès: {file_path} ({encoding})")
+        except UnicodeDecodeError:
+            # latin-1 décode n'importe quelle séquence d'octets
+            logger.debug(f"Tentative de lecture avec encodage latin-1: {file_path}")
+            content = data.decode("latin-1")
+            logger.debug(f"Fichier lu avec succès: {file_path} (latin-1)")
+        
+        # Même normalisation des fins de ligne que open(..., "r")
+        if "\r" in content:
+            content = content.replace("\r\n", "\n").replace("\r", "\n")
+        return content
             
     except PermissionError as e:
         err_msg = f"[Erreur d'accès - {str(e)}]"
@@ -340,10 +591,96 @@ def format_file_for_copy(file_path: str, content: str, size_human: str = "") ->
         return f"=== {file_path} ===\n\n{content}\n\n---\n\n"
 
 
+def format_duplicate_reference(file_path: str, original_path: str, size_human: str = "") -> str:
+    """
+    Formate l'en-tête court d'un fichier dont le contenu a déjà été émis.
+    
+    Args:
+        file_path: Chemin du fichier
+        original_path: Chemin du premier fichier au contenu identique
+        size_human: Taille du fichier formatée (optionnel)
+        
+    Returns:
+        Bloc formaté renvoyant au premier fichier
+    """
+    header = f"=== {file_path} ({size_human}) ===" if size_human else f"=== {file_path} ==="
+    return f"{header}\n[Contenu identique à {original_path}]\n\n---\n\n"
+
+
+def content_digest(content: str) -> bytes:
+    """
+    Empreinte du contenu décodé, pour repérer les fichiers identiques sans les relire.
+    
+    Args:
+        content: Contenu du fichier tel qu'émis
+        
+    Returns:
+        Empreinte BLAKE2b de 16 octets
+    """
+    return hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+# Taille des blocs lus pour le calcul des statistiques
+STATS_CHUNK_SIZE = 1024 * 1024
+
+# Séparateurs de lignes reconnus par str.splitlines ("\\r\\n" compte pour un seul)
+_LINE_BREAK_RE = re.compile(r"\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+_WORD_RE = re.compile(r"\w+")
+
+
+def _count_text_stats(path: str, encoding: str) -> Tuple[int, int, int]:
+    """
+    Compte caractères, lignes et mots d'un fichier par blocs de taille fixe.
+    
+    Les comptes sont identiques à ceux obtenus sur le texte complet lu en mode
+    texte (fins de ligne normalisées) avec len(), splitlines() et \\w+, mais
+    la mémoire utilisée ne dépend pas de la taille du fichier. Les mots et les
+    "\\r\\n" coupés entre deux blocs sont recollés.
+    
+    Raises:
+        UnicodeDecodeError: Si le fichier n'est pas décodable avec l'encodage donné
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    chars = lines = words = 0
+    previous_last = ""  # Dernier caractère du bloc précédent
+    
+    with open(path, "rb") as f:
+        while True:
+            raw = f.read(STATS_CHUNK_SIZE)
+            text = decoder.decode(raw, final=not raw)
+            if text:
+                breaks = sum(1 for _ in _LINE_BREAK_RE.finditer(text))
+                crlf = text.count("\r\n")
+                # "\r" en fin de bloc précédent suivi de "\n" : un seul saut de ligne
+                if previous_last == "\r" and text[0] == "\n":
+                    breaks -= 1
+                    crlf += 1
+                chars += len(text) - crlf
+                lines += breaks
+                
+                chunk_words = sum(1 for _ in _WORD_RE.finditer(text))
+                # Mot coupé entre deux blocs : ne le compter qu'une fois
+                if chunk_words and _WORD_RE.match(text[0]) and previous_last and _WORD_RE.match(previous_last):
+                    chunk_words -= 1
+                words += chunk_words
+                previous_last = text[-1]
+            if not raw:
+                break
+    
+    # Dernière ligne sans saut de ligne final
+    if previous_last and not _LINE_BREAK_RE.match(previous_last):
+        lines += 1
+    return chars, lines, words
+
+
 def get_file_stats(file_path: str) -> Dict[str, Any]:
     """
     Calcule les statistiques d'un fichier texte.
     
+    Le fichier est lu en flux par blocs de STATS_CHUNK_SIZE : la mémoire
+    utilisée ne dépend pas de sa taille. Les fichiers binaires sont détectés
+    sur le premier bloc et ne sont pas comptés.
+    
     Args:
         file_path: Chemin du fichier à analyser
         
@@ -363,12 +700,21 @@ def get_file_stats(file_path: str) -> Dict[str, Any]:
     }
     
     try:
-        content = read_file_content(file_path)
+        with open(file_path, "rb") as f:
+            head = f.read(SNIFF_BLOCK_SIZE)
+        if is_binary_block(head):
+            return {**stats, "binary": True}
         
-        # Calcul des statistiques
-        stats["totalChars"] = len(content)
-        stats["totalLines"] = len(content.splitlines())
-        stats["totalWords"] = len(re.findall(r'\w+', content))
+        # Même stratégie de décodage que read_file_content
+        encoding = _detect_multibyte_encoding(head) or "utf-8"
+        try:
+            chars, lines, words = _count_text_stats(file_path, encoding)
+        except UnicodeDecodeError:
+            chars, lines, words = _count_text_stats(file_path, "latin-1")
+        
+        stats["totalChars"] = chars
+        stats["totalLines"] = lines
+        stats["totalWords"] = words
         
         return stats
     except Exception as e:
@@ -376,4 +722,30 @@ def get_file_stats(file_path: str) -> Dict[str, Any]:
         return {
             **stats,
             "error": str(e)
-        } 
\ No newline at end of file
+        }
+
+
+def get_files_stats(file_paths: List[str], max_workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Calcule les statistiques de nombreux fichiers en parallèle.
+    
+    Args:
+        file_paths: Chemins des fichiers à analyser
+        max_workers: Nombre de threads (config.READ_WORKERS par défaut)
+        
+    Returns:
+        Dictionnaire {chemin: statistiques}, dans l'ordre de file_paths.
+        Un fichier introuvable a une entrée avec la clé "error".
+    """
+    def safe_stats(file_path: str) -> Dict[str, Any]:
+        try:
+            return get_file_stats(file_path)
+        except FileNotFoundError as e:
+            return {"totalLines": 0, "totalWords": 0, "totalChars": 0, "error": str(e)}
+    
+    workers = max_workers if max_workers is not None else READ_WORKERS
+    if workers <= 1 or len(file_paths) <= 1:
+        return {file_path: safe_stats(file_path) for file_path in file_paths}
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="toolbox-stats") as executor:
+        return dict(zip(file_paths, executor.map(safe_stats, file_paths)))
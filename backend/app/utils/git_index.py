@@ -0,0 +1,285 @@
+"""
+Lecture du fichier binaire .git/index pour lister les fichiers suivis d'un dépôt.
+
+Le format (versions 2, 3 et 4) est décodé en Python pur : chaque entrée
+fournit le chemin, la taille et la date de modification enregistrés par
+git, ce qui évite de parcourir l'arborescence de travail.
+"""
+import os
+import stat
+import struct
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from ..config import MAX_FILE_SIZE
+from .scan_filter import ScanFilter
+from .file_utils import _get_extension
+from .file_record import FileRecord, intern_prefix
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.git_index")
+
+_HEADER = struct.Struct(">4sLL")
+# ctime s/ns, mtime s/ns, dev, ino, mode, uid, gid, size
+_ENTRY_STAT = struct.Struct(">10L")
+
+# Drapeaux d'une entrée
+_FLAG_EXTENDED = 0x4000
+_FLAG_STAGE_MASK = 0x3000
+_FLAG_NAME_MASK = 0x0FFF
+
+# Dernier index décodé, réutilisé tant que le fichier ne change pas
+_index_cache: Dict[str, Tuple[Tuple[int, int], List["IndexEntry"]]] = {}
+_index_cache_lock = threading.Lock()
+
+
+class IndexEntry(NamedTuple):
+    """Entrée de l'index git (chemin relatif à la racine du dépôt, séparateur "/")."""
+    path: str
+    size: int
+    mtime_ns: int
+    mode: int
+
+
+def find_git_dir(directory: str) -> Optional[Tuple[str, str]]:
+    """
+    Trouve le dépôt git contenant directory.
+    
+    Gère le cas où ".git" est un fichier ("gitdir: ...", worktrees et sous-modules).
+    
+    Returns:
+        Tuple (racine du dépôt, dossier git) ou None
+    """
+    current = os.path.abspath(directory)
+    while True:
+        candidate = os.path.join(current, ".git")
+        if os.path.isdir(candidate):
+            return current, candidate
+        if os.path.isfile(candidate):
+            try:
+                with open(candidate, "r", encoding="utf-8") as f:
+                    line = f.readline().strip()
+            except OSError:
+                return None
+            if line.startswith("gitdir:"):
+                git_dir = line[len("gitdir:"):].strip()
+                return current, os.path.normpath(os.path.join(current, git_dir))
+            return None
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def _hash_size(git_dir: str) -> int:
+    """Taille des identifiants d'objets : 20 (SHA-1) ou 32 (SHA-256)."""
+    try:
+        with open(os.path.join(git_dir, "config"), "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                if key.strip().lower() == "objectformat" and value.strip().lower() == "sha256":
+                    return 32
+    except OSError:
+        pass
+    return 20
+
+
+def parse_git_index(data: bytes, hash_size: int = 20) -> List[IndexEntry]:
+    """
+    Décode le contenu d'un fichier .git/index.
+    
+    Seules les entrées de l'étape 0 (hors conflits de fusion) et les fichiers
+    réguliers ou liens sont retournés ; les sous-modules sont ignorés.
+    
+    Args:
+        data: Contenu brut du fichier
+        hash_size: Taille des identifiants d'objets
+        
+    Returns:
+        Entrées de l'index, dans l'ordre de l'index (trié par chemin)
+        
+    Raises:
+        ValueError: Si le fichier n'est pas un index git reconnu
+    """
+    signature, version, count = _HEADER.unpack_from(data, 0)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise ValueError(f"Index git non supporté (signature {signature!r}, version {version})")
+    
+    entries = []
+    offset = _HEADER.size
+    previous_path = b""
+    fixed_size = _ENTRY_STAT.size + hash_size + 2
+    
+    for _ in range(count):
+        (_, _, mtime_s, mtime_ns, _, _, mode, _, _, size) = _ENTRY_STAT.unpack_from(data, offset)
+        flags = int.from_bytes(data[offset + fixed_size - 2:offset + fixed_size], "big")
+        header_size = fixed_size
+        if version >= 3 and flags & _FLAG_EXTENDED:
+            header_size += 2
+        
+        position = offset + header_size
+        if version == 4:
+            # Chemin compressé : nombre d'octets à retirer du chemin précédent, puis suffixe
+            byte = data[position]
+            position += 1
+            strip = byte & 0x7F
+            while byte & 0x80:
+                byte = data[position]
+                position += 1
+                strip = ((strip + 1) << 7) | (byte & 0x7F)
+            end = data.index(b"\x00", position)
+            path = previous_path[:len(previous_path) - strip] + data[position:end]
+            offset = end + 1
+        else:
+            name_length = flags & _FLAG_NAME_MASK
+            if name_length == _FLAG_NAME_MASK:
+                end = data.index(b"\x00", position)
+            else:
+                end = position + name_length
+            path = data[position:end]
+            # Entrée complétée par des octets nuls jusqu'à un multiple de 8
+            offset += (header_size + len(path) + 8) & ~7
+        previous_path = path
+        
+        if flags & _FLAG_STAGE_MASK:
+            continue
+        if not (stat.S_ISREG(mode) or stat.S_ISLNK(mode)):
+            continue
+        entries.append(IndexEntry(path.decode("utf-8", "surrogateescape"), size, mtime_s * 1_000_000_000 + mtime_ns, mode))
+    
+    return entries
+
+
+def read_git_index(git_dir: str) -> Tuple[List[IndexEntry], int]:
+    """
+    Lit et décode l'index d'un dépôt, avec un cache revalidé par un stat.
+    
+    Returns:
+        Tuple (entrées, date de modification de l'index en ns)
+    """
+    index_path = os.path.join(git_dir, "index")
+    st = os.stat(index_path)
+    signature = (st.st_size, st.st_mtime_ns)
+    
+    with _index_cache_lock:
+        cached = _index_cache.get(index_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1], st.st_mtime_ns
+    
+    with open(index_path, "rb") as f:
+        entries = parse_git_index(f.read(), _hash_size(git_dir))
+    
+    with _index_cache_lock:
+        _index_cache.clear()
+        _index_cache[index_path] = (signature, entries)
+    logger.info(f"Index git décodé: {index_path} ({len(entries)} entrées)")
+    return entries, st.st_mtime_ns
+
+
+def scan_git_index(directory: str, scan_filter: ScanFilter, recursive: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Liste les fichiers suivis par git sous directory, à partir de l'index.
+    
+    Les règles de scan_filter sont appliquées comme dans scan_directory.
+    L'index évite le parcours des dossiers, mais ses données ne datent que du
+    dernier "git add" : chaque entrée retenue par les règles est stat() pour
+    prendre sa taille sur disque, et les fichiers supprimés sont écartés.
+    
+    Args:
+        directory: Dossier à scanner (racine du dépôt ou sous-dossier)
+        scan_filter: Règles d'exclusion compilées
+        recursive: Inclure les sous-dossiers
+        
+    Returns:
+        Dictionnaire au format de scan_directory, complété par "subdirectories"
+        (nombre de sous-dossiers contenant des fichiers suivis), ou None si
+        directory n'est pas dans un dépôt git avec un index lisible
+    """
+    found = find_git_dir(directory)
+    if found is None:
+        return None
+    repository_root, git_dir = found
+    
+    try:
+        entries, _ = read_git_index(git_dir)
+    except (OSError, ValueError, struct.error, IndexError) as e:
+        logger.warning(f"Index git illisible dans {git_dir}: {str(e)}")
+        return None
+    
+    top = os.path.abspath(directory)
+    prefix = os.path.relpath(top, repository_root).replace(os.sep, "/")
+    prefix = "" if prefix == "." else prefix + "/"
+    # Chemins de sortie construits comme dans scan_directory, à partir du dossier fourni
+    output_root = str(Path(directory)).replace("\\", "/").rstrip("/")
+    
+    # Le dossier racine est testé en entier, comme dans scan_directory
+    if scan_filter.is_directory_excluded(output_root):
+        logger.debug(f"Dossier exclu: {output_root}")
+        return {"files": [], "errors": [], "subdirectories": 0}
+    
+    results = []
+    errors = []
+    excluded_dirs: Dict[str, bool] = {}
+    dir_prefixes: Dict[str, str] = {}
+    subdirectories = set()
+    stat_count = 0
+    modified_count = 0
+    
+    for entry in entries:
+        if not entry.path.startswith(prefix):
+            continue
+        relative = entry.path[len(prefix):]
+        relative_dir, _, filename = relative.rpartition("/")
+        if relative_dir and not recursive:
+            continue
+        
+        # Exclusions de dossiers évaluées une fois par dossier
+        if relative_dir:
+            excluded = excluded_dirs.get(relative_dir)
+            if excluded is None:
+                excluded = scan_filter.is_directory_excluded(f"{output_root}/{relative_dir}")
+                excluded_dirs[relative_dir] = excluded
+            if excluded:
+                continue
+        
+        extension = _get_extension(filename)
+        if scan_filter.exclusion_reason(filename, extension) is not None:
+            continue
+        
+        file_path = f"{output_root}/{relative}"
+        
+        # L'index ne reflète que le dernier "git add" : la taille réelle vient du disque
+        stat_count += 1
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            # Fichier suivi mais supprimé de l'arborescence de travail
+            logger.debug(f"Fichier suivi absent du disque: {file_path}")
+            continue
+        except OSError as e:
+            err_msg = f"Erreur d'accès au fichier '{file_path}': {str(e)}"
+            logger.warning(err_msg)
+            errors.append(err_msg)
+            continue
+        size = st.st_size
+        if size != entry.size or st.st_mtime_ns != entry.mtime_ns:
+            modified_count += 1
+        
+        if size > MAX_FILE_SIZE and not scan_filter.include_large_files:
+            continue
+        
+        # Un préfixe interné par dossier, partagé par tous ses fichiers
+        dir_prefix = dir_prefixes.get(relative_dir)
+        if dir_prefix is None:
+            dir_prefix = dir_prefixes[relative_dir] = intern_prefix(f"{output_root}/{relative_dir}" if relative_dir else output_root)
+        results.append(FileRecord(dir_prefix, filename, size, extension, excerpt=size > MAX_FILE_SIZE))
+        
+        # Sous-dossiers (et leurs parents) contenant au moins un fichier retenu
+        while relative_dir and relative_dir not in subdirectories:
+            subdirectories.add(relative_dir)
+            relative_dir = relative_dir.rpartition("/")[0]
+    
+    logger.info(f"Scan de l'index git pour {directory}: {len(results)} fichiers, {stat_count} vérifiés sur disque dont {modified_count} modifiés depuis l'index")
+    return {"files": results, "errors": errors, "subdirectories": len(subdirectories)}
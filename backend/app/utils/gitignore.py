@@ -0,0 +1,259 @@
+"""
+Prise en compte des fichiers .gitignore pendant le parcours du scan de copie.
+
+Les règles suivent la syntaxe de git (négation "!", motifs ancrés, "**",
+motifs réservés aux dossiers "/"), sont compilées une seule fois par
+fichier d'exclusion (cache indexé par chemin, taille et date de
+modification) et chaînées du dépôt vers les sous-dossiers pendant le
+parcours.
+"""
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.gitignore")
+
+# Nombre maximal de fichiers d'exclusion compilés gardés en cache
+RULES_CACHE_MAX_ENTRIES = 4096
+
+_rules_cache: "OrderedDict[str, Tuple[Tuple[int, int], Optional[IgnoreRules]]]" = OrderedDict()
+_rules_cache_lock = threading.Lock()
+
+
+def _translate_glob(pattern: str) -> str:
+    """
+    Traduit un motif gitignore (sans ancrage ni "/" final) en expression régulière.
+    
+    "*" et "?" ne traversent pas les "/", "**" en segment complet traverse
+    n'importe quel nombre de dossiers.
+    """
+    result = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i):
+                at_start = i == 0 or pattern[i - 1] == "/"
+                after = i + 2
+                if at_start and after < n and pattern[after] == "/":
+                    # "**/" : zéro ou plusieurs dossiers
+                    result.append("(?:.*/)?")
+                    i = after + 1
+                    continue
+                if at_start and after == n:
+                    # "/**" final : tout ce qui est dessous
+                    result.append(".*")
+                    i = after
+                    continue
+            result.append("[^/]*")
+            i += 1
+        elif c == "?":
+            result.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern.startswith("[!", i) or pattern.startswith("[^", i) else i + 1)
+            if end == -1:
+                result.append(re.escape(c))
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            result.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+            i = end + 1
+        elif c == "\\" and i + 1 < n:
+            result.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            result.append(re.escape(c))
+            i += 1
+    return "".join(result)
+
+
+class IgnoreRule:
+    """Une ligne de fichier .gitignore compilée."""
+
+    __slots__ = ("negated", "dir_only", "anchored", "literal", "regex")
+
+    def __init__(self, line: str):
+        self.negated = line.startswith("!")
+        if self.negated:
+            line = line[1:]
+        elif line.startswith("\\!") or line.startswith("\\#"):
+            line = line[1:]
+        
+        self.dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        
+        # Un "/" ailleurs qu'en fin de motif ancre la règle au dossier du fichier d'exclusion
+        self.anchored = "/" in line
+        line = line.lstrip("/")
+        
+        # Nom simple sans joker : une comparaison de chaînes suffit
+        self.literal = line if not self.anchored and not any(c in line for c in "*?[\\") else None
+        self.regex = None if self.literal is not None else re.compile(_translate_glob(line) + r"\Z", re.DOTALL)
+
+    def matches(self, relative_path: str, name: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.literal is not None:
+            return name == self.literal
+        return self.regex.match(relative_path if self.anchored else name) is not None
+
+
+class IgnoreRules:
+    """Règles d'un fichier d'exclusion, relatives au dossier base_dir."""
+
+    __slots__ = ("base_dir", "rules")
+
+    def __init__(self, base_dir: str, rules: List[IgnoreRule]):
+        self.base_dir = base_dir
+        self.rules = rules
+
+    @classmethod
+    def parse(cls, base_dir: str, text: str) -> "IgnoreRules":
+        rules = []
+        for raw_line in text.splitlines():
+            line = raw_line.rstrip("\n")
+            # Espaces finaux ignorés sauf s'ils sont échappés
+            stripped = line.rstrip(" ")
+            if stripped.endswith("\\") and len(stripped) < len(line):
+                stripped += " "
+            if not stripped or stripped.startswith("#"):
+                continue
+            try:
+                rules.append(IgnoreRule(stripped))
+            except re.error as e:
+                logger.debug(f"Règle gitignore ignorée '{stripped}': {str(e)}")
+        return cls(base_dir, rules)
+
+    def match(self, path: str, name: str, is_dir: bool) -> Optional[bool]:
+        """
+        Retourne True (ignoré), False (ré-inclus par "!") ou None (aucune règle).
+        
+        La dernière règle qui correspond l'emporte.
+        """
+        relative_path = path[len(self.base_dir) + 1:].replace("\\", "/")
+        for rule in reversed(self.rules):
+            if rule.matches(relative_path, name, is_dir):
+                return not rule.negated
+        return None
+
+
+def load_ignore_file(file_path: str, base_dir: str) -> Optional[IgnoreRules]:
+    """
+    Charge et compile un fichier d'exclusion, en passant par le cache.
+    
+    Un seul stat revalide l'entrée ; le fichier n'est relu et recompilé que
+    s'il a changé.
+    
+    Args:
+        file_path: Chemin du fichier (.gitignore, .git/info/exclude)
+        base_dir: Dossier auquel les règles sont relatives
+        
+    Returns:
+        Règles compilées, ou None si le fichier est absent ou vide
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    signature = (st.st_size, st.st_mtime_ns)
+    
+    with _rules_cache_lock:
+        cached = _rules_cache.get(file_path)
+        if cached is not None and cached[0] == signature:
+            _rules_cache.move_to_end(file_path)
+            return cached[1]
+    
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            rules = IgnoreRules.parse(base_dir, f.read())
+    except OSError as e:
+        logger.warning(f"Lecture impossible de {file_path}: {str(e)}")
+        return None
+    if not rules.rules:
+        rules = None
+    
+    with _rules_cache_lock:
+        _rules_cache[file_path] = (signature, rules)
+        _rules_cache.move_to_end(file_path)
+        while len(_rules_cache) > RULES_CACHE_MAX_ENTRIES:
+            _rules_cache.popitem(last=False)
+    return rules
+
+
+def find_repository_root(directory: str) -> Optional[str]:
+    """
+    Remonte l'arborescence jusqu'au dossier contenant ".git".
+    
+    Returns:
+        Racine du dépôt, ou None si directory n'est pas dans un dépôt git
+    """
+    current = os.path.abspath(directory)
+    while True:
+        if os.path.exists(os.path.join(current, ".git")):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def initial_ignore_chain(directory: str) -> Tuple[IgnoreRules, ...]:
+    """
+    Règles applicables au dossier racine d'un scan, avant de lister son contenu.
+    
+    Comprend .git/info/exclude et les .gitignore des dossiers parents, de la
+    racine du dépôt jusqu'au parent de directory. Le .gitignore de directory
+    lui-même est chargé pendant le parcours.
+    
+    Les dossiers de base des règles sont des chemins absolus : les chemins
+    comparés doivent l'être aussi.
+    
+    Args:
+        directory: Dossier racine du scan
+        
+    Returns:
+        Chaîne de règles, de la moins prioritaire à la plus prioritaire
+    """
+    top = os.path.abspath(directory)
+    repository_root = find_repository_root(top)
+    if repository_root is None:
+        return ()
+    
+    chain = []
+    info_exclude = load_ignore_file(os.path.join(repository_root, ".git", "info", "exclude"), repository_root)
+    if info_exclude is not None:
+        chain.append(info_exclude)
+    
+    # Dossiers parents du dossier scanné, jusqu'à la racine du dépôt
+    parents = []
+    current = top
+    while current != repository_root:
+        current = os.path.dirname(current)
+        parents.append(current)
+    
+    for parent in reversed(parents):
+        rules = load_ignore_file(os.path.join(parent, ".gitignore"), parent)
+        if rules is not None:
+            chain.append(rules)
+    return tuple(chain)
+
+
+def is_ignored(chain: Tuple[IgnoreRules, ...], path: str, name: str, is_dir: bool) -> bool:
+    """
+    Indique si une entrée est ignorée par la chaîne de règles.
+    
+    Les fichiers d'exclusion les plus profonds sont prioritaires ; à
+    l'intérieur d'un fichier, la dernière règle qui correspond l'emporte.
+    """
+    for rules in reversed(chain):
+        result = rules.match(path, name, is_dir)
+        if result is not None:
+            return result
+    return False
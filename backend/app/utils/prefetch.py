@@ -0,0 +1,136 @@
+"""
+Préchargement spéculatif du contenu des fichiers dans le cache après un scan.
+"""
+import os
+import sys
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from ..config import PREFETCH_MAX_BYTES
+from .archives import archive_session
+from .content_cache import READ_ERROR_PREFIXES, content_cache, read_file_content_cached
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.prefetch")
+
+# Valeur nice du thread de préchargement (priorité CPU, et E/S sous CFQ/BFQ sans ioprio explicite)
+PREFETCH_NICE = 19
+
+# Surcoût fixe d'une chaîne en mémoire (le cache compte sys.getsizeof)
+_STR_OVERHEAD = sys.getsizeof("")
+
+
+def _lower_thread_priority() -> None:
+    """
+    Baisse la priorité du thread courant.
+
+    Sous Linux, chaque thread a sa propre valeur nice (setpriority sur son
+    identifiant natif), et l'ordonnanceur d'E/S en dérive la priorité des
+    lectures. Ailleurs, le préchargement tourne sans changement de priorité.
+    """
+    if not hasattr(os, "setpriority") or not hasattr(threading, "get_native_id"):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PREFETCH_NICE)
+    except OSError as e:
+        logger.debug(f"Impossible de baisser la priorité du préchargement: {str(e)}")
+
+
+class Prefetcher:
+    """
+    Précharge en arrière-plan les fichiers d'une sélection dans le cache de contenu.
+
+    Une seule sélection est préchargée à la fois : en démarrer une nouvelle (ou
+    appeler cancel) arrête la précédente avant le fichier suivant.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel_event: Optional[threading.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"status": "inactif", "files": 0, "bytes": 0, "skipped": 0, "total": 0}
+
+    def cancel(self) -> None:
+        """Arrête le préchargement en cours, s'il y en a un."""
+        with self._lock:
+            if self._cancel_event is not None and not self._cancel_event.is_set():
+                self._cancel_event.set()
+                logger.info("Préchargement annulé (nouvelle sélection)")
+
+    def start(
+        self,
+        matches: List[Dict[str, Any]],
+        read_func: Callable[[str], str] = read_file_content_cached,
+        max_bytes: Optional[int] = None
+    ) -> None:
+        """
+        Lance le préchargement d'une sélection (la précédente est annulée).
+
+        Args:
+            matches: Fichiers à précharger, dans l'ordre où ils seront lus
+            read_func: Fonction de lecture qui alimente le cache
+            max_bytes: Place maximale occupée dans le cache (PREFETCH_MAX_BYTES, bornée à la moitié du cache)
+        """
+        if content_cache.max_bytes <= 0:
+            return
+        limit = min(max_bytes if max_bytes is not None else PREFETCH_MAX_BYTES, content_cache.max_bytes // 2)
+
+        cancel_event = threading.Event()
+        with self._lock:
+            if self._cancel_event is not None:
+                self._cancel_event.set()
+            self._cancel_event = cancel_event
+            self._stats = {"status": "en_cours", "files": 0, "bytes": 0, "skipped": 0, "total": len(matches)}
+            stats = self._stats
+            self._thread = threading.Thread(
+                target=self._run, args=(list(matches), read_func, limit, cancel_event, stats),
+                name="toolbox-prefetch", daemon=True
+            )
+            self._thread.start()
+        logger.info(f"Préchargement de {len(matches)} fichiers (au plus {limit} octets)")
+
+    def _run(self, matches, read_func, limit, cancel_event, stats) -> None:
+        _lower_thread_priority()
+        # Les archives lues restent ouvertes jusqu'à la fin du préchargement
+        with archive_session():
+            for file_match in matches:
+                if cancel_event.is_set():
+                    stats["status"] = "annulé"
+                    return
+                # Estimation avant lecture : un texte ASCII occupe sa taille sur disque ;
+                # un extrait ne dépend pas de la taille du fichier, il est compté après lecture
+                estimate = 0 if file_match.get("excerpt") else file_match["size"] + _STR_OVERHEAD
+                if stats["bytes"] + estimate > limit:
+                    # Un fichier plus petit peut encore tenir sous le plafond
+                    stats["skipped"] += 1
+                    continue
+                try:
+                    content = read_func(file_match["path"])
+                except Exception as e:
+                    logger.debug(f"Préchargement de {file_match['path']} impossible: {str(e)}")
+                    stats["skipped"] += 1
+                    continue
+                if isinstance(content, str) and content.startswith(READ_ERROR_PREFIXES):
+                    # Les erreurs de lecture ne sont pas mises en cache
+                    stats["skipped"] += 1
+                    continue
+                stats["files"] += 1
+                # Le plafond porte sur la place occupée dans le cache (texte décodé ou extrait)
+                stats["bytes"] += sys.getsizeof(content) if isinstance(content, str) else 0
+            stats["status"] = "terminé"
+            logger.info(f"Préchargement terminé: {stats['files']} fichiers, {stats['bytes']} octets")
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Attend la fin du préchargement en cours (utile aux tests)."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+# Préchargement partagé par les routes
+prefetcher = Prefetcher()
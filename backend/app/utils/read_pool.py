@@ -0,0 +1,107 @@
+"""
+Lecture parallèle de fichiers avec restitution dans l'ordre d'origine.
+"""
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from ..config import READ_WORKERS, READ_MAX_INFLIGHT_BYTES
+from .file_utils import read_file_content
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.read_pool")
+
+# Taille des lots soumis au pool : les petits fichiers sont lus par groupes
+BATCH_MAX_FILES = 32
+BATCH_MAX_BYTES = 256 * 1024
+
+
+def iter_read_files(
+    matches: Iterable[Dict[str, Any]],
+    read_func: Callable[[str], str] = read_file_content,
+    max_workers: Optional[int] = None,
+    max_inflight_bytes: Optional[int] = None
+) -> Iterator[Tuple[Dict[str, Any], Optional[str], Optional[Exception]]]:
+    """
+    Lit les fichiers dans un pool de threads et les restitue dans l'ordre de matches.
+    
+    Les fichiers sont soumis au pool par petits lots consécutifs. Les lectures
+    sont lancées en avance tant que le volume lu mais pas encore consommé
+    (estimé avec la taille du scan) reste sous max_inflight_bytes. Au moins un
+    lot est toujours en cours, même pour un fichier plus gros que le budget.
+    
+    Args:
+        matches: Fichiers à lire (dictionnaires avec au moins "path" et "size")
+        read_func: Fonction de lecture appliquée à chaque chemin
+        max_workers: Nombre de threads (1 = lecture séquentielle dans le thread appelant)
+        max_inflight_bytes: Budget d'octets lus en avance
+        
+    Yields:
+        Tuple (fichier, contenu ou None, exception ou None)
+    """
+    workers = max_workers if max_workers is not None else READ_WORKERS
+    budget = max_inflight_bytes if max_inflight_bytes is not None else READ_MAX_INFLIGHT_BYTES
+    
+    if workers <= 1:
+        for file_match in matches:
+            try:
+                yield file_match, read_func(file_match["path"]), None
+            except Exception as e:
+                yield file_match, None, e
+        return
+    
+    logger.debug(f"Lecture parallèle avec {workers} threads (budget {budget} octets)")
+    
+    def read_batch(batch):
+        results = []
+        for file_match in batch:
+            try:
+                results.append((file_match, read_func(file_match["path"]), None))
+            except Exception as e:
+                results.append((file_match, None, e))
+        return results
+    
+    def iter_batches():
+        # Regrouper les petits fichiers consécutifs pour amortir le coût d'une tâche
+        batch, batch_bytes = [], 0
+        for file_match in matches:
+            batch.append(file_match)
+            batch_bytes += file_match.get("size", 0)
+            if len(batch) >= BATCH_MAX_FILES or batch_bytes >= BATCH_MAX_BYTES:
+                yield batch, batch_bytes
+                batch, batch_bytes = [], 0
+        if batch:
+            yield batch, batch_bytes
+    
+    pending = deque()
+    inflight_bytes = 0
+    batches = iter_batches()
+    exhausted = False
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="toolbox-read")
+    
+    try:
+        while True:
+            # Remplir le pipeline : assez de lectures pour occuper les threads, sans dépasser le budget
+            while not exhausted and len(pending) < workers * 2 and (not pending or inflight_bytes < budget):
+                try:
+                    batch, batch_bytes = next(batches)
+                except StopIteration:
+                    exhausted = True
+                    break
+                inflight_bytes += batch_bytes
+                pending.append((batch_bytes, executor.submit(read_batch, batch)))
+            
+            if not pending:
+                break
+            
+            # Émettre le plus ancien lot, dans l'ordre d'origine
+            batch_bytes, future = pending.popleft()
+            results = future.result()
+            inflight_bytes -= batch_bytes
+            yield from results
+    finally:
+        # Consommateur interrompu (client déconnecté...) : annuler les lectures restantes
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
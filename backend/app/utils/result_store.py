@@ -0,0 +1,256 @@
+"""
+Conservation côté serveur des résultats de scan, consultés ensuite par pages avec un curseur.
+"""
+import time
+import uuid
+import zlib
+import base64
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import SCAN_RESULTS_MAX_ENTRIES, SCAN_RESULTS_TTL, SCAN_RESULTS_MAX_BYTES
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.result_store")
+
+# Clés de tri disponibles (le chemin départage les égalités pour un ordre stable)
+SORT_KEYS = {
+    "path": lambda match: match["path"],
+    "size": lambda match: (match["size"], match["path"]),
+    "extension": lambda match: (match["extension"].lower(), match["path"]),
+}
+
+# Nombre de vues triées/filtrées gardées par résultat
+MAX_VIEWS_PER_RESULT = 4
+
+# Coût mémoire approximatif d'un fichier conservé (FileRecord, taille, référence), hors nom ;
+# le préfixe de dossier est partagé par les fichiers d'un même dossier
+_MATCH_OVERHEAD = 160
+
+
+class InvalidCursorError(ValueError):
+    """Curseur illisible ou obtenu avec un autre tri ou d'autres filtres."""
+
+
+class StoredScan:
+    """Résultat de scan conservé, avec ses vues triées et filtrées déjà calculées."""
+
+    def __init__(self, result_id: str, result: Dict[str, Any], fingerprint: Optional[str] = None):
+        self.result_id = result_id
+        self.matches: List[Dict[str, Any]] = result["matches"]
+        self.total_subdirectories = result.get("total_subdirectories", 0)
+        self.invalid_paths = result.get("invalid_paths")
+        # Empreinte des paramètres du scan, pour vérifier qu'une requête ultérieure porte sur la même sélection
+        self.fingerprint = fingerprint
+        # Estimation de l'occupation mémoire (vues comprises, une référence par fichier)
+        self.estimated_bytes = sum(_MATCH_OVERHEAD + len(match["name"]) for match in self.matches)
+        self.created = time.time()
+        self.last_access = self.created
+        self._views: "OrderedDict[Tuple, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def view(self, sort: str, order: str, filters: Tuple) -> List[Dict[str, Any]]:
+        """
+        Retourne les fichiers filtrés et triés (calculés une fois par combinaison).
+
+        Args:
+            sort: Clé de tri ("path", "size" ou "extension")
+            order: "asc" ou "desc"
+            filters: Filtres normalisés (voir normalize_filters)
+
+        Returns:
+            Liste des fichiers de la vue
+        """
+        key = (sort, order, filters)
+        with self._lock:
+            cached = self._views.get(key)
+            if cached is not None:
+                self._views.move_to_end(key)
+                return cached
+
+        extensions, text, min_size, max_size = filters
+        selected = self.matches
+        if extensions or text or min_size is not None or max_size is not None:
+            selected = [
+                match for match in self.matches
+                if (not extensions or match["extension"].lower() in extensions)
+                and (not text or text in match["path"].lower())
+                and (min_size is None or match["size"] >= min_size)
+                and (max_size is None or match["size"] <= max_size)
+            ]
+        view = sorted(selected, key=SORT_KEYS[sort], reverse=(order == "desc"))
+
+        with self._lock:
+            self._views[key] = view
+            while len(self._views) > MAX_VIEWS_PER_RESULT:
+                self._views.popitem(last=False)
+        return view
+
+
+def normalize_filters(
+    extensions: Optional[List[str]] = None,
+    text: Optional[str] = None,
+    min_size: Optional[int] = None,
+    max_size: Optional[int] = None
+) -> Tuple:
+    """Met les filtres sous une forme hashable et insensible à la casse."""
+    normalized_extensions = frozenset(ext.lower().lstrip(".") for ext in extensions or [] if ext)
+    return (normalized_extensions, (text or "").lower(), min_size, max_size)
+
+
+def _view_tag(sort: str, order: str, filters: Tuple) -> str:
+    extensions, text, min_size, max_size = filters
+    description = f"{sort}|{order}|{','.join(sorted(extensions))}|{text}|{min_size}|{max_size}"
+    return format(zlib.crc32(description.encode("utf-8")), "08x")
+
+
+def encode_cursor(offset: int, sort: str, order: str, filters: Tuple) -> str:
+    """Encode un curseur opaque : position dans la vue et empreinte du tri et des filtres."""
+    tag = _view_tag(sort, order, filters)
+    return base64.urlsafe_b64encode(f"{offset}:{tag}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str, filters: Tuple) -> int:
+    """
+    Décode un curseur et vérifie qu'il correspond au tri et aux filtres demandés.
+
+    Returns:
+        Position dans la vue
+
+    Raises:
+        InvalidCursorError: Si le curseur est illisible ou appartient à une autre vue
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset_text, tag = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii").split(":")
+        offset = int(offset_text)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursorError(f"Curseur invalide: {cursor}") from e
+    if offset < 0 or tag != _view_tag(sort, order, filters):
+        raise InvalidCursorError("Curseur obtenu avec un autre tri ou d'autres filtres")
+    return offset
+
+
+class ScanResultStore:
+    """
+    Résultats de scan en mémoire, retrouvés par leur identifiant.
+
+    Les résultats expirent après `ttl` secondes sans consultation ; au-delà de
+    `max_entries` résultats ou de `max_bytes` estimés, les moins récemment
+    consultés sont évincés (le dernier conservé est toujours gardé).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SCAN_RESULTS_MAX_ENTRIES,
+        ttl: float = SCAN_RESULTS_TTL,
+        max_bytes: int = SCAN_RESULTS_MAX_BYTES
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, StoredScan]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remove(self, result_id: str) -> None:
+        stored = self._entries.pop(result_id)
+        self.current_bytes -= stored.estimated_bytes
+
+    def _expire(self, now: float) -> None:
+        expired = [result_id for result_id, stored in self._entries.items() if now - stored.last_access > self.ttl]
+        for result_id in expired:
+            self._remove(result_id)
+        if expired:
+            logger.debug(f"{len(expired)} résultats de scan expirés")
+
+    def put(self, result: Dict[str, Any], fingerprint: Optional[str] = None) -> str:
+        """
+        Conserve un résultat de scan.
+
+        Args:
+            result: Résultat au format AdvancedCopyResult
+            fingerprint: Empreinte des paramètres du scan (optionnelle)
+
+        Returns:
+            Identifiant du résultat
+        """
+        result_id = uuid.uuid4().hex
+        stored = StoredScan(result_id, result, fingerprint)
+        with self._lock:
+            self._expire(stored.created)
+            self._entries[result_id] = stored
+            self.current_bytes += stored.estimated_bytes
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes):
+                evicted = next(iter(self._entries))
+                self._remove(evicted)
+                logger.debug(f"Résultat de scan {evicted} évincé")
+        return result_id
+
+    def get(self, result_id: str) -> Optional[StoredScan]:
+        """Retourne le résultat conservé, ou None s'il est inconnu ou expiré."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            stored = self._entries.get(result_id)
+            if stored is not None:
+                stored.last_access = now
+                self._entries.move_to_end(result_id)
+            return stored
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+            }
+
+
+def get_page(
+    stored: StoredScan,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    sort: str = "path",
+    order: str = "asc",
+    filters: Tuple = normalize_filters()
+) -> Dict[str, Any]:
+    """
+    Retourne une page de la vue demandée.
+
+    Args:
+        stored: Résultat conservé
+        cursor: Curseur de la page précédente (None pour la première page)
+        limit: Nombre maximal de fichiers
+        sort: Clé de tri
+        order: "asc" ou "desc"
+        filters: Filtres normalisés
+
+    Returns:
+        Dictionnaire avec "matches", "total" (taille de la vue) et "next_cursor" (None en fin de vue)
+
+    Raises:
+        InvalidCursorError: Si le curseur ne correspond pas à la vue
+    """
+    offset = decode_cursor(cursor, sort, order, filters) if cursor else 0
+    view = stored.view(sort, order, filters)
+    page = view[offset:offset + limit]
+    end = offset + len(page)
+    return {
+        "matches": page,
+        "total": len(view),
+        "next_cursor": encode_cursor(end, sort, order, filters) if end < len(view) else None,
+    }
+
+
+# Résultats de scan partagés par les routes
+scan_result_store = ScanResultStore()
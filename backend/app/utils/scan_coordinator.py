@@ -0,0 +1,183 @@
+"""
+Coordination du scan de plusieurs dossiers racines.
+"""
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import SCAN_WORKERS
+from .archives import split_archive_path
+from .file_utils import scan_directory
+from .git_index import scan_git_index
+from .scan_filter import ScanFilter
+from .scan_progress import ScanProgress
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.scan_coordinator")
+
+
+def _comparable_path(path: str) -> str:
+    """Chemin absolu, liens résolus et casse normalisée, pour comparer des racines."""
+    return os.path.normcase(os.path.realpath(path))
+
+
+def collapse_nested_roots(roots: List[Tuple[str, str]], recursive: bool = True) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    Retire les racines déjà couvertes par une autre racine.
+    
+    En mode récursif, une racine située dans une autre (ou identique) est
+    absorbée. Sans récursion, seules les racines identiques le sont. Le
+    parcours d'un dossier n'entrant pas dans les archives, une racine dans
+    une archive n'est absorbée que par l'archive elle-même ou l'un de ses
+    dossiers.
+    
+    Args:
+        roots: Couples (chemin fourni par le client, chemin nettoyé)
+        recursive: Scan récursif
+        
+    Returns:
+        Tuple (racines conservées dans l'ordre d'origine, racines absorbées)
+    """
+    comparable = [(_comparable_path(dir_path), index) for index, (_, dir_path) in enumerate(roots)]
+    # Archive traversée par chaque racine (None pour un dossier ordinaire)
+    archives = {}
+    for index, (_, dir_path) in enumerate(roots):
+        location = split_archive_path(dir_path)
+        archives[index] = _comparable_path(location[0]) if location is not None else None
+    kept_indexes = set()
+    kept_paths: List[str] = []
+    
+    def contains(parent: str, path: str) -> bool:
+        return path == parent or (recursive and path.startswith(parent.rstrip(os.sep) + os.sep))
+    
+    # Les racines les plus courtes d'abord : un parent est toujours vu avant ses descendants
+    for path, index in sorted(comparable, key=lambda item: (len(item[0]), item[1])):
+        archive = archives[index]
+        covered = any(
+            contains(parent, path) and (archive is None or parent == archive or parent.startswith(archive + os.sep))
+            for parent in kept_paths
+        )
+        if not covered:
+            kept_paths.append(path)
+            kept_indexes.add(index)
+    
+    kept = [root for index, root in enumerate(roots) if index in kept_indexes]
+    collapsed = [root for index, root in enumerate(roots) if index not in kept_indexes]
+    return kept, collapsed
+
+
+def _scan_root(
+    dir_path: str,
+    scan_filter: ScanFilter,
+    recursive: bool,
+    source: str,
+    progress: Optional[ScanProgress] = None
+) -> Dict[str, Any]:
+    """Scanne une racine avec la source demandée (index git si possible, sinon parcours)."""
+    if progress is not None and progress.cancelled:
+        logger.info(f"Scan annulé, dossier {dir_path} non parcouru")
+        return {"files": [], "errors": [], "subdirectories": 0}
+    
+    if source == "git_index":
+        logger.info(f"Scan de l'index git pour: {dir_path}")
+        scan_result = scan_git_index(dir_path, scan_filter, recursive=recursive)
+        if scan_result is not None:
+            # L'index est lu d'un bloc : l'avancement est signalé en une fois
+            if progress is not None:
+                for file_info in scan_result["files"]:
+                    progress.add_file(file_info)
+            return scan_result
+        logger.info(f"Pas d'index git exploitable pour {dir_path}, parcours du système de fichiers")
+    
+    logger.info(f"Scan du dossier: {dir_path} (récursif={recursive})")
+    return scan_directory(
+        directory=dir_path,
+        recursive=recursive,
+        scan_filter=scan_filter,
+        with_identity=True,
+        progress=progress
+    )
+
+
+def scan_roots(
+    roots: List[Tuple[str, str]],
+    scan_filter: ScanFilter,
+    recursive: bool = True,
+    source: str = "filesystem",
+    max_workers: Optional[int] = None,
+    progress: Optional[ScanProgress] = None
+) -> Dict[str, Any]:
+    """
+    Scanne plusieurs racines en parallèle et fusionne leurs résultats.
+    
+    - les racines imbriquées dans une autre sont absorbées avant le scan ;
+    - les racines restantes, disjointes, sont parcourues en parallèle ;
+    - les fichiers vus plusieurs fois (liens physiques ou symboliques) sont
+      dédoublonnés par (st_dev, st_ino), ou par chemin à défaut ;
+    - le nombre de sous-dossiers est celui compté pendant le parcours.
+    
+    Args:
+        roots: Couples (chemin fourni par le client, chemin nettoyé) des dossiers valides
+        scan_filter: Règles d'exclusion compilées
+        recursive: Scan récursif
+        source: "filesystem" ou "git_index"
+        max_workers: Nombre de racines scannées simultanément (config.SCAN_WORKERS par défaut)
+        progress: Suivi d'avancement partagé par les parcours (annulation comprise)
+        
+    Returns:
+        Dictionnaire avec "files" (dans l'ordre des racines), "errors" (couples
+        (chemin fourni, message)), "subdirectories" et "seen" (identités déjà
+        retenues, à réutiliser pour d'autres fichiers)
+    """
+    kept, collapsed = collapse_nested_roots(roots, recursive)
+    for original, dir_path in collapsed:
+        logger.info(f"Dossier {dir_path} déjà couvert par une autre racine, ignoré")
+    
+    workers = max(1, min(len(kept), max_workers if max_workers is not None else SCAN_WORKERS))
+    if workers == 1:
+        outcomes = []
+        for _, dir_path in kept:
+            try:
+                outcomes.append((_scan_root(dir_path, scan_filter, recursive, source, progress), None))
+            except Exception as e:
+                outcomes.append((None, e))
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="toolbox-scan") as executor:
+            futures = [executor.submit(_scan_root, dir_path, scan_filter, recursive, source, progress) for _, dir_path in kept]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append((future.result(), None))
+                except Exception as e:
+                    outcomes.append((None, e))
+    
+    files = []
+    errors = []
+    subdirectories = 0
+    seen = set()
+    duplicates = 0
+    
+    for (original, dir_path), (scan_result, error) in zip(kept, outcomes):
+        if error is not None:
+            logger.error(f"Erreur générale lors du traitement de {dir_path}: {str(error)}")
+            errors.append((original, str(error)))
+            continue
+        
+        errors.extend((original, error_msg) for error_msg in scan_result.get("errors", []))
+        subdirectories += scan_result.get("subdirectories", 0)
+        
+        for file_info in scan_result["files"]:
+            # L'identité ne sert qu'ici : elle est effacée pour ne pas rester en mémoire avec le résultat
+            identity = file_info.identity
+            file_info.identity = None
+            key = identity if identity and identity[1] else file_info["path"]
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            files.append(file_info)
+    
+    if duplicates:
+        logger.info(f"{duplicates} fichiers en double retirés entre les racines")
+    return {"files": files, "errors": errors, "subdirectories": subdirectories, "seen": seen}
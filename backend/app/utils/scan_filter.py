@@ -0,0 +1,151 @@
+"""
+Filtre compilé des règles d'exclusion du scan de copie.
+"""
+import re
+import os
+import logging
+from typing import Iterable, List, Optional, Pattern
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.scan_filter")
+
+# Drapeaux par défaut d'un motif compilé (sert à repérer les motifs avec drapeaux en ligne)
+_DEFAULT_FLAGS = re.compile("").flags
+
+
+class ScanFilter:
+    """
+    Règles d'exclusion compilées une seule fois par requête.
+    
+    - exclude_extensions : frozenset, test en O(1)
+    - exclude_patterns : combinés en une seule expression régulière
+      (les motifs avec groupes ou drapeaux en ligne restent compilés à part)
+    - exclude_directories : noms simples dans un frozenset, chemins à
+      plusieurs segments ("src/generated") testés par suffixe
+    
+    - respect_gitignore : les règles .gitignore rencontrées pendant le
+      parcours sont appliquées en plus (voir app.utils.gitignore)
+    - include_content_patterns : motifs cherchés dans le contenu, validés ici
+      et appliqués après le parcours (voir app.utils.content_match)
+    
+    Les tests les moins coûteux (nom de dossier, extension) sont faits en
+    premier ; les dossiers exclus sont écartés avant d'être listés.
+    """
+
+    def __init__(
+        self,
+        exclude_extensions: Iterable[str] = (),
+        exclude_patterns: Iterable[str] = (),
+        exclude_directories: Iterable[str] = (),
+        respect_gitignore: bool = False,
+        include_large_files: bool = False,
+        include_content_patterns: Iterable[str] = ()
+    ):
+        self.respect_gitignore = respect_gitignore
+        # Garder les fichiers plus gros que MAX_FILE_SIZE (lus ensuite en extrait)
+        self.include_large_files = include_large_files
+        self.exclude_extensions = frozenset(exclude_extensions)
+        self.exclude_directories = tuple(exclude_directories)
+        self._excluded_names = frozenset(self.exclude_directories)
+        # Suffixes "/a/b" des exclusions à plusieurs segments
+        self._excluded_suffixes = tuple(f"/{d}" for d in self.exclude_directories if "/" in d)
+        self._patterns = self._compile_patterns(list(exclude_patterns))
+        self.content_patterns = tuple(include_content_patterns)
+        for pattern in self.content_patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Motif de contenu invalide '{pattern}': {str(e)}")
+
+    @classmethod
+    def from_rules(cls, rules) -> "ScanFilter":
+        """
+        Construit le filtre à partir d'un AdvancedCopyRule (ou objet équivalent).
+        """
+        return cls(
+            exclude_extensions=rules.exclude_extensions,
+            exclude_patterns=rules.exclude_patterns,
+            exclude_directories=rules.exclude_directories,
+            respect_gitignore=getattr(rules, "respect_gitignore", False),
+            include_large_files=getattr(rules, "large_files", "skip") == "excerpt",
+            include_content_patterns=getattr(rules, "include_content_patterns", ())
+        )
+
+    @staticmethod
+    def _compile_patterns(patterns: List[str]) -> List[Pattern]:
+        """
+        Compile les motifs d'exclusion, en les combinant quand c'est sûr.
+        
+        Raises:
+            ValueError: Si un motif n'est pas une expression régulière valide
+        """
+        combinable = []
+        separate = []
+        for pattern in patterns:
+            try:
+                compiled = re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Motif d'exclusion invalide '{pattern}': {str(e)}")
+            # Les groupes (références arrière) et drapeaux en ligne changent de sens une fois combinés
+            if compiled.groups == 0 and compiled.flags == _DEFAULT_FLAGS:
+                combinable.append(pattern)
+            else:
+                separate.append(compiled)
+        
+        if len(combinable) > 1:
+            return [re.compile("|".join(f"(?:{pattern})" for pattern in combinable))] + separate
+        return [re.compile(pattern) for pattern in combinable] + separate
+
+    def is_directory_excluded(self, path: str) -> bool:
+        """
+        Indique si un dossier (ou l'un de ses parents) est exclu.
+        
+        Test complet, à utiliser pour un dossier racine ou le dossier parent
+        d'un fichier isolé.
+        """
+        if not self._excluded_names:
+            return False
+        return os.path.basename(path) in self._excluded_names or any(
+            f"/{excluded_dir}/" in f"{path}/"
+            for excluded_dir in self.exclude_directories
+        )
+
+    def is_subdirectory_excluded(self, name: str, path: str) -> bool:
+        """
+        Indique si un sous-dossier d'un dossier non exclu doit être écarté.
+        
+        Le parent ayant déjà passé le test, seul le dernier segment peut
+        déclencher une exclusion : un test d'appartenance et un test de suffixe
+        suffisent.
+        
+        Args:
+            name: Nom du sous-dossier
+            path: Chemin complet du sous-dossier
+        """
+        if name in self._excluded_names:
+            return True
+        return bool(self._excluded_suffixes) and path.endswith(self._excluded_suffixes)
+
+    def excluded_extension(self, extension: str) -> bool:
+        """Indique si l'extension (sans le point) est exclue."""
+        return extension in self.exclude_extensions
+
+    def excluded_name(self, filename: str) -> bool:
+        """Indique si le nom de fichier correspond à un motif d'exclusion."""
+        for pattern in self._patterns:
+            if pattern.search(filename):
+                return True
+        return False
+
+    def exclusion_reason(self, filename: str, extension: str) -> Optional[str]:
+        """
+        Évalue les règles portant sur le nom d'un fichier, de la moins coûteuse à la plus coûteuse.
+        
+        Returns:
+            "extension", "motif" ou None si le fichier est conservé
+        """
+        if extension in self.exclude_extensions:
+            return "extension"
+        if self._patterns and self.excluded_name(filename):
+            return "motif"
+        return None
@@ -0,0 +1,66 @@
+"""
+Suivi d'avancement et annulation coopérative d'un scan exécuté en tâche de fond.
+"""
+import threading
+from typing import Any, Dict, List
+
+
+class ScanProgress:
+    """
+    Avancement partagé entre le parcours (un ou plusieurs threads) et le suivi de la tâche.
+
+    Le parcours signale chaque dossier listé et chaque fichier retenu ; les
+    fichiers sont conservés au fil de l'eau dans `partial` pour pouvoir être
+    consultés avant la fin du scan. L'annulation est coopérative : le parcours
+    consulte `cancelled` avant de lister chaque dossier.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self.directories = 0
+        self.files = 0
+        self.bytes = 0
+        self.read_files = 0
+        self.read_bytes = 0
+        # Fichiers trouvés jusqu'ici, avant dédoublonnage entre racines
+        self.partial: List[Dict[str, Any]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self) -> None:
+        """Demande l'arrêt du parcours (pris en compte au prochain dossier)."""
+        self._cancel_event.set()
+
+    def add_directory(self) -> None:
+        with self._lock:
+            self.directories += 1
+
+    def add_file(self, file_info: Dict[str, Any]) -> None:
+        with self._lock:
+            self.files += 1
+            self.bytes += file_info["size"]
+            self.partial.append(file_info)
+
+    def add_read(self, size: int) -> None:
+        with self._lock:
+            self.read_files += 1
+            self.read_bytes += size
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Retourne les compteurs courants.
+
+        Returns:
+            Dictionnaire avec les dossiers parcourus, fichiers et octets trouvés, fichiers et octets lus
+        """
+        with self._lock:
+            return {
+                "directories": self.directories,
+                "files": self.files,
+                "bytes": self.bytes,
+                "read_files": self.read_files,
+                "read_bytes": self.read_bytes,
+            }
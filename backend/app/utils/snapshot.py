@@ -0,0 +1,149 @@
+"""
+Instantanés (manifestes) de format-content, pour n'exporter ensuite que les fichiers modifiés.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import TEMP_DIR, SNAPSHOT_MAX_FILES
+from .archives import stat_path
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.snapshot")
+
+# Dossier des manifestes
+SNAPSHOT_DIR = TEMP_DIR / "copy_snapshots"
+
+_SNAPSHOT_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Entrée de manifeste : (taille, mtime_ns, empreinte hexadécimale ou None pour un binaire ou une erreur)
+ManifestEntry = Tuple[int, int, Optional[str]]
+
+
+def stat_signature(file_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Retourne (taille, mtime_ns) d'un fichier, sans le lire.
+
+    Args:
+        file_path: Chemin du fichier
+
+    Returns:
+        Couple (taille, mtime_ns) ou None si le fichier est inaccessible
+    """
+    try:
+        st = stat_path(file_path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _snapshot_path(snapshot_id: str):
+    return SNAPSHOT_DIR / f"{snapshot_id}.json"
+
+
+def _prune_snapshots() -> None:
+    """Supprime les manifestes les plus anciens au-delà de SNAPSHOT_MAX_FILES."""
+    try:
+        manifests = sorted(SNAPSHOT_DIR.glob("*.json"), key=lambda path: path.stat().st_mtime)
+    except OSError:
+        return
+    for path in manifests[:max(0, len(manifests) - SNAPSHOT_MAX_FILES)]:
+        try:
+            path.unlink()
+            logger.debug(f"Instantané supprimé: {path.name}")
+        except OSError:
+            pass
+
+
+def save_snapshot(entries: Dict[str, ManifestEntry]) -> str:
+    """
+    Enregistre un manifeste sous TEMP_DIR.
+
+    Args:
+        entries: Chemin -> (taille, mtime_ns, empreinte)
+
+    Returns:
+        Identifiant de l'instantané
+    """
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    snapshot_id = uuid.uuid4().hex
+    path = _snapshot_path(snapshot_id)
+    temp_path = path.with_suffix(".tmp")
+
+    manifest = {"version": 1, "created": time.time(), "files": entries}
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    # Écriture atomique : un manifeste n'est jamais lu à moitié écrit
+    os.replace(temp_path, path)
+
+    _prune_snapshots()
+    logger.info(f"Instantané {snapshot_id} enregistré ({len(entries)} fichiers)")
+    return snapshot_id
+
+
+def load_snapshot(snapshot_id: str) -> Optional[Dict[str, ManifestEntry]]:
+    """
+    Charge un manifeste.
+
+    Args:
+        snapshot_id: Identifiant de l'instantané
+
+    Returns:
+        Chemin -> (taille, mtime_ns, empreinte), ou None si l'instantané est inconnu
+    """
+    if not _SNAPSHOT_ID_RE.match(snapshot_id):
+        return None
+    try:
+        with open(_snapshot_path(snapshot_id), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Instantané {snapshot_id} illisible: {str(e)}")
+        return None
+    return {path: tuple(entry) for path, entry in manifest.get("files", {}).items()}
+
+
+def classify_against_snapshot(
+    matches: List[Dict[str, Any]],
+    manifest: Dict[str, ManifestEntry]
+) -> Dict[str, Any]:
+    """
+    Compare les fichiers scannés à un manifeste à partir de leur seul stat().
+
+    Un fichier dont la taille et le mtime_ns sont inchangés est considéré comme
+    inchangé sans être lu ; les autres devront être lus, puis comparés par
+    empreinte (un fichier simplement « touché » reste inchangé).
+
+    Args:
+        matches: Fichiers scannés
+        manifest: Manifeste de l'instantané précédent
+
+    Returns:
+        Dictionnaire avec "added" et "changed" (fichiers à lire), "unchanged"
+        (chemin -> entrée du manifeste), "deleted" (chemins) et "signatures"
+        (chemin -> (taille, mtime_ns) courants)
+    """
+    added = []
+    changed = []
+    unchanged: Dict[str, ManifestEntry] = {}
+    signatures: Dict[str, Tuple[int, int]] = {}
+
+    for match in matches:
+        path = match["path"]
+        signature = stat_signature(path)
+        if signature is not None:
+            signatures[path] = signature
+        previous = manifest.get(path)
+        if previous is None:
+            added.append(match)
+        elif signature is not None and (previous[0], previous[1]) == signature:
+            unchanged[path] = previous
+        else:
+            changed.append(match)
+
+    current = {match["path"] for match in matches}
+    deleted = [path for path in manifest if path not in current]
+    return {"added": added, "changed": changed, "unchanged": unchanged, "deleted": deleted, "signatures": signatures}
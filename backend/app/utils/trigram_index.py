@@ -0,0 +1,526 @@
+"""
+Index de trigrammes sur disque (sqlite3) pour chercher dans le contenu des fichiers scannés.
+"""
+import os
+import re
+import sqlite3
+import logging
+import threading
+from array import array
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, Optional, Set, Union
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from ..config import TEMP_DIR
+from .file_utils import read_file_content
+from .archives import stat_path
+from .content_cache import read_file_content_cached
+from .read_pool import iter_read_files
+
+# Configuration du logger
+logger = logging.getLogger("toolbox.trigram_index")
+
+# Fichier de l'index
+INDEX_PATH = TEMP_DIR / "copy_index" / "trigrams.sqlite3"
+
+# Contenus renvoyés par read_file_content qui ne sont pas le texte du fichier
+_UNREADABLE_PREFIXES = ("[Erreur", "[Fichier non", "[Contenu binaire")
+
+# Fichiers indexés par segment (un segment = une liste de fichiers par trigramme, une transaction)
+_SEGMENT_FILES = 500
+
+# Compactage (fusion des segments, retrait des fichiers remplacés) quand les identifiants
+# périmés dépassent les valides, ou que les mises à jour ont ajouté trop de petits segments
+_COMPACT_MIN_DEAD = 1000
+_COMPACT_EXTRA_SEGMENTS = 64
+
+# Cache de pages sqlite par connexion (Ko)
+_CACHE_KB = 64 * 1024
+
+# Limites d'une réponse : lignes citées par fichier, longueur d'une ligne, occurrences comptées
+MAX_LINE_LENGTH = 300
+MAX_COUNTED_MATCHES = 1000
+
+# postings.file_ids : identifiants (array "I") des fichiers du segment qui contiennent le trigramme.
+# Un fichier modifié reçoit un nouvel identifiant (AUTOINCREMENT, jamais réutilisé) : l'ancien
+# reste dans ses segments jusqu'au compactage mais n'appartient plus à aucun scan.
+_POSTINGS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    trigram INTEGER NOT NULL,
+    segment INTEGER NOT NULL,
+    file_ids BLOB NOT NULL,
+    PRIMARY KEY (trigram, segment)
+) WITHOUT ROWID;
+"""
+
+_SCHEMA = _POSTINGS_SCHEMA.format(table="postings") + """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Plan de recherche : None (aucun filtrage possible), ensemble de trigrammes
+# tous requis, ou ("and" | "or", [sous-plans])
+Plan = Union[None, FrozenSet[int], tuple]
+
+
+def _to_index_bytes(text: str) -> bytes:
+    # Seules les lettres ASCII sont mises en minuscules : une transformation
+    # octet par octet, qui ne dépend pas du contexte (contrairement à str.lower)
+    return text.encode("utf-8", "surrogatepass").lower()
+
+
+def content_trigrams(content: str) -> Set[int]:
+    """
+    Retourne les trigrammes (3 octets UTF-8 consécutifs, ASCII en minuscules) d'un texte.
+
+    Args:
+        content: Texte décodé du fichier
+
+    Returns:
+        Ensemble des trigrammes codés en entiers sur 24 bits
+    """
+    data = _to_index_bytes(content)
+    return {(a << 16) | (b << 8) | c for a, b, c in set(zip(data, data[1:], data[2:]))}
+
+
+def _literal_plan(text: str, ignore_case: bool) -> Plan:
+    """Plan d'un littéral : tous ses trigrammes (sans insensibilité à la casse hors ASCII)."""
+    runs = re.split(r"[^\x00-\x7f]+", text) if ignore_case else [text]
+    plans = [frozenset(content_trigrams(run)) for run in runs]
+    plans = [plan for plan in plans if plan]
+    if not plans:
+        return None
+    return frozenset().union(*plans)
+
+
+def _combine(kind: str, plans: List[Plan]) -> Plan:
+    if kind == "or":
+        # Une branche sans filtrage rend l'alternative entière non filtrable
+        if not plans or any(plan is None for plan in plans):
+            return None
+        return plans[0] if len(plans) == 1 else ("or", plans)
+    plans = [plan for plan in plans if plan is not None]
+    if not plans:
+        return None
+    return plans[0] if len(plans) == 1 else ("and", plans)
+
+
+def _regex_plan(items, ignore_case: bool) -> Plan:
+    """Trigrammes nécessaires à une séquence d'expression régulière analysée par sre_parse."""
+    plans: List[Plan] = []
+    run: List[str] = []
+
+    def flush():
+        if run:
+            plans.append(_literal_plan("".join(run), ignore_case))
+            run.clear()
+
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            char = chr(av)
+            if ignore_case and not char.isascii():
+                flush()
+            else:
+                run.append(char)
+        elif op is sre_parse.AT:
+            # Ancre de largeur nulle : les littéraux qui l'entourent restent contigus
+            continue
+        elif op is sre_parse.SUBPATTERN:
+            flush()
+            _, add_flags, del_flags, sub = av
+            sub_ignore_case = (ignore_case or bool(add_flags & re.IGNORECASE)) and not del_flags & re.IGNORECASE
+            plans.append(_regex_plan(sub, sub_ignore_case))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, "POSSESSIVE_REPEAT", None)):
+            flush()
+            minimum, _, sub = av
+            if minimum >= 1:
+                plans.append(_regex_plan(sub, ignore_case))
+        elif op is sre_parse.BRANCH:
+            flush()
+            plans.append(_combine("or", [_regex_plan(branch, ignore_case) for branch in av[1]]))
+        else:
+            flush()
+    flush()
+    return _combine("and", plans)
+
+
+def build_plan(query: str, regex: bool = False, ignore_case: bool = False) -> Plan:
+    """
+    Calcule les trigrammes qu'un fichier doit contenir pour correspondre à la recherche.
+
+    Args:
+        query: Texte ou expression régulière cherché
+        regex: query est une expression régulière
+        ignore_case: Recherche insensible à la casse
+
+    Returns:
+        Plan de filtrage (None si aucun trigramme n'est imposé)
+
+    Raises:
+        re.error: Expression régulière invalide
+    """
+    if not regex:
+        return _literal_plan(query, ignore_case)
+    parsed = sre_parse.parse(query, re.IGNORECASE if ignore_case else 0)
+    return _regex_plan(parsed, bool(parsed.state.flags & re.IGNORECASE))
+
+
+class TrigramIndex:
+    """
+    Index de trigrammes des fichiers, conservé dans une base sqlite.
+
+    Chaque fichier est indexé avec sa taille et son mtime_ns : update() ne
+    relit que les fichiers nouveaux ou modifiés. Une recherche retient d'abord
+    les fichiers contenant tous les trigrammes exigés par la requête (les plus
+    rares en premier), puis vérifie la correspondance dans leur contenu.
+    """
+
+    def __init__(self, path: Path = INDEX_PATH):
+        self.path = Path(path)
+        self._write_lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size=-{_CACHE_KB}")
+            conn.executescript(_SCHEMA)
+            yield conn
+
+    def update(
+        self,
+        matches: List[Dict[str, Any]],
+        read_workers: Optional[int] = None,
+        read_func: Callable[[str], str] = read_file_content
+    ) -> Dict[str, Any]:
+        """
+        Met à jour l'index pour les fichiers d'un scan.
+
+        Les fichiers lus en extrait (plus gros que MAX_FILE_SIZE) ne sont pas
+        indexés ; les binaires et les fichiers illisibles sont enregistrés
+        sans trigrammes, pour ne pas être relus tant qu'ils ne changent pas.
+
+        Args:
+            matches: Fichiers trouvés par le scan
+            read_workers: Nombre de threads de lecture (config.READ_WORKERS par défaut)
+            read_func: Fonction de lecture (read_file_content par défaut, pour ne pas vider le cache)
+
+        Returns:
+            Dictionnaire avec "ids" (chemin -> identifiant dans l'index) et les
+            compteurs "indexed", "unchanged" et "skipped"
+        """
+        ids: Dict[str, int] = {}
+        stale = []
+        stats: Dict[str, os.stat_result] = {}
+        skipped = 0
+
+        with self._write_lock, self._connect() as conn:
+            known = {row[1]: row for row in conn.execute("SELECT id, path, size, mtime_ns FROM files")}
+            for file_match in matches:
+                if file_match.get("excerpt"):
+                    skipped += 1
+                    continue
+                path = file_match["path"]
+                try:
+                    st = stat_path(path)
+                except OSError:
+                    skipped += 1
+                    continue
+                row = known.get(path)
+                if row is not None and row[2] == st.st_size and row[3] == st.st_mtime_ns:
+                    ids[path] = row[0]
+                    continue
+                # stat pris avant la lecture : une modification pendant la lecture sera revue au prochain passage
+                stats[path] = st
+                stale.append(file_match)
+
+            indexed = 0
+            dead = 0
+            segments = 0
+            batch = []
+            for file_match, content, error in iter_read_files(stale, read_func=read_func, max_workers=read_workers):
+                path = file_match["path"]
+                if error is not None or content.startswith(_UNREADABLE_PREFIXES):
+                    trigrams = set()
+                else:
+                    trigrams = content_trigrams(content)
+                batch.append((path, stats[path], trigrams))
+                if len(batch) == _SEGMENT_FILES:
+                    dead += self._store_segment(conn, known, batch, ids)
+                    indexed += len(batch)
+                    segments += 1
+                    batch = []
+            if batch:
+                dead += self._store_segment(conn, known, batch, ids)
+                indexed += len(batch)
+                segments += 1
+            if segments:
+                self._record_changes(conn, dead, segments)
+
+        unchanged = len(ids) - indexed
+        if indexed:
+            logger.info(f"Index de trigrammes: {indexed} fichiers indexés, {unchanged} inchangés, {skipped} ignorés")
+        return {"ids": ids, "indexed": indexed, "unchanged": unchanged, "skipped": skipped}
+
+    def _store_segment(self, conn: sqlite3.Connection, known: Dict[str, tuple], batch: List[tuple], ids: Dict[str, int]) -> int:
+        """
+        Enregistre un lot de fichiers relus dans un nouveau segment.
+
+        Returns:
+            Nombre de fichiers remplacés (leurs anciens identifiants sont désormais périmés)
+        """
+        replaced = 0
+        postings: Dict[int, array] = {}
+        segment = None
+        for path, st, trigrams in batch:
+            if path in known:
+                conn.execute("DELETE FROM files WHERE id = ?", (known[path][0],))
+                replaced += 1
+            file_id = conn.execute(
+                "INSERT INTO files (path, size, mtime_ns) VALUES (?, ?, ?)",
+                (path, st.st_size, st.st_mtime_ns)
+            ).lastrowid
+            ids[path] = file_id
+            if segment is None:
+                segment = file_id
+            for trigram in trigrams:
+                file_ids = postings.get(trigram)
+                if file_ids is None:
+                    file_ids = postings[trigram] = array("I")
+                file_ids.append(file_id)
+        # Insertion triée par clé : bien plus rapide qu'au fil de l'eau dans le B-tree
+        conn.executemany(
+            "INSERT INTO postings (trigram, segment, file_ids) VALUES (?, ?, ?)",
+            ((trigram, segment, postings[trigram].tobytes()) for trigram in sorted(postings))
+        )
+        conn.commit()
+        return replaced
+
+    def _record_changes(self, conn: sqlite3.Connection, dead: int, segments: int) -> None:
+        """Comptabilise les segments ajoutés et les identifiants périmés, et compacte si nécessaire."""
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            (("dead", dead), ("segments", segments))
+        )
+        counters = dict(conn.execute("SELECT key, value FROM meta"))
+        (live,) = conn.execute("SELECT COUNT(*) FROM files").fetchone()
+        if (
+            (counters["dead"] >= _COMPACT_MIN_DEAD and counters["dead"] > live)
+            or counters["segments"] > _COMPACT_EXTRA_SEGMENTS + live // _SEGMENT_FILES
+        ):
+            self._compact(conn)
+        conn.commit()
+
+    def _compact(self, conn: sqlite3.Connection) -> None:
+        """
+        Fusionne les segments de chaque trigramme en une seule liste, sans les
+        identifiants des fichiers remplacés. La table est réécrite à côté puis
+        substituée, en parcourant l'ancienne dans l'ordre de sa clé.
+        """
+        logger.info("Compactage de l'index de trigrammes")
+        live = {file_id for (file_id,) in conn.execute("SELECT id FROM files")}
+        conn.execute("DROP TABLE IF EXISTS postings_compact")
+        conn.executescript(_POSTINGS_SCHEMA.format(table="postings_compact"))
+
+        def merged():
+            current = None
+            file_ids = array("I")
+            for trigram, encoded in conn.execute("SELECT trigram, file_ids FROM postings ORDER BY trigram, segment"):
+                if trigram != current:
+                    if file_ids:
+                        yield current, 0, file_ids.tobytes()
+                    current = trigram
+                    file_ids = array("I")
+                segment_ids = array("I")
+                segment_ids.frombytes(encoded)
+                file_ids.extend(file_id for file_id in segment_ids if file_id in live)
+            if file_ids:
+                yield current, 0, file_ids.tobytes()
+
+        write = conn.cursor()
+        write.executemany("INSERT INTO postings_compact (trigram, segment, file_ids) VALUES (?, ?, ?)", merged())
+        conn.execute("DROP TABLE postings")
+        conn.execute("ALTER TABLE postings_compact RENAME TO postings")
+        conn.execute("UPDATE meta SET value = 0")
+
+    def candidates(self, plan: Plan, scope: Set[int]) -> Set[int]:
+        """
+        Retourne les fichiers de scope qui contiennent les trigrammes exigés par le plan.
+
+        Args:
+            plan: Plan calculé par build_plan
+            scope: Identifiants des fichiers parmi lesquels chercher
+
+        Returns:
+            Identifiants des fichiers candidats (à vérifier sur leur contenu)
+        """
+        if plan is None or not scope:
+            return set(scope)
+        with self._connect() as conn:
+            return self._evaluate(conn, plan, set(scope))
+
+    def _evaluate(self, conn: sqlite3.Connection, plan: Plan, scope: Set[int]) -> Set[int]:
+        if plan is None:
+            return scope
+        if isinstance(plan, frozenset):
+            return self._with_all(conn, plan, scope)
+        kind, plans = plan
+        if kind == "and":
+            for sub_plan in plans:
+                scope = self._evaluate(conn, sub_plan, scope)
+                if not scope:
+                    break
+            return scope
+        result: Set[int] = set()
+        for sub_plan in plans:
+            result |= self._evaluate(conn, sub_plan, scope - result)
+        return result
+
+    def _with_all(self, conn: sqlite3.Connection, trigrams: FrozenSet[int], scope: Set[int]) -> Set[int]:
+        ordered = list(trigrams)
+        placeholders = ",".join("?" * len(ordered))
+        sizes = dict(conn.execute(
+            f"SELECT trigram, SUM(LENGTH(file_ids)) FROM postings WHERE trigram IN ({placeholders}) GROUP BY trigram",
+            ordered
+        ))
+        if len(sizes) < len(ordered):
+            # Un trigramme absent de tout l'index : aucun fichier ne peut correspondre
+            return set()
+
+        # Les listes les plus courtes d'abord : l'intersection se réduit au plus vite
+        candidates = scope
+        for trigram in sorted(ordered, key=sizes.__getitem__):
+            file_ids = array("I")
+            for (encoded,) in conn.execute("SELECT file_ids FROM postings WHERE trigram = ?", (trigram,)):
+                file_ids.frombytes(encoded)
+            candidates = candidates.intersection(file_ids)
+            if not candidates:
+                break
+        return candidates
+
+    def search(
+        self,
+        matches: List[Dict[str, Any]],
+        ids: Dict[str, int],
+        query: str,
+        regex: bool = False,
+        ignore_case: bool = False,
+        max_results: int = 100,
+        max_lines: int = 5,
+        read_workers: Optional[int] = None,
+        read_func: Callable[[str], str] = read_file_content_cached
+    ) -> Dict[str, Any]:
+        """
+        Cherche un texte ou une expression régulière dans les fichiers d'un scan.
+
+        Args:
+            matches: Fichiers du scan, dans l'ordre où les résultats sont rendus
+            ids: Identifiants dans l'index (retournés par update)
+            query: Texte ou expression régulière cherché (ligne par ligne, ^ et $ en début et fin de ligne)
+            regex: query est une expression régulière
+            ignore_case: Recherche insensible à la casse
+            max_results: Nombre maximal de fichiers retournés
+            max_lines: Nombre maximal de lignes citées par fichier
+            read_workers: Nombre de threads de lecture pour la vérification
+            read_func: Fonction de lecture des candidats
+
+        Returns:
+            Dictionnaire avec "results" (fichier, nombre d'occurrences, lignes citées),
+            "candidates" et "truncated"
+
+        Raises:
+            re.error: Expression régulière invalide
+        """
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        compiled = re.compile(query if regex else re.escape(query), flags)
+        plan = build_plan(query, regex, ignore_case)
+
+        candidate_ids = self.candidates(plan, set(ids.values()))
+        to_verify = [file_match for file_match in matches if ids.get(file_match["path"]) in candidate_ids]
+        logger.debug(f"Recherche de {query!r}: {len(to_verify)} candidats sur {len(ids)} fichiers indexés")
+
+        results = []
+        truncated = False
+        with closing(iter_read_files(to_verify, read_func=read_func, max_workers=read_workers)) as reader:
+            for file_match, content, error in reader:
+                if error is not None or content.startswith(_UNREADABLE_PREFIXES):
+                    continue
+                found = _find_lines(compiled, content, max_lines)
+                if found is None:
+                    continue
+                if len(results) == max_results:
+                    truncated = True
+                    break
+                count, lines = found
+                results.append({
+                    "path": file_match["path"],
+                    "size": file_match["size"],
+                    "size_human": file_match["size_human"],
+                    "extension": file_match["extension"],
+                    "match_count": count,
+                    "lines": lines
+                })
+
+        return {"results": results, "candidates": len(to_verify), "truncated": truncated}
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.path.exists():
+            return {"path": str(self.path), "files": 0, "size": 0}
+        with self._connect() as conn:
+            (files,) = conn.execute("SELECT COUNT(*) FROM files").fetchone()
+        return {"path": str(self.path), "files": files, "size": self.path.stat().st_size}
+
+    def clear(self) -> None:
+        """Supprime l'index (il sera reconstruit à la prochaine recherche)."""
+        with self._write_lock:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.unlink(f"{self.path}{suffix}")
+                except FileNotFoundError:
+                    pass
+        logger.info("Index de trigrammes supprimé")
+
+
+def _find_lines(compiled: re.Pattern, content: str, max_lines: int):
+    """Retourne (nombre d'occurrences, lignes citées) ou None si le contenu ne correspond pas."""
+    count = 0
+    lines = []
+    line_number = 1
+    position = 0
+    last_line = None
+    for found in compiled.finditer(content):
+        count += 1
+        if len(lines) < max_lines:
+            start = found.start()
+            line_number += content.count("\n", position, start)
+            position = start
+            if line_number != last_line:
+                line_start = content.rfind("\n", 0, start) + 1
+                line_end = content.find("\n", start)
+                text = content[line_start:line_end if line_end != -1 else len(content)]
+                lines.append({"line": line_number, "text": text[:MAX_LINE_LENGTH]})
+                last_line = line_number
+        elif count >= MAX_COUNTED_MATCHES:
+            break
+    if count == 0:
+        return None
+    return count, lines
+
+
+# Index partagé par les routes
+search_index = TrigramIndex()
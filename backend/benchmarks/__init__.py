@@ -0,0 +1,6 @@
+"""
+Benchmarks de l'outil de copie.
+
+Chaque module s'exécute depuis le dossier backend, par exemple :
+    python -m benchmarks.bench_scan
+"""
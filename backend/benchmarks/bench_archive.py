@@ -0,0 +1,102 @@
+"""
+Benchmark du scan et de la lecture des archives zip/tar sans extraction.
+
+Compare, pour une même arborescence : l'extraction complète suivie du scan
+et de la lecture sur disque, puis le scan et la lecture des membres dans
+l'archive, avec l'archive rouverte à chaque lecture (hors session) ou
+ouverte une seule fois (session, comme pendant une requête).
+
+Usage:
+    python -m benchmarks.bench_archive --files 3000 --file-kb 8
+"""
+import argparse
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+
+from app.utils.archives import archive_session
+from app.utils.file_utils import read_file_content, scan_directory
+
+
+def build_tree(root: str, file_count: int, file_bytes: int, files_per_dir: int = 100) -> None:
+    line = "    valeur = calculer(entree, options) + 1  # commentaire ordinaire\n"
+    body = line * (file_bytes // len(line))
+    for index in range(file_count):
+        directory = os.path.join(root, "src", f"pkg_{index // files_per_dir}")
+        if index % files_per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"module_{index}.py"), "w") as f:
+            f.write(body)
+
+
+def scan_and_read(root: str) -> int:
+    total = 0
+    for match in scan_directory(root)["files"]:
+        total += len(read_file_content(match["path"]))
+    return total
+
+
+def extract_then_read(archive_path: str, target: str) -> int:
+    if archive_path.endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            archive.extractall(target)
+    else:
+        with tarfile.open(archive_path, "r:*") as archive:
+            archive.extractall(target)
+    try:
+        return scan_and_read(target)
+    finally:
+        shutil.rmtree(target)
+
+
+def in_session(archive_path: str) -> int:
+    with archive_session():
+        return scan_and_read(archive_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=3000, help="Nombre de fichiers générés")
+    parser.add_argument("--file-kb", type=int, default=8, help="Taille d'un fichier (Ko)")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp(prefix="bench_archive_")
+    try:
+        tree = os.path.join(temp_dir, "tree")
+        build_tree(tree, args.files, args.file_kb * 1024)
+        archives = []
+        zip_path = os.path.join(temp_dir, "sources.zip")
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for directory, _, filenames in os.walk(tree):
+                for filename in filenames:
+                    path = os.path.join(directory, filename)
+                    archive.write(path, os.path.relpath(path, tree))
+        archives.append(zip_path)
+        for suffix, mode in ((".tar", "w"), (".tar.gz", "w:gz")):
+            tar_path = os.path.join(temp_dir, "sources" + suffix)
+            with tarfile.open(tar_path, mode) as archive:
+                archive.add(tree, arcname=".")
+            archives.append(tar_path)
+        print(f"Arborescence: {args.files} fichiers de {args.file_kb} Ko\n")
+
+        for archive_path in archives:
+            print(os.path.basename(archive_path))
+            runs = (
+                ("extraction puis lecture", lambda: extract_then_read(archive_path, os.path.join(temp_dir, "extrait"))),
+                ("membres, hors session", lambda: scan_and_read(archive_path)),
+                ("membres, session", lambda: in_session(archive_path)),
+            )
+            for label, run in runs:
+                start = time.perf_counter()
+                total = run()
+                elapsed = time.perf_counter() - start
+                print(f"  {label:<28}{elapsed:>8.3f} s  {total} caractères")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
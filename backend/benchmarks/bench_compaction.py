@@ -0,0 +1,52 @@
+"""
+Benchmark du compactage avant formatage (format-content, compaction).
+
+Pour chaque mode, mesure le volume avant et après compactage d'une
+arborescence de sources réelles (la bibliothèque standard par défaut), le
+temps d'un premier passage puis celui d'un second passage servi par le
+cache de compactage.
+
+Usage:
+    python -m benchmarks.bench_compaction --source /chemin/vers/projet --max-files 2000
+"""
+import argparse
+import os
+import time
+
+from app.utils.compaction import COMPACTION_MODES, compact_file_content, compaction_cache
+from app.utils.file_utils import read_file_content, scan_directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=os.path.dirname(os.__file__), help="Dossier de sources à compacter")
+    parser.add_argument("--max-files", type=int, default=2000, help="Nombre maximal de fichiers lus")
+    args = parser.parse_args()
+
+    matches = scan_directory(args.source)["files"][:args.max_files]
+    contents = []
+    for match in matches:
+        content = read_file_content(match["path"])
+        if not content.startswith(("[Erreur", "[Fichier non", "[Contenu binaire")):
+            contents.append((match["path"], match["extension"], content))
+    total = sum(len(content.encode("utf-8")) for _, _, content in contents)
+    print(f"Sources: {len(contents)} fichiers texte, {total / 1e6:.1f} Mo\n")
+
+    for mode in COMPACTION_MODES[1:]:
+        compaction_cache.clear()
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            after = sum(
+                len(compact_file_content(path, content, mode, extension).encode("utf-8"))
+                for path, extension, content in contents
+            )
+            timings.append(time.perf_counter() - start)
+        print(
+            f"{mode:<12}{after / 1e6:>8.1f} Mo ({after / total:>4.0%})  "
+            f"premier passage {timings[0]:>7.3f} s  en cache {timings[1]:>7.3f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark du filtre sur le contenu (include_content_patterns).
+
+Compare la lecture décodée de chaque fichier suivie d'une recherche sur le
+texte à la recherche sur les octets du fichier projeté en mémoire, arrêtée à
+la première correspondance, avec 1 et N threads. L'arborescence mêle des
+fichiers texte (dont une petite partie contient le motif) et des binaires.
+
+Usage:
+    python -m benchmarks.bench_content_match --files 5000 --file-kb 64
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from app.utils.content_match import ContentMatcher, filter_by_content
+from app.utils.file_utils import read_file_content, scan_directory
+
+PATTERN = r"TODO\(perf\)"
+
+
+def build_tree(root: str, file_count: int, file_bytes: int, files_per_dir: int = 200) -> None:
+    line = "    valeur = calculer(entree, options) + 1  # commentaire ordinaire\n"
+    body = line * (file_bytes // len(line))
+    for index in range(file_count):
+        directory = os.path.join(root, f"pkg_{index // files_per_dir}")
+        if index % files_per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        if index % 20 == 19:
+            with open(os.path.join(directory, f"blob_{index}.bin"), "wb") as f:
+                f.write(b"\x7fELF\x02\x01\x01" + os.urandom(file_bytes))
+            continue
+        with open(os.path.join(directory, f"module_{index}.py"), "w") as f:
+            # Un fichier sur 50 contient le motif, au début
+            if index % 50 == 0:
+                f.write("# TODO(perf): à revoir\n")
+            f.write(body)
+
+
+def decoded_filter(matches):
+    compiled = re.compile(PATTERN, re.MULTILINE)
+    return [match for match in matches if compiled.search(read_file_content(match["path"]))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=5000, help="Nombre de fichiers générés")
+    parser.add_argument("--file-kb", type=int, default=64, help="Taille d'un fichier (Ko)")
+    parser.add_argument("--workers", type=int, default=8, help="Nombre de threads du filtre")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp(prefix="bench_content_match_")
+    try:
+        build_tree(temp_dir, args.files, args.file_kb * 1024)
+        matches = scan_directory(temp_dir)["files"]
+        matcher = ContentMatcher([PATTERN])
+        print(f"Arborescence: {len(matches)} fichiers de {args.file_kb} Ko\n")
+
+        runs = (
+            ("décodage + re (str)", lambda: decoded_filter(matches)),
+            ("mmap + re (octets), 1 thread", lambda: filter_by_content(matches, matcher, max_workers=1)),
+            (f"mmap + re (octets), {args.workers} threads", lambda: filter_by_content(matches, matcher, max_workers=args.workers)),
+        )
+        expected = None
+        for label, run in runs:
+            start = time.perf_counter()
+            kept = run()
+            elapsed = time.perf_counter() - start
+            paths = [match["path"] for match in kept]
+            expected = paths if expected is None else expected
+            print(f"{label:<36}{elapsed:>8.3f} s  {len(kept)} fichiers  identiques: {paths == expected}")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
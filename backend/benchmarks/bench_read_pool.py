@@ -0,0 +1,66 @@
+"""
+Benchmark de la lecture parallèle ordonnée (iter_read_files).
+
+Compare 1, 4 et 16 threads sur une arborescence synthétique de petits
+fichiers. Une latence artificielle par fichier (--latency-ms) permet de
+simuler un partage réseau ou un cache froid : sans elle, la lecture locale
+depuis le cache de pages est surtout limitée par le GIL.
+
+Usage:
+    python -m benchmarks.bench_read_pool --files 50000
+    python -m benchmarks.bench_read_pool --files 50000 --latency-ms 0.5
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from app.utils.file_utils import read_file_content, scan_directory
+from app.utils.read_pool import iter_read_files
+
+
+def build_tree(root: str, file_count: int, files_per_dir: int = 500) -> None:
+    """Crée file_count petits fichiers texte répartis dans des sous-dossiers."""
+    for index in range(file_count):
+        directory = os.path.join(root, f"dir_{index // files_per_dir}")
+        if index % files_per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file_{index}.txt"), "w") as f:
+            f.write(f"ligne {index}\n" * (1 + index % 20))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50000, help="Nombre de fichiers générés")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="Nombres de threads comparés")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latence simulée par fichier (ms)")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp(prefix="bench_read_pool_")
+    try:
+        build_tree(temp_dir, args.files)
+        matches = scan_directory(temp_dir)["files"]
+        latency = args.latency_ms / 1000
+
+        def read(path):
+            if latency:
+                time.sleep(latency)
+            return read_file_content(path)
+
+        print(f"{len(matches)} fichiers, latence simulée {args.latency_ms} ms\n")
+        print(f"{'threads':>8}{'temps (s)':>12}{'fichiers/s':>14}{'ordre':>8}")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            paths = [file_match["path"] for file_match, _, _ in iter_read_files(matches, read_func=read, max_workers=workers)]
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            ordered = paths == [m["path"] for m in matches]
+            print(f"{workers:>8}{elapsed:>12.3f}{len(paths) / elapsed:>14.0f}{'ok' if ordered else 'KO':>8}   x{baseline / elapsed:.2f}")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
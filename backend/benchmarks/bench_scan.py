@@ -0,0 +1,198 @@
+"""
+Benchmark du moteur de scan : os.walk historique contre os.scandir.
+
+Compare le temps de parcours et le nombre d'appels système liés au système
+de fichiers (stat, lstat, listdir, scandir, DirEntry.stat) sur une
+arborescence synthétique, et vérifie que les résultats sont identiques.
+
+Usage:
+    python -m benchmarks.bench_scan --files 20000 --repeat 3
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List
+
+from app.config import MAX_FILE_SIZE
+from app.utils.file_utils import scan_directory
+
+
+class _CountingEntry:
+    """Enveloppe d'un DirEntry qui compte les appels à stat()."""
+
+    __slots__ = ("_entry", "_counters")
+
+    def __init__(self, entry, counters):
+        self._entry = entry
+        self._counters = counters
+
+    @property
+    def name(self):
+        return self._entry.name
+
+    @property
+    def path(self):
+        return self._entry.path
+
+    def inode(self):
+        return self._entry.inode()
+
+    def is_dir(self, *, follow_symlinks=True):
+        return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, *, follow_symlinks=True):
+        return self._entry.is_file(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self):
+        return self._entry.is_symlink()
+
+    def stat(self, *, follow_symlinks=True):
+        self._counters["direntry_stat"] += 1
+        return self._entry.stat(follow_symlinks=follow_symlinks)
+
+
+class _CountingScandir:
+    def __init__(self, iterator, counters):
+        self._iterator = iterator
+        self._counters = counters
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return _CountingEntry(next(self._iterator), self._counters)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._iterator.close()
+
+    def close(self):
+        self._iterator.close()
+
+
+@contextmanager
+def count_syscalls():
+    """Compte les appels système de fichiers passant par le module os."""
+    counters = {"stat": 0, "lstat": 0, "listdir": 0, "scandir": 0, "direntry_stat": 0}
+    original = {name: getattr(os, name) for name in ("stat", "lstat", "listdir", "scandir")}
+
+    def wrap(name):
+        func = original[name]
+
+        def wrapper(*args, **kwargs):
+            counters[name] += 1
+            result = func(*args, **kwargs)
+            if name == "scandir":
+                return _CountingScandir(result, counters)
+            return result
+        return wrapper
+
+    for name in original:
+        setattr(os, name, wrap(name))
+    try:
+        yield counters
+    finally:
+        for name, func in original.items():
+            setattr(os, name, func)
+
+
+def legacy_scan_directory(directory: str, exclude_directories: List[str] = []) -> Dict[str, Any]:
+    """
+    Version condensée de l'ancien scan_directory (os.walk + listdir + exists/is_file/stat),
+    conservée comme référence pour le benchmark.
+    """
+    results = []
+    errors = []
+    for root, dirs, files in os.walk(directory, onerror=lambda e: errors.append(str(e))):
+        for d in dirs[:]:
+            try:
+                os.listdir(os.path.join(root, d))
+            except OSError as e:
+                errors.append(str(e))
+                dirs.remove(d)
+        if exclude_directories:
+            if os.path.basename(root) in exclude_directories or any(
+                f"/{excluded}/" in f"{root}/" for excluded in exclude_directories
+            ):
+                dirs[:] = []
+                continue
+            dirs[:] = [d for d in dirs if d not in exclude_directories]
+        for filename in files:
+            file = Path(os.path.join(root, filename))
+            if not file.exists() or not file.is_file():
+                continue
+            file_size = file.stat().st_size
+            if file_size > MAX_FILE_SIZE:
+                continue
+            results.append({
+                "path": str(file).replace("\\", "/"),
+                "name": filename,
+                "size": file_size,
+                "extension": file.suffix[1:] if file.suffix else ""
+            })
+    return {"files": results, "errors": errors}
+
+
+def build_tree(root: str, file_count: int, files_per_dir: int = 50, fanout: int = 8) -> None:
+    """Crée une arborescence synthétique de petits fichiers."""
+    dirs = [root]
+    created = 0
+    index = 0
+    while created < file_count:
+        parent = dirs[index // fanout] if index else root
+        current = os.path.join(parent, f"dir_{index}")
+        os.makedirs(current, exist_ok=True)
+        dirs.append(current)
+        for i in range(min(files_per_dir, file_count - created)):
+            extension = ("py", "txt", "md", "json")[i % 4]
+            with open(os.path.join(current, f"file_{i}.{extension}"), "w") as f:
+                f.write("x" * (i % 64))
+        created += files_per_dir
+        index += 1
+
+
+def measure(func, directory: str, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(directory)
+        best = min(best, time.perf_counter() - start)
+    with count_syscalls() as counters:
+        func(directory)
+    return best, dict(counters), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20000, help="Nombre de fichiers générés")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de répétitions (meilleur temps retenu)")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp(prefix="bench_scan_")
+    try:
+        build_tree(temp_dir, args.files)
+        print(f"Arborescence: {args.files} fichiers dans {temp_dir}\n")
+
+        legacy_time, legacy_calls, legacy_result = measure(legacy_scan_directory, temp_dir, args.repeat)
+        new_time, new_calls, new_result = measure(scan_directory, temp_dir, args.repeat)
+
+        fields = ("path", "name", "size", "extension")
+        identical = legacy_result["files"] == [{key: f[key] for key in fields} for f in new_result["files"]]
+        print(f"{'moteur':<12}{'temps (s)':>12}{'appels fs':>12}   détail")
+        for label, elapsed, calls in (("os.walk", legacy_time, legacy_calls), ("os.scandir", new_time, new_calls)):
+            print(f"{label:<12}{elapsed:>12.3f}{sum(calls.values()):>12}   {calls}")
+        print(f"\nAccélération: x{legacy_time / new_time:.2f}")
+        print(f"Résultats identiques: {identical}")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark de l'empreinte mémoire d'un résultat de scan.
+
+Compare les anciens dictionnaires par fichier (path, name, size,
+size_human, extension) aux FileRecord (slots, préfixe de dossier interné,
+extension codée, taille formatée calculée à la lecture) sur une liste
+synthétique construite comme le ferait scan_directory. La mémoire est
+mesurée avec tracemalloc, le coût de sérialisation d'une page avec
+perf_counter.
+
+Usage:
+    python -m benchmarks.bench_scan_memory --files 1000000 --files-per-dir 50
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from app.utils.file_record import FileRecord, format_size_human, intern_prefix, records_to_dicts
+
+EXTENSIONS = ("py", "txt", "md", "json", "ts", "tsx", "css", "html")
+
+
+def iter_files(file_count: int, files_per_dir: int):
+    """Produit (dossier, nom, taille, extension) pour une arborescence synthétique."""
+    for index in range(file_count):
+        dir_index = index // files_per_dir
+        directory = f"/home/user/projets/depot/src/module_{dir_index % 97}/paquet_{dir_index}"
+        extension = EXTENSIONS[index % len(EXTENSIONS)]
+        yield directory, f"fichier_{index}.{extension}", 100 + (index * 37) % 200000, extension
+
+
+def build_dicts(file_count: int, files_per_dir: int) -> list:
+    matches = []
+    for directory, name, size, extension in iter_files(file_count, files_per_dir):
+        matches.append({
+            "path": f"{directory}/{name}",
+            "name": name,
+            "size": size,
+            "extension": extension,
+            "size_human": format_size_human(size),
+        })
+    return matches
+
+
+def build_records(file_count: int, files_per_dir: int) -> list:
+    matches = []
+    prefix_dir = None
+    prefix = ""
+    for directory, name, size, extension in iter_files(file_count, files_per_dir):
+        # Comme scan_directory : un préfixe par dossier
+        if directory != prefix_dir:
+            prefix_dir = directory
+            prefix = intern_prefix(directory)
+        matches.append(FileRecord(prefix, name, size, extension))
+    return matches
+
+
+def measure(builder, file_count: int, files_per_dir: int):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    matches = builder(file_count, files_per_dir)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return matches, current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000000, help="Nombre de fichiers simulés")
+    parser.add_argument("--files-per-dir", type=int, default=50, help="Nombre de fichiers par dossier")
+    parser.add_argument("--page", type=int, default=1000, help="Taille de la page sérialisée")
+    args = parser.parse_args()
+
+    dicts, dict_bytes, dict_time = measure(build_dicts, args.files, args.files_per_dir)
+    del dicts
+    records, record_bytes, record_time = measure(build_records, args.files, args.files_per_dir)
+
+    print(f"{args.files} fichiers, {args.files_per_dir} par dossier\n")
+    print(f"{'format':<14}{'mémoire (Mo)':>14}{'octets/fichier':>16}{'construction (s)':>18}")
+    for label, size, elapsed in (("dict", dict_bytes, dict_time), ("FileRecord", record_bytes, record_time)):
+        print(f"{label:<14}{size / 1024 / 1024:>14.1f}{size / args.files:>16.0f}{elapsed:>18.3f}")
+    print(f"\nGain mémoire: {(1 - record_bytes / dict_bytes) * 100:.0f} %")
+
+    start = time.perf_counter()
+    page = records_to_dicts(records[:args.page])
+    print(f"Sérialisation d'une page de {len(page)} fichiers: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
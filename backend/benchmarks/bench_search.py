@@ -0,0 +1,113 @@
+"""
+Benchmark de l'index de trigrammes (recherche dans le contenu des fichiers).
+
+Génère une arborescence de fichiers source synthétiques, construit l'index,
+mesure une mise à jour incrémentale (quelques fichiers modifiés) puis la
+latence de requêtes littérales et régulières, comparée à une recherche
+exhaustive (lecture et recherche dans chaque fichier).
+
+Usage:
+    python -m benchmarks.bench_search --size-mb 1024
+    python -m benchmarks.bench_search --size-mb 200 --file-kb 16
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from app.utils.file_utils import read_file_content, scan_directory
+from app.utils.trigram_index import TrigramIndex
+
+WORDS = (
+    "def", "class", "return", "import", "self", "value", "result", "config", "logger", "path",
+    "content", "matches", "request", "response", "index", "cache", "error", "files", "size", "scan",
+)
+
+QUERIES = (
+    ("symbole_rare_4242", False, False),
+    ("return result", False, False),
+    ("LOGGER.INFO", False, True),
+    (r"def fonction_\d+7\(", True, False),
+    (r"class (Service|Store)_99\b", True, False),
+)
+
+
+def build_tree(root: str, total_bytes: int, file_bytes: int, files_per_dir: int = 100) -> int:
+    """Crée des fichiers Python synthétiques jusqu'à total_bytes ; retourne le nombre de fichiers."""
+    rng = random.Random(42)
+    count = 0
+    written = 0
+    while written < total_bytes:
+        directory = os.path.join(root, f"pkg_{count // files_per_dir}")
+        if count % files_per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        lines = []
+        size = 0
+        while size < file_bytes:
+            line = f"def fonction_{rng.randrange(100000)}(self): return {' '.join(rng.choices(WORDS, k=8))}\n"
+            lines.append(line)
+            size += len(line)
+        if count % 997 == 0:
+            lines.append("symbole_rare_4242 = True\n")
+        if count % 1000 == 0:
+            lines.append(f"class {'Service' if count % 2000 else 'Store'}_99:\n    pass\n")
+        data = "".join(lines)
+        with open(os.path.join(directory, f"module_{count}.py"), "w") as f:
+            f.write(data)
+        written += len(data)
+        count += 1
+    return count
+
+
+def brute_force(matches, pattern: str, regex: bool, ignore_case: bool) -> int:
+    compiled = re.compile(pattern if regex else re.escape(pattern), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+    return sum(1 for match in matches if compiled.search(read_file_content(match["path"])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=1024, help="Volume de source généré (Mo)")
+    parser.add_argument("--file-kb", type=int, default=24, help="Taille moyenne d'un fichier (Ko)")
+    parser.add_argument("--brute-force", action="store_true", help="Mesurer aussi la recherche exhaustive")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp(prefix="bench_search_")
+    try:
+        tree = os.path.join(temp_dir, "src")
+        file_count = build_tree(tree, args.size_mb * 1024 * 1024, args.file_kb * 1024)
+        matches = scan_directory(tree)["files"]
+        index = TrigramIndex(Path(temp_dir) / "trigrams.sqlite3")
+        print(f"Arborescence: {file_count} fichiers, {args.size_mb} Mo\n")
+
+        start = time.perf_counter()
+        update = index.update(matches)
+        print(f"Construction de l'index: {time.perf_counter() - start:.1f} s ({index.stats()['size'] / 1024 / 1024:.0f} Mo sur disque)")
+
+        for match in matches[::max(1, len(matches) // 10)]:
+            with open(match["path"], "a") as f:
+                f.write("# modifié\n")
+        start = time.perf_counter()
+        update = index.update(matches)
+        print(f"Mise à jour incrémentale: {(time.perf_counter() - start) * 1000:.0f} ms ({update['indexed']} fichiers relus)\n")
+
+        print(f"{'requête':<32}{'fichiers':>10}{'candidats':>11}{'index (ms)':>12}{'exhaustif (ms)':>16}")
+        for pattern, regex, ignore_case in QUERIES:
+            start = time.perf_counter()
+            found = index.search(matches, update["ids"], pattern, regex, ignore_case, max_results=1000)
+            elapsed = (time.perf_counter() - start) * 1000
+            brute = "-"
+            if args.brute_force:
+                start = time.perf_counter()
+                brute_force(matches, pattern, regex, ignore_case)
+                brute = f"{(time.perf_counter() - start) * 1000:.0f}"
+            print(f"{pattern:<32}{len(found['results']):>10}{found['candidates']:>11}{elapsed:>12.1f}{brute:>16}")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
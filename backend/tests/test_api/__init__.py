@@ -0,0 +1 @@
+# Tests pour la configuration de l'application (middlewares)
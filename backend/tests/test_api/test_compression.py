@@ -0,0 +1,112 @@
+import zlib
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.api.compression import CompressionMiddleware, negotiate_encoding
+from app.routes.copy import router as copy_router
+
+# Application minimale avec le middleware de compression (et les routes de copie, pour les artefacts)
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+app.include_router(copy_router)
+
+LARGE_TEXT = "def fonction():\n    return 42\n" * 500
+
+
+@app.get("/large")
+async def large():
+    return {"formatted_content": LARGE_TEXT}
+
+
+@app.get("/small")
+async def small():
+    return {"status": "ok"}
+
+
+@app.get("/stream")
+async def stream():
+    def generate():
+        for i in range(50):
+            yield f'{{"type": "file", "index": {i}, "content": "{"x" * 100}"}}\n'
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@app.get("/archive")
+async def archive():
+    return Response(b"PK\x03\x04" + b"\x00" * 4096, media_type="application/zip")
+
+
+@app.get("/partial")
+async def partial():
+    return PlainTextResponse(LARGE_TEXT, status_code=206, headers={"Content-Range": f"bytes 0-{len(LARGE_TEXT) - 1}/*"})
+
+
+client = TestClient(app)
+
+
+class TestCompression:
+    """Tests pour la compression des réponses"""
+    
+    def test_negotiate_encoding(self):
+        assert negotiate_encoding("gzip, deflate, br") == "gzip"
+        assert negotiate_encoding("deflate") == "deflate"
+        assert negotiate_encoding("gzip;q=0.5, deflate;q=0.8") == "deflate"
+        assert negotiate_encoding("gzip;q=0, deflate;q=0") is None
+        assert negotiate_encoding("*") == "gzip"
+        assert negotiate_encoding("br, identity") is None
+        assert negotiate_encoding("") is None
+    
+    @pytest.mark.parametrize("encoding", ["gzip", "deflate"])
+    def test_large_response_is_compressed(self, encoding):
+        response = client.get("/large", headers={"Accept-Encoding": encoding})
+        assert response.headers["content-encoding"] == encoding
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert int(response.headers["content-length"]) < len(LARGE_TEXT) / 10
+        assert response.json()["formatted_content"] == LARGE_TEXT
+    
+    def test_deflate_is_zlib_wrapped(self):
+        with client.stream("GET", "/large", headers={"Accept-Encoding": "deflate"}) as response:
+            raw = b"".join(response.iter_raw())
+        assert zlib.decompress(raw).startswith(b'{"formatted_content"')
+    
+    def test_small_and_unnegotiated_responses_are_not_compressed(self):
+        assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+        assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+    
+    def test_streaming_response_is_compressed(self):
+        with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+            assert response.headers["content-encoding"] == "gzip"
+            assert "content-length" not in response.headers
+            lines = [line for line in response.iter_lines() if line]
+        assert len(lines) == 50
+    
+    def test_compressed_and_partial_payloads_are_skipped(self):
+        archive = client.get("/archive", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in archive.headers
+        assert archive.content.startswith(b"PK\x03\x04")
+        
+        partial = client.get("/partial", headers={"Accept-Encoding": "gzip"})
+        assert partial.status_code == 206
+        assert "content-encoding" not in partial.headers
+    
+    def test_artifact_download_is_not_compressed(self, tmp_path, monkeypatch):
+        """Un artefact garde son Content-Length et ses positions Range malgré Accept-Encoding: gzip"""
+        import app.utils.artifacts as artifacts
+        monkeypatch.setattr(artifacts, "ARTIFACT_DIR", tmp_path / "artifacts")
+        source = tmp_path / "src"
+        source.mkdir()
+        (source / "module.py").write_text(LARGE_TEXT)
+        
+        data = client.post("/api/v1/copy/advanced/format-content", json={"directories": [str(source)], "output": "artifact"}).json()
+        url = data["artifact"]["download_url"]
+        
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert int(response.headers["content-length"]) == data["artifact"]["size"]
+        
+        partial = client.get(url, headers={"Accept-Encoding": "gzip", "Range": "bytes=100-199"})
+        assert partial.status_code == 206
+        assert "content-encoding" not in partial.headers
+        assert partial.content == response.content[100:200]
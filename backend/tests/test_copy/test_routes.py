@@ -1,4 +1,6 @@
 import os
+import json
+import time
 import pytest
 import tempfile
 import shutil
@@ -342,4 +344,577 @@ class TestCopyRoutes:
         # Vérifier que les fichiers des dossiers exclus sont absents
         for dir_name in test_dirs["exclude"]:
             assert f"{dir_name}.txt" not in data["formatted_content"]
-            assert f"Contenu du fichier dans {dir_name}" not in data["formatted_content"] 
\ No newline at end of file
+            assert f"Contenu du fichier dans {dir_name}" not in data["formatted_content"] 
+    def test_format_content_stream_ndjson(self, test_directory):
+        """Test du formatage en flux NDJSON"""
+        request_data = {
+            "directories": [test_directory],
+            "files": [],
+            "rules": {
+                "exclude_extensions": [],
+                "exclude_patterns": [],
+                "exclude_directories": []
+            },
+            "recursive": True
+        }
+        
+        response = client.post("/api/v1/copy/advanced/format-content/stream", json=request_data)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        file_lines = [line for line in lines if line["type"] == "file"]
+        
+        # Une ligne par fichier, puis une ligne de synthèse
+        assert len(file_lines) == 6
+        assert lines[-1]["type"] == "summary"
+        assert lines[-1]["total_matches"] == 6
+        
+        # Le contenu est identique à celui de la version non streamée
+        full = client.post("/api/v1/copy/advanced/format-content", json=request_data).json()
+        assert "".join(line["content"] for line in file_lines) == full["formatted_content"]
+    
+    def test_format_content_stream_text(self, test_directory):
+        """Test du formatage en flux texte brut"""
+        request_data = {
+            "directories": [],
+            "files": [os.path.join(test_directory, "file1.txt")],
+            "recursive": True
+        }
+        
+        response = client.post("/api/v1/copy/advanced/format-content/stream?format=text", json=request_data)
+        assert response.status_code == 200
+        assert "Contenu du fichier 1" in response.text
+        assert response.text.startswith("=== ")
+
+    def test_cache_stats(self, test_directory):
+        """Test de l'exposition des compteurs du cache de contenu"""
+        client.delete("/api/v1/copy/cache")
+        request_data = {
+            "directories": [],
+            "files": [os.path.join(test_directory, "file1.txt")],
+            "recursive": True
+        }
+        
+        client.post("/api/v1/copy/advanced/format-content", json=request_data)
+        client.post("/api/v1/copy/advanced/format-content", json=request_data)
+        
+        response = client.get("/api/v1/copy/cache/stats")
+        assert response.status_code == 200
+        stats = response.json()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+        assert stats["entries"] == 1
+        for key in ("evictions", "current_bytes", "max_bytes"):
+            assert key in stats
+
+    def test_scan_invalid_exclude_pattern(self, test_directory):
+        """Un motif d'exclusion invalide est refusé avant le scan"""
+        request_data = {
+            "directories": [test_directory],
+            "rules": {"exclude_patterns": ["[non_ferme"]},
+            "recursive": True
+        }
+        
+        response = client.post("/api/v1/copy/advanced/scan", json=request_data)
+        assert response.status_code == 400
+        assert "Motif d'exclusion invalide" in response.json()["detail"]
+
+    def test_scan_overlapping_roots_are_deduplicated(self, test_directory):
+        """Des racines imbriquées ne produisent pas de doublons"""
+        request_data = {
+            "directories": [test_directory, os.path.join(test_directory, "subdir")],
+            "files": [os.path.join(test_directory, "file1.txt")],
+            "recursive": True
+        }
+        
+        response = client.post("/api/v1/copy/advanced/scan", json=request_data)
+        assert response.status_code == 200
+        data = response.json()
+        
+        paths = [match["path"] for match in data["matches"]]
+        assert len(paths) == len(set(paths)) == 6
+        assert data["total_subdirectories"] == 1
+    
+    def test_scan_disjoint_roots_and_hard_links(self, test_directory):
+        """Des racines disjointes sont toutes scannées ; un lien physique n'est compté qu'une fois"""
+        other = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(other, "other.txt"), "w") as f:
+                f.write("autre racine")
+            try:
+                os.link(os.path.join(test_directory, "file2.py"), os.path.join(other, "linked.py"))
+            except (OSError, NotImplementedError):
+                pytest.skip("Liens physiques non supportés")
+            
+            request_data = {"directories": [test_directory, other], "recursive": True}
+            data = client.post("/api/v1/copy/advanced/scan", json=request_data).json()
+            
+            names = [match["name"] for match in data["matches"]]
+            assert "other.txt" in names
+            assert "linked.py" not in names
+            assert data["total_matches"] == 7
+        finally:
+            shutil.rmtree(other)
+    
+    def _wait_for_job(self, job_id, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = client.get(f"/api/v1/copy/advanced/jobs/{job_id}").json()
+            if status["status"] != "en_cours":
+                return status
+            time.sleep(0.02)
+        pytest.fail(f"La tâche {job_id} ne s'est pas terminée")
+    
+    def test_scan_job_progress_and_pages(self, test_directory):
+        """Une tâche de scan retourne un ID, son avancement et ses résultats par pages"""
+        response = client.post("/api/v1/copy/advanced/scan/jobs", json={"directories": [test_directory]})
+        assert response.status_code == 200
+        job_id = response.json()["job_id"]
+        
+        status = self._wait_for_job(job_id)
+        assert status["status"] == "terminé"
+        assert status["total_matches"] == 6
+        assert status["progress"]["files"] == 6
+        assert status["progress"]["directories"] == 2
+        assert status["progress"]["bytes"] > 0
+        
+        first = client.get(f"/api/v1/copy/advanced/jobs/{job_id}/results", params={"offset": 0, "limit": 4}).json()
+        second = client.get(f"/api/v1/copy/advanced/jobs/{job_id}/results", params={"offset": 4, "limit": 4}).json()
+        assert first["partial"] is False
+        assert first["total"] == 6
+        assert len(first["matches"]) == 4 and len(second["matches"]) == 2
+        assert all(match["size_human"] for match in first["matches"])
+        
+        paths = {match["path"] for match in first["matches"] + second["matches"]}
+        assert len(paths) == 6
+        
+        # Même forme que les pages d'un scan conservé
+        scan = client.post("/api/v1/copy/advanced/scan", json={"directories": [test_directory], "page_size": 4}).json()
+        page = client.get(f"/api/v1/copy/advanced/results/{scan['result_id']}", params={"limit": 6}).json()
+        assert sorted(first["matches"] + second["matches"], key=lambda match: match["path"]) == page["matches"]
+        
+        # Un fichier exporté en extrait est signalé comme dans le scan
+        with open(os.path.join(test_directory, "big.log"), "wb") as f:
+            f.truncate(MAX_FILE_SIZE + 1)
+        request_data = {"directories": [test_directory], "rules": {"large_files": "excerpt"}}
+        job_id = client.post("/api/v1/copy/advanced/scan/jobs", json=request_data).json()["job_id"]
+        self._wait_for_job(job_id)
+        matches = client.get(f"/api/v1/copy/advanced/jobs/{job_id}/results").json()["matches"]
+        assert [match.get("excerpt") for match in matches if match["name"] == "big.log"] == [True]
+    
+    def test_format_content_job(self, test_directory):
+        """Une tâche format-content expose le contenu formaté"""
+        job_id = client.post("/api/v1/copy/advanced/format-content/jobs", json={"directories": [test_directory]}).json()["job_id"]
+        
+        status = self._wait_for_job(job_id)
+        assert status["status"] == "terminé"
+        assert status["progress"]["read_files"] == 6
+        
+        content = client.get(f"/api/v1/copy/advanced/jobs/{job_id}/content").json()
+        assert content["partial"] is False
+        assert "Contenu du fichier 1" in content["formatted_content"]
+    
+    def test_job_cancel_and_unknown_job(self, test_directory):
+        """L'annulation d'une tâche inconnue renvoie 404 ; une tâche de scan n'a pas de contenu"""
+        assert client.get("/api/v1/copy/advanced/jobs/inconnue").status_code == 404
+        assert client.post("/api/v1/copy/advanced/jobs/inconnue/cancel").status_code == 404
+        
+        job_id = client.post("/api/v1/copy/advanced/scan/jobs", json={"directories": [test_directory]}).json()["job_id"]
+        response = client.post(f"/api/v1/copy/advanced/jobs/{job_id}/cancel")
+        assert response.status_code == 200
+        
+        status = self._wait_for_job(job_id)
+        assert status["status"] in ("terminé", "annulé")
+        assert client.get(f"/api/v1/copy/advanced/jobs/{job_id}/content").status_code == 400
+    
+    def test_job_invalid_pattern(self):
+        """Un motif invalide est refusé avant le démarrage de la tâche"""
+        request_data = {"directories": ["/tmp"], "rules": {"exclude_patterns": ["[invalide"]}}
+        response = client.post("/api/v1/copy/advanced/scan/jobs", json=request_data)
+        assert response.status_code == 400
+    
+    def test_scan_paginated_with_cursor(self, test_directory):
+        """Avec page_size, le scan renvoie une page et un curseur pour la suite"""
+        request_data = {"directories": [test_directory], "page_size": 4}
+        data = client.post("/api/v1/copy/advanced/scan", json=request_data).json()
+        
+        assert data["total_matches"] == 6
+        assert len(data["matches"]) == 4
+        assert data["result_id"] and data["next_cursor"]
+        
+        url = f"/api/v1/copy/advanced/results/{data['result_id']}"
+        rest = client.get(url, params={"cursor": data["next_cursor"], "limit": 4}).json()
+        assert len(rest["matches"]) == 2
+        assert rest["next_cursor"] is None
+        paths = [match["path"] for match in data["matches"] + rest["matches"]]
+        assert paths == sorted(paths)
+        
+        # Tri et filtre côté serveur
+        py_files = client.get(url, params={"extension": "py", "sort": "size", "order": "desc"}).json()
+        assert py_files["total"] == 2
+        assert [match["extension"] for match in py_files["matches"]] == ["py", "py"]
+        
+        # Un curseur ne sert qu'avec le tri qui l'a produit
+        assert client.get(url, params={"cursor": data["next_cursor"], "sort": "size"}).status_code == 400
+        assert client.get("/api/v1/copy/advanced/results/inconnu").status_code == 404
+    
+    def test_format_content_deduplicates_identical_files(self, test_directory):
+        """Avec deduplicate_content, un contenu identique n'est émis qu'une fois"""
+        shutil.copy(os.path.join(test_directory, "file1.txt"), os.path.join(test_directory, "subdir", "copy1.txt"))
+        request_data = {"directories": [test_directory], "deduplicate_content": True}
+        
+        data = client.post("/api/v1/copy/advanced/format-content", json=request_data).json()
+        assert data["duplicate_files"] == 1
+        assert data["formatted_content"].count("Contenu du fichier 1") == 1
+        assert "[Contenu identique à " in data["formatted_content"]
+        
+        response = client.post("/api/v1/copy/advanced/format-content/stream", json=request_data)
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        duplicated = [line for line in lines if line.get("duplicate_of")]
+        assert len(duplicated) == 1
+        assert lines[-1]["duplicate_files"] == 1
+        
+        # Sans l'option, chaque copie est émise en entier
+        data = client.post("/api/v1/copy/advanced/format-content", json={"directories": [test_directory]}).json()
+        assert data["formatted_content"].count("Contenu du fichier 1") == 2
+        assert data["duplicate_files"] is None
+    
+    def test_format_content_delta_since_snapshot(self, test_directory, tmp_path, monkeypatch):
+        """Un export delta ne contient que les fichiers ajoutés, modifiés ou supprimés"""
+        import sys
+        import app.utils.snapshot as snapshot
+        # app.routes réexporte le routeur sous le nom "copy" : passer par le module
+        copy_routes = sys.modules["app.routes.copy"]
+        monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", tmp_path)
+        
+        request_data = {"directories": [test_directory], "create_snapshot": True}
+        first = client.post("/api/v1/copy/advanced/format-content", json=request_data).json()
+        assert first["snapshot_id"]
+        assert first["changes"] is None
+        
+        # Modification, simple changement de date, suppression et ajout
+        with open(os.path.join(test_directory, "file2.py"), "w") as f:
+            f.write('print("modifié")')
+        touched = os.path.join(test_directory, "file3.md")
+        os.utime(touched, ns=(os.stat(touched).st_atime_ns, os.stat(touched).st_mtime_ns + 10**9))
+        os.remove(os.path.join(test_directory, "hidden.txt"))
+        with open(os.path.join(test_directory, "subdir", "new.txt"), "w") as f:
+            f.write("nouveau")
+        
+        # Les fichiers au stat() inchangé ne sont pas lus
+        read_paths = []
+        original_read = copy_routes.read_file_content_cached
+        monkeypatch.setattr(copy_routes, "read_file_content_cached", lambda path: read_paths.append(path) or original_read(path))
+        
+        request_data = {"directories": [test_directory], "since_snapshot": first["snapshot_id"], "create_snapshot": True}
+        delta = client.post("/api/v1/copy/advanced/format-content", json=request_data).json()
+        
+        assert [os.path.basename(path) for path in delta["changes"]["added"]] == ["new.txt"]
+        assert [os.path.basename(path) for path in delta["changes"]["modified"]] == ["file2.py"]
+        assert [os.path.basename(path) for path in delta["changes"]["deleted"]] == ["hidden.txt"]
+        assert delta["changes"]["unchanged"] == 4
+        assert sorted(os.path.basename(path) for path in read_paths) == ["file2.py", "file3.md", "new.txt"]
+        
+        content = delta["formatted_content"]
+        assert "modifié" in content and "nouveau" in content and "[Fichier supprimé]" in content
+        assert "Titre markdown" not in content and "Contenu du fichier 1" not in content
+        
+        # Le nouvel instantané reflète l'état courant : plus rien à exporter
+        request_data = {"directories": [test_directory], "since_snapshot": delta["snapshot_id"]}
+        again = client.post("/api/v1/copy/advanced/format-content", json=request_data).json()
+        assert again["formatted_content"] == ""
+        assert again["changes"]["unchanged"] == 6
+        
+        unknown = {"directories": [test_directory], "since_snapshot": "0" * 32}
+        assert client.post("/api/v1/copy/advanced/format-content", json=unknown).status_code == 404
+    
+    def test_snapshot_delta_in_stream_and_job(self, test_directory, tmp_path, monkeypatch):
+        """Le flux ndjson et la tâche format-content gèrent create_snapshot et since_snapshot"""
+        import app.utils.snapshot as snapshot
+        monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", tmp_path)
+        url = "/api/v1/copy/advanced/format-content/stream"
+        
+        response = client.post(url, json={"directories": [test_directory], "create_snapshot": True})
+        first_id = json.loads(response.text.splitlines()[-1])["snapshot_id"]
+        assert first_id
+        
+        os.remove(os.path.join(test_directory, "hidden.txt"))
+        with open(os.path.join(test_directory, "subdir", "new.txt"), "w") as f:
+            f.write("nouveau")
+        request_data = {"directories": [test_directory], "since_snapshot": first_id, "create_snapshot": True}
+        lines = [json.loads(line) for line in client.post(url, json=request_data).text.splitlines()]
+        summary = lines.pop()
+        assert [os.path.basename(line["path"]) for line in lines] == ["new.txt", "hidden.txt"]
+        assert lines[-1]["deleted"] is True
+        assert summary["changes"]["unchanged"] == 5
+        
+        # Rien n'a changé depuis l'instantané du flux
+        request_data = {"directories": [test_directory], "since_snapshot": summary["snapshot_id"], "create_snapshot": True}
+        job_id = client.post("/api/v1/copy/advanced/format-content/jobs", json=request_data).json()["job_id"]
+        assert self._wait_for_job(job_id)["status"] == "terminé"
+        content = client.get(f"/api/v1/copy/advanced/jobs/{job_id}/content").json()
+        assert content["formatted_content"] == ""
+        assert content["changes"]["unchanged"] == 6
+        assert content["snapshot_id"]
+        
+        assert client.post(url, params={"format": "text"}, json={"directories": [test_directory], "create_snapshot": True}).status_code == 400
+        unknown = {"directories": [test_directory], "since_snapshot": "0" * 32}
+        assert client.post(url, json=unknown).status_code == 404
+        assert client.post("/api/v1/copy/advanced/format-content/jobs", json=unknown).status_code == 404
+    
+    def test_format_content_with_budget(self, test_directory):
+        """Le budget limite le contenu lu et les fichiers écartés sont signalés"""
+        with open(os.path.join(test_directory, "big.log"), "w") as f:
+            f.write("x" * 5000)
+        request_data = {"directories": [test_directory], "budget_tokens": 200}
+        
+        data = client.post("/api/v1/copy/advanced/format-content", json=request_data).json()
+        
+        assert data["total_matches"] == 7
+        assert data["budget"]["limit_bytes"] == 800
+        assert 0 < data["budget"]["used_bytes"] <= 800
+        assert len(data["formatted_content"].encode("utf-8")) == data["budget"]["used_bytes"]
+        omitted = {os.path.basename(entry["path"]) for entry in data["omitted"]}
+        assert "big.log" in omitted
+        assert "x" * 100 not in data["formatted_content"]
+    
+    def test_format_content_budget_filled_by_last_block(self, tmp_path):
+        """Le bloc qui épuise le budget (reste < MIN_BLOCK_SIZE) est émis, pas perdu"""
+        from app.utils.budget import estimate_block_size
+        (tmp_path / "a.txt").write_text("contenu a")
+        scan = client.post("/api/v1/copy/advanced/scan", json={"directories": [str(tmp_path)]}).json()
+        
+        request_data = {"directories": [str(tmp_path)], "budget_bytes": estimate_block_size(scan["matches"][0])}
+        data = client.post("/api/v1/copy/advanced/format-content", json=request_data).json()
+        
+        assert "contenu a" in data["formatted_content"]
+        assert data["budget"]["used_bytes"] == request_data["budget_bytes"]
+        assert data["omitted"] == []
+    
+    def test_format_content_duplicate_never_refers_to_withheld_file(self, tmp_path, monkeypatch):
+        """Un fichier non émis (inchangé en delta) ne sert pas d'original au dédoublonnage"""
+        import app.utils.snapshot as snapshot
+        monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", tmp_path / "snapshots")
+        source = tmp_path / "src"
+        source.mkdir()
+        (source / "a.txt").write_text("même contenu")
+        first = client.post("/api/v1/copy/advanced/format-content", json={"directories": [str(source)], "create_snapshot": True}).json()
+        
+        # a.txt seulement touché, b.txt ajouté avec le même contenu
+        touched = source / "a.txt"
+        os.utime(touched, ns=(touched.stat().st_atime_ns, touched.stat().st_mtime_ns + 10**9))
+        (source / "b.txt").write_text("même contenu")
+        request_data = {"directories": [str(source)], "since_snapshot": first["snapshot_id"], "deduplicate_content": True}
+        data = client.post("/api/v1/copy/advanced/format-content", json=request_data).json()
+        
+        assert data["formatted_content"].count("même contenu") == 1
+        assert "[Contenu identique à " not in data["formatted_content"]
+        assert data["duplicate_files"] == 0
+    
+    def test_budget_applies_to_stream_and_job(self, test_directory):
+        """Le flux et la tâche format-content respectent le budget comme la réponse directe"""
+        with open(os.path.join(test_directory, "big.log"), "w") as f:
+            f.write("x" * 5000)
+        request_data = {"directories": [test_directory], "budget_tokens": 200}
+        
+        response = client.post("/api/v1/copy/advanced/format-content/stream", json=request_data)
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        summary = lines[-1]
+        assert summary["budget"]["limit_bytes"] == 800
+        assert sum(len(line["content"].encode("utf-8")) for line in lines[:-1]) == summary["budget"]["used_bytes"]
+        assert "big.log" in {os.path.basename(entry["path"]) for entry in summary["omitted"]}
+        
+        text = client.post("/api/v1/copy/advanced/format-content/stream", params={"format": "text"}, json=request_data).text
+        assert len(text.encode("utf-8")) <= 800 and "x" * 100 not in text
+        
+        job_id = client.post("/api/v1/copy/advanced/format-content/jobs", json=request_data).json()["job_id"]
+        assert self._wait_for_job(job_id)["status"] == "terminé"
+        content = client.get(f"/api/v1/copy/advanced/jobs/{job_id}/content").json()
+        assert len(content["formatted_content"].encode("utf-8")) == content["budget"]["used_bytes"] <= 800
+        assert "big.log" in {os.path.basename(entry["path"]) for entry in content["omitted"]}
+    
+    def test_scan_prefetch_warms_cache(self, test_directory):
+        """Avec prefetch, le contenu des fichiers trouvés est préchargé dans le cache"""
+        from app.utils.content_cache import content_cache
+        from app.utils.prefetch import prefetcher
+        content_cache.clear()
+        
+        data = client.post("/api/v1/copy/advanced/scan", json={"directories": [test_directory], "prefetch": True}).json()
+        prefetcher.join(timeout=10)
+        
+        stats = client.get("/api/v1/copy/cache/prefetch").json()
+        assert stats["status"] == "terminé"
+        assert stats["files"] == data["total_matches"] == 6
+        
+        before = content_cache.stats()["hits"]
+        client.post("/api/v1/copy/advanced/format-content", json={"directories": [test_directory]})
+        assert content_cache.stats()["hits"] - before == 6
+    
+    def test_scan_job_prefetch(self, test_directory, monkeypatch):
+        """Une tâche de scan annule le préchargement en cours et peut lancer le sien"""
+        from app.utils.content_cache import content_cache
+        from app.utils.prefetch import prefetcher
+        content_cache.clear()
+        
+        cancelled = []
+        original_cancel = prefetcher.cancel
+        monkeypatch.setattr(prefetcher, "cancel", lambda: cancelled.append(True) or original_cancel())
+        
+        job_id = client.post("/api/v1/copy/advanced/scan/jobs", json={"directories": [test_directory], "prefetch": True}).json()["job_id"]
+        assert cancelled
+        assert self._wait_for_job(job_id)["status"] == "terminé"
+        prefetcher.join(timeout=10)
+        
+        stats = client.get("/api/v1/copy/cache/prefetch").json()
+        assert stats["status"] == "terminé"
+        assert stats["files"] == 6
+        
+        before = content_cache.stats()["hits"]
+        client.post("/api/v1/copy/advanced/format-content", json={"directories": [test_directory]})
+        assert content_cache.stats()["hits"] - before == 6
+    
+    def test_format_content_reuses_scan_session(self, test_directory, monkeypatch):
+        """format-content réutilise la liste d'une session de scan sans nouveau parcours"""
+        import sys
+        copy_routes = sys.modules["app.routes.copy"]
+        
+        request_data = {"directories": [test_directory], "rules": {"exclude_extensions": ["md"]}}
+        scan = client.post("/api/v1/copy/advanced/scan", json=request_data).json()
+        token = scan["session_token"]
+        assert token
+        
+        walks = []
+        original_scan_roots = copy_routes.scan_roots
+        monkeypatch.setattr(copy_routes, "scan_roots", lambda *args, **kwargs: walks.append(args) or original_scan_roots(*args, **kwargs))
+        
+        # Jeton seul, puis jeton avec les mêmes paramètres
+        for data in ({"session_token": token}, dict(request_data, session_token=token)):
+            response = client.post("/api/v1/copy/advanced/format-content", json=data)
+            assert response.status_code == 200
+            assert response.json()["total_matches"] == scan["total_matches"] == 5
+            assert "Contenu du fichier 1" in response.json()["formatted_content"]
+        assert walks == []
+        
+        # Paramètres différents du scan d'origine
+        mismatch = {"directories": [test_directory], "session_token": token}
+        assert client.post("/api/v1/copy/advanced/format-content", json=mismatch).status_code == 409
+        
+        # Session inconnue : 404 avec le jeton seul, nouveau scan sinon
+        assert client.post("/api/v1/copy/advanced/format-content", json={"session_token": "inconnu"}).status_code == 404
+        response = client.post("/api/v1/copy/advanced/format-content", json=dict(request_data, session_token="inconnu"))
+        assert response.status_code == 200
+        assert len(walks) == 1
+    
+    def test_format_content_artifact_download(self, test_directory, tmp_path, monkeypatch):
+        """En mode artefact, la sortie est écrite sur disque et téléchargée avec support de Range"""
+        import app.utils.artifacts as artifacts
+        monkeypatch.setattr(artifacts, "ARTIFACT_DIR", tmp_path)
+        
+        inline = client.post("/api/v1/copy/advanced/format-content", json={"directories": [test_directory]}).json()
+        data = client.post("/api/v1/copy/advanced/format-content", json={"directories": [test_directory], "output": "artifact"}).json()
+        
+        assert data["formatted_content"] == ""
+        artifact = data["artifact"]
+        expected = inline["formatted_content"].encode("utf-8")
+        assert artifact["size"] == len(expected)
+        
+        response = client.get(artifact["download_url"])
+        assert response.status_code == 200
+        assert response.content == expected
+        
+        partial = client.get(artifact["download_url"], headers={"Range": "bytes=10-19"})
+        assert partial.status_code == 206
+        assert partial.content == expected[10:20]
+        
+        # Les variantes en flux et en tâche n'écrivent pas d'artefact
+        request_data = {"directories": [test_directory], "output": "artifact"}
+        assert client.post("/api/v1/copy/advanced/format-content/stream", json=request_data).status_code == 400
+        assert client.post("/api/v1/copy/advanced/format-content/jobs", json=request_data).status_code == 400
+        
+        assert client.delete(artifact["download_url"]).status_code == 200
+        assert client.get(artifact["download_url"]).status_code == 404
+        assert client.get("/api/v1/copy/advanced/artifacts/../../etc").status_code == 404
+    
+    def test_search_content_with_trigram_index(self, test_directory, tmp_path, monkeypatch):
+        """La recherche indexe le contenu puis ne relit que les fichiers modifiés"""
+        import sys
+        from app.utils.trigram_index import TrigramIndex
+        copy_routes = sys.modules["app.routes.copy"]
+        monkeypatch.setattr(copy_routes, "search_index", TrigramIndex(tmp_path / "index.sqlite3"))
+        
+        data = client.post("/api/v1/copy/advanced/search", json={"directories": [test_directory], "query": "Fichier"}).json()
+        assert data["index"]["indexed"] == 6
+        assert sorted(os.path.basename(match["path"]) for match in data["matches"]) == ["hidden.txt", "nested.txt"]
+        
+        data = client.post("/api/v1/copy/advanced/search", json={
+            "directories": [test_directory], "query": "fichier", "case_sensitive": False
+        }).json()
+        assert data["index"] == {"indexed": 0, "unchanged": 6, "skipped": 0}
+        assert sorted(os.path.basename(match["path"]) for match in data["matches"]) == ["file1.txt", "hidden.txt", "nested.txt"]
+        assert data["matches"][0]["lines"][0]["line"] == 1
+        
+        with open(os.path.join(test_directory, "file2.py"), "w") as f:
+            f.write('import os\nprint("Fichier modifié")')
+        data = client.post("/api/v1/copy/advanced/search", json={
+            "directories": [test_directory], "query": r"^print\(.Fichier", "regex": True
+        }).json()
+        assert data["index"]["indexed"] == 1
+        assert [os.path.basename(match["path"]) for match in data["matches"]] == ["file2.py"]
+        assert data["matches"][0]["lines"] == [{"line": 2, "text": 'print("Fichier modifié")'}]
+        
+        response = client.post("/api/v1/copy/advanced/search", json={"directories": [test_directory], "query": "(", "regex": True})
+        assert response.status_code == 400
+    
+    def test_scan_with_content_patterns(self, test_directory):
+        """Seuls les fichiers dont le contenu correspond sont sélectionnés"""
+        request_data = {
+            "directories": [test_directory],
+            "rules": {"include_content_patterns": [r"^def ", "Hello"]}
+        }
+        data = client.post("/api/v1/copy/advanced/scan", json=request_data).json()
+        assert sorted(match["name"] for match in data["matches"]) == ["code.py", "file2.py"]
+        
+        request_data["rules"]["include_content_patterns"] = ["("]
+        response = client.post("/api/v1/copy/advanced/scan", json=request_data)
+        assert response.status_code == 400
+    
+    def test_scan_and_format_archive(self, tmp_path):
+        """Une archive zip se scanne et se lit comme un dossier, membres explicites compris"""
+        import zipfile
+        archive = tmp_path / "depot.zip"
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            zip_file.writestr("app/main.py", "print('archive')\n")
+            zip_file.writestr("app/build/out.js", "genere")
+            zip_file.writestr("README.md", "# Lisez-moi\n")
+        
+        request_data = {
+            "directories": [str(archive)],
+            "files": [f"{archive}/README.md", f"{archive}/absent.md"],
+            "rules": {"exclude_directories": ["build"]}
+        }
+        data = client.post("/api/v1/copy/advanced/scan", json=request_data).json()
+        assert sorted(match["name"] for match in data["matches"]) == ["README.md", "main.py"]
+        assert [error["clean_path"] for error in data["invalid_paths"]] == [f"{archive}/absent.md"]
+        
+        data = client.post("/api/v1/copy/advanced/format-content", json=request_data).json()
+        assert "print('archive')" in data["formatted_content"]
+        assert "# Lisez-moi" in data["formatted_content"]
+    
+    def test_format_content_with_compaction(self, tmp_path):
+        """Le compactage s'applique avant formatage et la réponse donne les octets avant/après"""
+        (tmp_path / "module.py").write_text('"""Doc du module."""\n# commentaire\n\n\ndef f():\n    return 1\n')
+        (tmp_path / "notes.txt").write_text("ligne   \n\n\n\nfin\n")
+        
+        request_data = {"directories": [str(tmp_path)], "compaction": "strip"}
+        data = client.post("/api/v1/copy/advanced/format-content", json=request_data).json()
+        
+        assert "def f():\n    return 1\n\n---" in data["formatted_content"]
+        assert "Doc du module" not in data["formatted_content"]
+        assert "ligne\n\nfin\n\n---" in data["formatted_content"]
+        assert data["compaction"]["mode"] == "strip"
+        assert data["compaction"]["files"] == 2
+        assert data["compaction"]["bytes_after"] < data["compaction"]["bytes_before"]
+        
+        request_data["compaction"] = "none"
+        assert client.post("/api/v1/copy/advanced/format-content", json=request_data).json()["compaction"] is None
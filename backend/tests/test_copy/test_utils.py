@@ -1,11 +1,34 @@
 import os
+import sys
+import re
+import time
 import pytest
 import tempfile
 import shutil
+import tarfile
+import zipfile
+import threading
+import subprocess
 from pathlib import Path
 
-from app.utils.file_utils import scan_directory, read_file_content, format_file_for_copy
+from app.utils.file_utils import scan_directory, read_file_content, read_file_excerpt, format_file_for_copy, get_file_stats, get_files_stats
 from app.utils.path_utils import sanitize_path, is_valid_directory
+from app.utils.read_pool import iter_read_files
+from app.utils.scan_filter import ScanFilter
+from app.utils.git_index import scan_git_index
+from app.utils.scan_coordinator import collapse_nested_roots, scan_roots
+from app.utils.content_cache import ContentCache, content_cache, read_file_content_cached
+from app.utils.scan_progress import ScanProgress
+from app.utils.prefetch import Prefetcher
+from app.utils import artifacts
+from app.utils.budget import select_within_budget, estimate_block_size
+from app.utils.file_record import FileRecord, records_to_dicts
+from app.utils import archives, content_match
+from app.utils.content_match import ContentMatcher, filter_by_content
+from app.utils.archives import archive_cache, archive_session, open_path, split_archive_path, stat_path
+from app.utils.compaction import compact_content, compact_file_content, compaction_cache
+from app.utils.trigram_index import TrigramIndex, build_plan, content_trigrams
+from app.utils.result_store import ScanResultStore, InvalidCursorError, get_page, normalize_filters
 from app.config import MAX_FILE_SIZE
 
 
@@ -146,6 +169,29 @@ class TestFileUtils:
         assert len(files) == 4
         assert all("subdir" not in file["path"] for file in files)
     
+    def test_scan_directory_does_not_follow_symlinked_directories(self, test_directory):
+        """Les liens vers des dossiers ne sont pas parcourus (comme os.walk)"""
+        link = os.path.join(test_directory, "link_to_subdir")
+        try:
+            os.symlink(os.path.join(test_directory, "subdir"), link, target_is_directory=True)
+        except (OSError, NotImplementedError):
+            pytest.skip("Liens symboliques non supportés")
+        
+        files = scan_directory(test_directory)["files"]
+        
+        assert len(files) == 6
+        assert all("link_to_subdir" not in file["path"] for file in files)
+    
+    def test_scan_directory_excluded_root(self, test_directory):
+        """Un dossier racine exclu ne produit aucun fichier"""
+        results = scan_directory(
+            os.path.join(test_directory, "subdir"),
+            exclude_directories=["subdir"]
+        )
+        
+        assert results["files"] == []
+        assert results["errors"] == []
+    
     def test_read_file_content(self, test_directory):
         # Tester la lecture d'un fichier existant
         file_path = os.path.join(test_directory, "file1.txt")
@@ -165,6 +211,64 @@ class TestFileUtils:
         with pytest.raises(ValueError):
             read_file_content(large_file)
     
+    def test_read_file_content_rejects_binaries(self, test_directory):
+        # Octet nul dans le premier bloc
+        nul_file = os.path.join(test_directory, "lib.so")
+        with open(nul_file, "wb") as f:
+            f.write(b"\x7fELF\x02\x01" + b"\x00" * 64)
+        assert read_file_content(nul_file).startswith("[Contenu binaire")
+        
+        # Signature connue, sans octet nul
+        png_file = os.path.join(test_directory, "image.png")
+        with open(png_file, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n" + b"\xff" * 64)
+        assert read_file_content(png_file) == "[Contenu binaire - Taille: 72 octets]"
+    
+    def test_read_file_content_decodes_text_from_single_buffer(self, test_directory):
+        # Texte latin-1 : repli sans erreur
+        latin_file = os.path.join(test_directory, "latin.txt")
+        with open(latin_file, "wb") as f:
+            f.write("Café crème".encode("latin-1"))
+        assert read_file_content(latin_file) == "Café crème"
+        
+        # Fins de ligne normalisées comme en mode texte
+        crlf_file = os.path.join(test_directory, "crlf.txt")
+        with open(crlf_file, "wb") as f:
+            f.write(b"ligne 1\r\nligne 2\rligne 3\n")
+        assert read_file_content(crlf_file) == "ligne 1\nligne 2\nligne 3\n"
+        
+        # UTF-16 avec BOM : les octets nuls ne le font pas passer pour un binaire
+        utf16_file = os.path.join(test_directory, "utf16.txt")
+        with open(utf16_file, "wb") as f:
+            f.write("texte UTF-16".encode("utf-16"))
+        assert read_file_content(utf16_file) == "texte UTF-16"
+    
+    def test_get_file_stats_streaming_matches_full_text(self, test_directory, monkeypatch):
+        # Blocs minuscules pour couper mots, caractères UTF-8 et "\r\n" entre deux blocs
+        monkeypatch.setattr("app.utils.file_utils.STATS_CHUNK_SIZE", 5)
+        text = "premier mot\r\ndeuxième_ligne été\r\n\nfin sans saut"
+        file_path = os.path.join(test_directory, "stats.txt")
+        with open(file_path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        
+        with open(file_path, encoding="utf-8") as f:
+            expected = f.read()
+        stats = get_file_stats(file_path)
+        
+        assert stats["totalChars"] == len(expected)
+        assert stats["totalLines"] == len(expected.splitlines())
+        assert stats["totalWords"] == len(re.findall(r"\w+", expected))
+    
+    def test_get_files_stats_batch(self, test_directory):
+        paths = [os.path.join(test_directory, name) for name in ("file1.txt", "file2.py", "absent.txt")]
+        
+        results = get_files_stats(paths, max_workers=4)
+        
+        assert list(results) == paths
+        assert results[paths[0]]["totalWords"] == 4
+        assert results[paths[1]]["totalLines"] == 1
+        assert "error" in results[paths[2]]
+    
     def test_format_file_for_copy(self):
         # Tester le formatage du contenu
         formatted = format_file_for_copy("/path/to/file.txt", "Content")
@@ -172,4 +276,873 @@ class TestFileUtils:
         
         # Tester avec un contenu vide
         formatted = format_file_for_copy("/path/to/empty.txt", "")
-        assert formatted == "=== /path/to/empty.txt ===\n\n\n\n---\n\n" 
\ No newline at end of file
+        assert formatted == "=== /path/to/empty.txt ===\n\n\n\n---\n\n" 
+
+class TestReadPool:
+    """Tests pour la lecture parallèle ordonnée"""
+    
+    def test_iter_read_files_preserves_order(self):
+        # Les premiers fichiers sont les plus lents : l'ordre doit quand même être conservé
+        matches = [{"path": f"file_{i}", "size": 10} for i in range(20)]
+        
+        def slow_read(path):
+            index = int(path.split("_")[1])
+            time.sleep((20 - index) * 0.001)
+            return path.upper()
+        
+        results = list(iter_read_files(matches, read_func=slow_read, max_workers=4))
+        
+        assert [file_match["path"] for file_match, _, _ in results] == [m["path"] for m in matches]
+        assert all(content == file_match["path"].upper() for file_match, content, _ in results)
+    
+    def test_iter_read_files_respects_inflight_budget(self):
+        # Avec un budget d'un seul fichier, une seule lecture est en cours à la fois
+        size = 256 * 1024  # Un fichier par lot
+        matches = [{"path": f"file_{i}", "size": size} for i in range(10)]
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+        
+        def tracked_read(path):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.002)
+            with lock:
+                state["running"] -= 1
+            return path
+        
+        results = list(iter_read_files(matches, read_func=tracked_read, max_workers=8, max_inflight_bytes=size))
+        
+        assert len(results) == 10
+        assert state["peak"] == 1
+    
+    def test_iter_read_files_reports_errors(self):
+        matches = [{"path": "ok", "size": 1}, {"path": "ko", "size": 1}]
+        
+        def failing_read(path):
+            if path == "ko":
+                raise OSError("lecture impossible")
+            return "contenu"
+        
+        results = list(iter_read_files(matches, read_func=failing_read, max_workers=2))
+        
+        assert results[0][1] == "contenu" and results[0][2] is None
+        assert results[1][1] is None and isinstance(results[1][2], OSError)
+
+
+class TestContentCache:
+    """Tests pour le cache de contenu"""
+    
+    def test_lru_eviction_respects_byte_budget(self):
+        cache = ContentCache(max_bytes=300)
+        cache.put("a", 1, "A", size=100)
+        cache.put("b", 1, "B", size=100)
+        cache.put("c", 1, "C", size=100)
+        
+        # "a" devient le plus récemment utilisé, "b" sera évincé
+        assert cache.get("a", 1) == "A"
+        cache.put("d", 1, "D", size=100)
+        
+        assert cache.get("b", 1) is None
+        assert cache.get("a", 1) == "A"
+        stats = cache.stats()
+        assert stats["evictions"] == 1
+        assert stats["current_bytes"] == 300
+    
+    def test_signature_mismatch_is_a_miss(self):
+        cache = ContentCache(max_bytes=1000)
+        cache.put("a", (1, 2), "ancien")
+        
+        assert cache.get("a", (1, 3)) is None
+        assert cache.stats()["misses"] == 1
+    
+    def test_read_file_content_cached_revalidates(self, tmp_path):
+        content_cache.clear()
+        file_path = tmp_path / "cached.txt"
+        file_path.write_text("version 1")
+        
+        assert read_file_content_cached(str(file_path)) == "version 1"
+        assert read_file_content_cached(str(file_path)) == "version 1"
+        assert content_cache.stats()["hits"] == 1
+        
+        # Modifier le fichier (taille différente) invalide l'entrée
+        file_path.write_text("version 2 modifiée")
+        assert read_file_content_cached(str(file_path)) == "version 2 modifiée"
+        assert content_cache.stats()["entries"] == 1
+        content_cache.clear()
+
+
+class TestScanFilter:
+    """Tests pour le filtre compilé des règles d'exclusion"""
+    
+    def test_combined_patterns_match_like_individual_search(self):
+        patterns = [r"^test_", r"\.min\.js$", r"(a)\1", r"(?i)README"]
+        scan_filter = ScanFilter(exclude_patterns=patterns)
+        
+        for name in ["test_x.py", "lib.min.js", "aa.txt", "readme.md", "main.py", "b.js"]:
+            expected = any(re.search(pattern, name) for pattern in patterns)
+            assert scan_filter.excluded_name(name) == expected, name
+    
+    def test_invalid_pattern_raises_value_error(self):
+        with pytest.raises(ValueError):
+            ScanFilter(exclude_patterns=["[non_ferme"])
+    
+    def test_directory_exclusions(self):
+        scan_filter = ScanFilter(exclude_directories=["node_modules", "src/generated"])
+        
+        assert scan_filter.is_directory_excluded("/repo/node_modules")
+        assert scan_filter.is_directory_excluded("/repo/node_modules/pkg")
+        assert scan_filter.is_directory_excluded("/repo/src/generated/api")
+        assert not scan_filter.is_directory_excluded("/repo/src")
+        
+        assert scan_filter.is_subdirectory_excluded("node_modules", "/repo/node_modules")
+        assert scan_filter.is_subdirectory_excluded("generated", "/repo/src/generated")
+        assert not scan_filter.is_subdirectory_excluded("generated", "/repo/lib/generated")
+    
+    def test_exclusion_reason_checks_extension_first(self):
+        scan_filter = ScanFilter(exclude_extensions=["log"], exclude_patterns=["debug"])
+        
+        assert scan_filter.exclusion_reason("debug.log", "log") == "extension"
+        assert scan_filter.exclusion_reason("debug.txt", "txt") == "motif"
+        assert scan_filter.exclusion_reason("main.py", "py") is None
+    
+    def test_scan_directory_prunes_multi_segment_exclusion(self, tmp_path):
+        for relative in ["src/generated/a.py", "src/main.py", "lib/generated/b.py"]:
+            target = tmp_path / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text("x")
+        
+        files = scan_directory(str(tmp_path), exclude_directories=["src/generated"])["files"]
+        names = sorted(file["name"] for file in files)
+        
+        assert names == ["b.py", "main.py"]
+
+
+class TestGitignore:
+    """Tests pour la prise en compte des fichiers .gitignore"""
+    
+    @pytest.fixture
+    def git_repository(self, tmp_path):
+        """Dépôt minimal avec .gitignore imbriqués et .git/info/exclude"""
+        files = [
+            "node_modules/pkg/index.js", "build/out.js", "src/build/keep.py",
+            "docs/a/b/notes.tmp", "logs/app.log", "logs/keep.log", "main.py",
+            "sub/deep/code.py", "sub/deep/generated.gen", "sub/kept.gen", "secret.txt",
+        ]
+        for relative in files:
+            target = tmp_path / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text("x")
+        (tmp_path / ".git" / "info").mkdir(parents=True)
+        (tmp_path / ".git" / "HEAD").write_text("ref: refs/heads/main")
+        (tmp_path / ".git" / "info" / "exclude").write_text("secret*\n")
+        (tmp_path / ".gitignore").write_text("node_modules/\n*.log\n!keep.log\n/build\ndocs/**/*.tmp\n# commentaire\n")
+        (tmp_path / "sub" / ".gitignore").write_text("*.gen\n!kept.gen\n")
+        return tmp_path
+    
+    def test_scan_directory_respects_gitignore(self, git_repository):
+        results = scan_directory(str(git_repository), scan_filter=ScanFilter(respect_gitignore=True))
+        relative = sorted(os.path.relpath(f["path"], str(git_repository)).replace(os.sep, "/") for f in results["files"])
+        
+        assert relative == [
+            ".gitignore", "logs/keep.log", "main.py", "src/build/keep.py",
+            "sub/.gitignore", "sub/deep/code.py", "sub/kept.gen",
+        ]
+    
+    def test_parent_rules_apply_to_nested_scan_root(self, git_repository):
+        results = scan_directory(str(git_repository / "logs"), scan_filter=ScanFilter(respect_gitignore=True))
+        
+        assert [f["name"] for f in results["files"]] == ["keep.log"]
+    
+    def test_gitignore_is_opt_in(self, git_repository):
+        results = scan_directory(str(git_repository))
+        
+        assert any("node_modules" in f["path"] for f in results["files"])
+        assert any("/.git/" in f["path"] for f in results["files"])
+
+
+class TestGitIndex:
+    """Tests pour la lecture de .git/index"""
+    
+    @pytest.fixture
+    def git_repository(self, tmp_path):
+        """Dépôt git réel avec fichiers suivis, non suivis et un dossier exclu"""
+        if shutil.which("git") is None:
+            pytest.skip("git n'est pas installé")
+        for relative in ["main.py", "src/app.py", "src/util.txt", "vendor/lib.py", "notes.md"]:
+            target = tmp_path / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(f"contenu de {relative}")
+        subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+        subprocess.run(["git", "-C", str(tmp_path), "add", "main.py", "src", "vendor"], check=True)
+        # Fichier non suivi : absent de l'index
+        (tmp_path / "untracked.py").write_text("non suivi")
+        return tmp_path
+    
+    @pytest.mark.parametrize("version", ["2", "4"])
+    def test_scan_git_index_lists_tracked_files(self, git_repository, version):
+        subprocess.run(["git", "-C", str(git_repository), "update-index", "--index-version", version], check=True)
+        
+        result = scan_git_index(str(git_repository), ScanFilter(exclude_directories=["vendor"], exclude_extensions=["txt"]))
+        relative = sorted(os.path.relpath(f["path"], str(git_repository)).replace(os.sep, "/") for f in result["files"])
+        
+        assert relative == ["main.py", "src/app.py"]
+        assert result["subdirectories"] == 1
+        sizes = {f["name"]: f["size"] for f in result["files"]}
+        assert sizes["main.py"] == len("contenu de main.py")
+    
+    def test_scan_git_index_subdirectory_and_non_recursive(self, git_repository):
+        result = scan_git_index(str(git_repository / "src"), ScanFilter())
+        assert sorted(f["name"] for f in result["files"]) == ["app.py", "util.txt"]
+        
+        result = scan_git_index(str(git_repository), ScanFilter(), recursive=False)
+        assert [f["name"] for f in result["files"]] == ["main.py"]
+        
+        # Racine dans un dossier exclu : aucun fichier, comme avec scan_directory
+        scan_filter = ScanFilter([], [], ["src"])
+        assert scan_git_index(str(git_repository / "src"), scan_filter)["files"] == []
+        assert scan_directory(str(git_repository / "src"), scan_filter=scan_filter)["files"] == []
+    
+    def test_scan_git_index_reflects_working_tree(self, git_repository):
+        """Les fichiers modifiés ou supprimés après "git add" sont vus tels qu'ils sont sur disque"""
+        # Dates antérieures à l'index : aucune entrée n'est "racy"
+        old = time.time() - 3600
+        for relative in ["main.py", "src/app.py", "src/util.txt", "vendor/lib.py"]:
+            os.utime(git_repository / relative, (old, old))
+        subprocess.run(["git", "-C", str(git_repository), "add", "-A"], check=True)
+        
+        (git_repository / "main.py").write_text("contenu modifié et bien plus long")
+        os.utime(git_repository / "main.py", (old, old))
+        (git_repository / "src" / "app.py").unlink()
+        with open(git_repository / "src" / "util.txt", "wb") as f:
+            f.truncate(MAX_FILE_SIZE + 1)
+        
+        result = scan_git_index(str(git_repository), ScanFilter())
+        sizes = {os.path.relpath(f["path"], str(git_repository)).replace(os.sep, "/"): f["size"] for f in result["files"]}
+        assert sizes["main.py"] == len("contenu modifié et bien plus long".encode("utf-8"))
+        assert "src/app.py" not in sizes
+        # Devenu trop gros depuis l'index : écarté comme par scan_directory
+        assert "src/util.txt" not in sizes
+        assert result["errors"] == []
+        
+        result = scan_git_index(str(git_repository), ScanFilter(include_large_files=True))
+        excerpts = [f["excerpt"] for f in result["files"] if f["name"] == "util.txt"]
+        assert excerpts == [True]
+    
+    def test_scan_git_index_outside_repository(self, tmp_path):
+        assert scan_git_index(str(tmp_path), ScanFilter()) is None
+
+
+class TestScanCoordinator:
+    """Tests pour la coordination du scan de plusieurs racines"""
+    
+    def test_collapse_nested_roots(self, tmp_path):
+        for name in ("repo/src", "repo2", "repository"):
+            (tmp_path / name).mkdir(parents=True)
+        roots = [(str(tmp_path / name), str(tmp_path / name)) for name in ("repo/src", "repo", "repository", "repo", "repo2")]
+        
+        kept, collapsed = collapse_nested_roots(roots)
+        
+        # "repository" n'est pas dans "repo" malgré le préfixe commun
+        assert [os.path.basename(path) for _, path in kept] == ["repo", "repository", "repo2"]
+        assert len(collapsed) == 2
+        
+        # Sans récursion, seule la racine identique est absorbée
+        kept, collapsed = collapse_nested_roots(roots, recursive=False)
+        assert len(kept) == 4
+    
+    def test_scan_roots_counts_subdirectories_in_same_pass(self, tmp_path):
+        for relative in ("a/one.txt", "a/b/two.txt", "c/three.txt", "node_modules/x.js"):
+            target = tmp_path / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text("x")
+        
+        result = scan_roots([(str(tmp_path), str(tmp_path))], ScanFilter(exclude_directories=["node_modules"]))
+        
+        assert result["subdirectories"] == 3
+        assert len(result["files"]) == 3
+        assert all("identity" not in file_info for file_info in result["files"])
+    
+    def test_scan_progress_and_cancellation(self, tmp_path):
+        for relative in ("a/one.txt", "a/b/two.txt", "c/three.txt"):
+            target = tmp_path / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text("12345")
+        
+        progress = ScanProgress()
+        result = scan_roots([(str(tmp_path), str(tmp_path))], ScanFilter(), progress=progress)
+        
+        assert progress.snapshot()["directories"] == 4
+        assert progress.snapshot()["files"] == 3
+        assert progress.snapshot()["bytes"] == 15
+        assert len(progress.partial) == len(result["files"]) == 3
+        
+        # Annulé avant de commencer : aucun dossier n'est listé
+        cancelled = ScanProgress()
+        cancelled.cancel()
+        result = scan_directory(str(tmp_path), progress=cancelled)
+        assert result["files"] == []
+        assert cancelled.snapshot()["directories"] == 0
+
+
+class TestFileRecord:
+    """Tests pour les enregistrements compacts de fichiers"""
+    
+    def test_mapping_access_and_serialization(self):
+        record = FileRecord("/projet/src/", "main.py", 2048, "py")
+        
+        assert record["path"] == "/projet/src/main.py"
+        assert record["size_human"] == "2.0 Ko"
+        assert record["extension"] == "py"
+        assert record.get("excerpt") is None and "excerpt" not in record
+        assert record.to_dict() == {
+            "path": "/projet/src/main.py",
+            "name": "main.py",
+            "size": 2048,
+            "size_human": "2.0 Ko",
+            "extension": "py"
+        }
+        with pytest.raises(KeyError):
+            record["inconnu"]
+        
+        large = FileRecord.from_path("gros.log", MAX_FILE_SIZE + 1, "log", excerpt=True)
+        assert large["path"] == "gros.log"
+        assert records_to_dicts([large])[0]["excerpt"] is True
+        assert not hasattr(large, "__dict__")
+    
+    def test_scan_shares_directory_prefix(self, tmp_path):
+        for relative in ("a/one.txt", "a/two.txt", "b/three.md"):
+            target = tmp_path / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text("x")
+        
+        files = {f.name: f for f in scan_directory(str(tmp_path))["files"]}
+        
+        assert files["one.txt"].prefix is files["two.txt"].prefix
+        assert files["one.txt"].ext_code == files["two.txt"].ext_code != files["three.md"].ext_code
+        assert files["one.txt"]["path"] == str(tmp_path / "a" / "one.txt").replace("\\", "/")
+
+
+class TestResultStore:
+    """Tests pour la conservation des résultats de scan et la pagination par curseur"""
+    
+    def _result(self, count):
+        matches = [
+            {"path": f"/p/f{i:03d}.{'py' if i % 2 else 'txt'}", "name": f"f{i:03d}", "size": count - i, "size_human": "", "extension": "py" if i % 2 else "txt"}
+            for i in range(count)
+        ]
+        return {"matches": matches, "total_matches": count, "total_subdirectories": 0}
+    
+    def test_cursor_walks_the_whole_view(self):
+        store = ScanResultStore()
+        stored = store.get(store.put(self._result(25)))
+        
+        seen = []
+        cursor = None
+        while True:
+            page = get_page(stored, cursor=cursor, limit=10, sort="size")
+            seen.extend(match["size"] for match in page["matches"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == sorted(seen) and len(seen) == 25
+        
+        filters = normalize_filters(["PY"], None, 10, None)
+        page = get_page(stored, limit=100, sort="path", order="desc", filters=filters)
+        assert page["total"] == len([i for i in range(25) if i % 2 and 25 - i >= 10])
+        assert page["matches"][0]["path"] > page["matches"][-1]["path"]
+    
+    def test_cursor_bound_to_view(self):
+        store = ScanResultStore()
+        stored = store.get(store.put(self._result(5)))
+        cursor = get_page(stored, limit=2, sort="size")["next_cursor"]
+        
+        with pytest.raises(InvalidCursorError):
+            get_page(stored, cursor=cursor, limit=2, sort="path")
+        with pytest.raises(InvalidCursorError):
+            get_page(stored, cursor="pas-un-curseur", limit=2)
+    
+    def test_eviction_and_expiration(self):
+        store = ScanResultStore(max_entries=2, ttl=3600)
+        first = store.put(self._result(1))
+        second = store.put(self._result(1))
+        store.get(first)
+        store.put(self._result(1))
+        
+        # Le moins récemment consulté est évincé
+        assert store.get(second) is None
+        assert store.get(first) is not None
+        
+        store.ttl = 0
+        time.sleep(0.01)
+        assert store.get(first) is None
+    
+    def test_memory_bounded_eviction(self):
+        store = ScanResultStore(max_entries=100, ttl=3600, max_bytes=4_000)
+        first = store.put(self._result(10))
+        one_result = store.stats()["current_bytes"]
+        assert one_result > 1500
+        
+        second = store.put(self._result(10))
+        third = store.put(self._result(10))
+        
+        # Au plus deux résultats de cette taille tiennent dans 4 000 octets
+        assert store.get(first) is None
+        assert store.get(second) is not None and store.get(third) is not None
+        assert store.stats()["current_bytes"] == 2 * one_result
+        
+        # Un résultat plus gros que la limite est tout de même gardé s'il est le dernier
+        huge = store.put(self._result(100))
+        assert store.get(huge) is not None
+        assert store.stats()["entries"] == 1
+
+
+class TestTrigramIndex:
+    """Tests pour l'index de trigrammes"""
+    
+    def test_plan_extracts_required_trigrams(self):
+        assert build_plan("ab") is None
+        assert build_plan("Scan", ignore_case=True) == frozenset(content_trigrams("scan"))
+        assert build_plan(r"def \w+\(", regex=True) == frozenset(content_trigrams("def "))
+        # Alternative : une des branches suffit ; une branche sans littéral rend la requête non filtrable
+        kind, branches = build_plan(r"(Service|Store)_99", regex=True)[1][0]
+        assert kind == "or" and len(branches) == 2
+        assert build_plan(r"(foo|.)bar", regex=True) == frozenset(content_trigrams("bar"))
+        assert build_plan(r"x*abcd?", regex=True) == frozenset(content_trigrams("abc"))
+    
+    def test_incremental_update_and_search(self, tmp_path):
+        source = tmp_path / "src"
+        source.mkdir()
+        (source / "a.py").write_text("def charger_config():\n    return Config()\n")
+        (source / "b.py").write_text("from a import charger_config\n")
+        (source / "c.txt").write_text("rien à voir, Élan\n")
+        (source / "d.bin").write_bytes(b"\x00\x01charger_config")
+        index = TrigramIndex(tmp_path / "index.sqlite3")
+        
+        matches = scan_directory(str(source))["files"]
+        update = index.update(matches, read_workers=1)
+        assert update["indexed"] == 4
+        
+        found = index.search(matches, update["ids"], "charger_config")
+        assert sorted(os.path.basename(r["path"]) for r in found["results"]) == ["a.py", "b.py"]
+        assert found["candidates"] == 2
+        assert index.search(matches, update["ids"], "élan", ignore_case=True)["results"][0]["lines"][0]["line"] == 1
+        assert index.search(matches, update["ids"], r"return \w+\(\)$", regex=True)["candidates"] == 1
+        assert index.search(matches, update["ids"], "introuvable")["candidates"] == 0
+        
+        # Seul le fichier modifié est relu ; son ancien contenu n'est plus trouvé
+        (source / "b.py").write_text("print('autre chose')\n")
+        os.utime(source / "b.py", ns=(time.time_ns(), time.time_ns() + 10**9))
+        update = index.update(matches, read_workers=1)
+        assert (update["indexed"], update["unchanged"]) == (1, 3)
+        found = index.search(matches, update["ids"], "charger_config")
+        assert [os.path.basename(r["path"]) for r in found["results"]] == ["a.py"]
+        assert index.stats()["files"] == 4
+
+
+class TestContentMatch:
+    """Tests pour le filtre sur le contenu des fichiers"""
+    
+    def test_matches_across_windows_and_skips_binaries(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(content_match, "CHUNK_SIZE", 1024)
+        monkeypatch.setattr(content_match, "MAX_MATCH_SPAN", 256)
+        lines = [f"ligne {i}" for i in range(3000)]
+        lines[2000] = "def cible():"
+        lines[2001] = "    return 42"
+        (tmp_path / "grand.py").write_text("\n".join(lines))
+        (tmp_path / "binaire.so").write_bytes(b"\x7fELF" + b"def cible():" * 10)
+        (tmp_path / "utf16.txt").write_text("def cible():", encoding="utf-16")
+        (tmp_path / "accents.txt").write_text("résumé\n")
+        
+        matcher = ContentMatcher([r"^def cible\(\):\n\s+return"])
+        assert matcher.matches(str(tmp_path / "grand.py"))
+        assert ContentMatcher([r"^def cible\(\):\n    return"]).matches(str(tmp_path / "grand.py"))
+        assert not matcher.matches(str(tmp_path / "binaire.so"))
+        assert ContentMatcher([r"^ligne 1$"]).matches(str(tmp_path / "grand.py"))
+        assert not ContentMatcher([r"^igne"]).matches(str(tmp_path / "grand.py"))
+        assert ContentMatcher([r"cible"]).matches(str(tmp_path / "utf16.txt"))
+        assert ContentMatcher([r"[éè]sum"]).matches(str(tmp_path / "accents.txt"))
+        # \Z ne correspond qu'à la vraie fin du fichier, pas à celle d'une fenêtre
+        assert not ContentMatcher([r"ligne 1500\Z"]).matches(str(tmp_path / "grand.py"))
+        assert ContentMatcher([r"ligne 2999\Z"]).matches(str(tmp_path / "grand.py"))
+    
+    def test_same_result_as_decoded_text(self, tmp_path):
+        """Fins de ligne CRLF ou CR et contenu non ASCII : même réponse que sur read_file_content"""
+        (tmp_path / "crlf.txt").write_bytes(b"foo\r\nbar\r\n")
+        (tmp_path / "grand_crlf.txt").write_bytes(b"ligne\r\n" * 5000 + b"foo\r\nbar\r\n")
+        (tmp_path / "cr.txt").write_bytes(b"a\rb\rc")
+        (tmp_path / "utf8.txt").write_bytes("un café\n".encode("utf-8"))
+        (tmp_path / "latin1.txt").write_bytes("un cafés\n".encode("latin-1"))
+        
+        for name in ("crlf.txt", "grand_crlf.txt"):
+            path = str(tmp_path / name)
+            assert ContentMatcher([r"foo$"]).matches(path)
+            assert ContentMatcher([r"^foo\nbar$"]).matches(path)
+            assert not ContentMatcher([r"foo\r"]).matches(path)
+        assert ContentMatcher([r"^b$"]).matches(str(tmp_path / "cr.txt"))
+        for name in ("utf8.txt", "latin1.txt"):
+            path = str(tmp_path / name)
+            assert ContentMatcher([r"caf\w"]).matches(path)
+            assert ContentMatcher([r"\bcaf\w+$"]).matches(path)
+        assert ContentMatcher([r"caf.s"]).matches(str(tmp_path / "latin1.txt"))
+        assert not ContentMatcher([r"caf[a-z]"]).matches(str(tmp_path / "utf8.txt"))
+    
+    def test_filter_keeps_scan_order(self, tmp_path):
+        for index in range(12):
+            (tmp_path / f"f{index:02d}.txt").write_text("TODO\n" if index % 3 == 0 else "rien\n")
+        matches = sorted(scan_directory(str(tmp_path))["files"], key=lambda f: f["name"])
+        
+        kept = filter_by_content(matches, ContentMatcher(["TODO", "FIXME"]), max_workers=4)
+        assert [f["name"] for f in kept] == ["f00.txt", "f03.txt", "f06.txt", "f09.txt"]
+        
+        cancelled = ScanProgress()
+        cancelled.cancel()
+        assert filter_by_content(matches, ContentMatcher(["TODO"]), progress=cancelled) == []
+
+
+class TestArchives:
+    """Tests pour les archives zip/tar parcourues comme des dossiers"""
+    
+    @pytest.fixture(params=["sources.zip", "sources.tar.gz"])
+    def archive(self, tmp_path, request):
+        members = {
+            "src/main.py": b"def main():\r\n    return 1\r\n",
+            "src/pkg/mod.py": b"x = 1\n",
+            "src/node_modules/lib.js": b"ignore",
+            "src/debug.log": b"log",
+            "src/data.bin": b"\x00\x01binaire",
+            "../evasion.py": b"hors archive",
+        }
+        path = tmp_path / request.param
+        if request.param.endswith(".zip"):
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+                for name, data in members.items():
+                    archive.writestr(name, data)
+        else:
+            source = tmp_path / "source"
+            with tarfile.open(path, "w:gz") as archive:
+                for index, (name, data) in enumerate(members.items()):
+                    member_path = source / f"{index}"
+                    member_path.parent.mkdir(exist_ok=True)
+                    member_path.write_bytes(data)
+                    archive.add(member_path, arcname=name)
+        return str(path)
+    
+    def test_scan_applies_rules(self, archive):
+        scan_filter = ScanFilter(["log"], [], ["node_modules"])
+        result = scan_directory(archive, scan_filter=scan_filter)
+        
+        assert sorted(f["path"] for f in result["files"]) == [
+            f"{archive}/src/data.bin", f"{archive}/src/main.py", f"{archive}/src/pkg/mod.py"
+        ]
+        assert result["subdirectories"] == 2
+        assert result["errors"] == []
+        
+        # Dossier de l'archive comme racine, sans récursion
+        assert [f["name"] for f in scan_directory(f"{archive}/src", recursive=False, scan_filter=scan_filter)["files"]] == ["main.py", "data.bin"]
+    
+    def test_read_members_on_demand(self, archive):
+        with archive_session():
+            assert read_file_content(f"{archive}/src/main.py") == "def main():\n    return 1\n"
+            assert read_file_content(f"{archive}/src/data.bin").startswith("[Contenu binaire")
+            assert read_file_content(f"{archive}/src/absent.py").startswith("[Erreur")
+            assert ContentMatcher([r"^\s+return"]).matches(f"{archive}/src/main.py")
+            # Une seule ouverture de l'archive pour toute la session
+            assert len(archive_cache._handles) == 1
+        assert archive_cache._handles == {}
+        
+        # Hors session, l'archive est ouverte à chaque lecture
+        assert read_file_content(f"{archive}/src/pkg/mod.py") == "x = 1\n"
+        assert stat_path(f"{archive}/src/pkg/mod.py").st_size == 6
+        assert split_archive_path(f"{archive}/src/pkg/mod.py") == (archive, "src/pkg/mod.py")
+        assert split_archive_path(os.path.dirname(archive) + "/autre.zip/a.py") is None
+    
+    def test_handles_closed_during_overlapping_sessions(self, archive, tmp_path, monkeypatch):
+        """Une session qui ne se termine pas ne garde ni archive périmée ni archive en trop"""
+        closed = []
+        original_close = archives._ArchiveHandle.close
+        monkeypatch.setattr(archives._ArchiveHandle, "close", lambda handle: closed.append(handle) or original_close(handle))
+        monkeypatch.setattr(archives, "HANDLE_CACHE_SIZE", 1)
+        other = tmp_path / "autre.zip"
+        with zipfile.ZipFile(other, "w") as zip_file:
+            zip_file.writestr("a.py", "a = 1\n")
+        
+        with archive_session():
+            assert read_file_content(f"{archive}/src/pkg/mod.py") == "x = 1\n"
+            first = next(iter(archive_cache._handles.values()))
+            
+            # Archive modifiée sur disque : l'ancienne version est fermée à l'accès suivant
+            stat_before = os.stat(archive)
+            os.utime(archive, ns=(stat_before.st_atime_ns, stat_before.st_mtime_ns + 10**9))
+            assert read_file_content(f"{archive}/src/pkg/mod.py") == "x = 1\n"
+            assert first in closed
+            assert len(archive_cache._handles) == 1
+            
+            # Au-delà de HANDLE_CACHE_SIZE, l'archive la moins récente inutilisée est fermée
+            with open_path(f"{other}/a.py") as reader:
+                assert reader.read() == b"a = 1\n"
+                assert [key[0] for key in archive_cache._handles] == [str(other)]
+            assert len(closed) == 2
+        assert archive_cache._handles == {}
+    
+    def test_compressed_tar_read_in_stream_order(self, tmp_path):
+        """Les membres d'un tar.gz lus dans le désordre sont servis sans revenir en arrière dans le flux"""
+        path = tmp_path / "sources.tar.gz"
+        source = tmp_path / "source"
+        source.mkdir()
+        with tarfile.open(path, "w:gz") as tar:
+            for index in range(20):
+                member = source / f"m{index:02d}.txt"
+                member.write_text(f"membre {index}\n")
+                tar.add(member, arcname=member.name)
+        
+        with archive_session():
+            assert read_file_content(f"{path}/m19.txt") == "membre 19\n"
+            handle = next(iter(archive_cache._handles.values()))
+            # Les membres dépassés sont gardés pour les lecteurs en retard
+            assert len(handle._ahead) == 19
+            for index in reversed(range(19)):
+                assert read_file_content(f"{path}/m{index:02d}.txt") == f"membre {index}\n"
+            assert handle._ahead == {} and handle._ahead_bytes == 0
+    
+    def test_archive_root_not_absorbed_by_parent_directory(self, archive):
+        parent = os.path.dirname(archive)
+        roots = [(parent, parent), (archive, archive), (f"{archive}/src", f"{archive}/src")]
+        kept, collapsed = collapse_nested_roots(roots)
+        assert kept == roots[:2]
+        assert collapsed == roots[2:]
+
+
+class TestCompaction:
+    """Tests pour le compactage du contenu avant formatage"""
+    
+    SOURCE = (
+        '"""Module."""\n'
+        "import os  # système\n"
+        "\n"
+        "\n"
+        "TABLE = [\n" + "".join(f"    {i},\n" for i in range(30)) + "]\n"
+        "\n"
+        "class Outil:\n"
+        '    """Outil de test.\n'
+        "\n"
+        '    Détails."""\n'
+        "    nom = 'outil'\n"
+        "\n"
+        "    def lancer(self, n: int = 1) -> str:\n"
+        '        """Lance l\'outil."""\n'
+        "        # commentaire\n"
+        "        texte = \"\"\"a  # pas un commentaire\n"
+        "\n"
+        "b\"\"\"\n"
+        "        return texte * n\n"
+        "\n"
+        "def vide():\n"
+        '    """Seulement une docstring."""\n'
+    )
+    
+    def test_strip_python(self):
+        result = compact_content(self.SOURCE, "strip", "py")
+        
+        assert "Module." not in result and "Détails" not in result and "# commentaire" not in result
+        assert "# système" not in result and "import os\n" in result
+        # Contenu des chaînes sur plusieurs lignes intact, corps des longs littéraux abrégés
+        assert "texte = \"\"\"a  # pas un commentaire\n\nb\"\"\"" in result
+        assert "TABLE = [\n    0,\n    1,\n    ...,  # 28 éléments omis\n]" in result
+        assert "def vide():\n    ..." in result
+        compile(result, "strip.py", "exec")
+    
+    def test_strip_keeps_multiline_fstring_value(self):
+        """Lignes vides et espaces de fin d'une f-string sur plusieurs lignes conservés"""
+        source = 'n = 2\nmessage = f"""debut {n}  \n\n   {f"{n}"}   \n\nfin"""  # commentaire\n\n\nautre = 1\n'
+        result = compact_content(source, "strip", "py")
+        
+        before, after = {}, {}
+        exec(source, before)
+        exec(result, after)
+        assert after["message"] == before["message"]
+        assert "# commentaire" not in result and "\n\n\nautre" not in result
+    
+    def test_skeleton_and_generic_modes(self):
+        skeleton = compact_content(self.SOURCE, "skeleton", "py")
+        assert "def lancer(self, n: int=1) -> str:\n        \"\"\"Lance l'outil.\"\"\"\n        ..." in skeleton
+        assert "nom = 'outil'" in skeleton and "return texte" not in skeleton
+        assert '"""Outil de test."""' in skeleton
+        compile(skeleton, "skeleton.py", "exec")
+        
+        # Autres langages (et Python invalide) : compactage des espaces seulement
+        text = "a:  \n\n\n  b: 1   \n\n"
+        assert compact_content(text, "strip", "yaml") == "a:\n\n  b: 1"
+        assert compact_content("def (:\n\n\n", "skeleton", "py") == "def (:"
+        assert compact_content(text, "none", "yaml") == text
+    
+    def test_cached_per_file_and_mode(self):
+        compaction_cache.clear()
+        first = compact_file_content("/projet/a.py", self.SOURCE, "strip", "py")
+        assert compact_file_content("/projet/a.py", self.SOURCE, "strip", "py") == first
+        compact_file_content("/projet/a.py", self.SOURCE, "skeleton", "py")
+        assert compaction_cache.stats()["hits"] == 1
+        assert compaction_cache.stats()["entries"] == 2
+        
+        # Nouveau contenu pour le même fichier : l'entrée est remplacée
+        assert compact_file_content("/projet/a.py", "x = 1  # c\n", "strip", "py") == "x = 1"
+        assert compaction_cache.stats()["entries"] == 2
+
+
+class TestBudget:
+    """Tests pour la sélection des fichiers dans un budget"""
+    
+    def _match(self, path, size, extension):
+        return {"path": path, "name": os.path.basename(path), "size": size, "size_human": "", "extension": extension}
+    
+    def test_select_smallest_first_keeps_scan_order(self):
+        matches = [self._match("/a.txt", 500, "txt"), self._match("/b.py", 50, "py"), self._match("/c.md", 100, "md")]
+        budget = estimate_block_size(matches[1]) + estimate_block_size(matches[2])
+        
+        selected, omitted = select_within_budget(matches, budget)
+        
+        assert [match["path"] for match in selected] == ["/b.py", "/c.md"]
+        assert omitted == [{"path": "/a.txt", "size": 500, "reason": "budget"}]
+    
+    def test_priority_extensions_come_first(self):
+        matches = [self._match("/a.txt", 10, "txt"), self._match("/b.py", 400, "py")]
+        
+        selected, omitted = select_within_budget(matches, estimate_block_size(matches[1]), priority_extensions=[".PY"])
+        
+        assert [match["path"] for match in selected] == ["/b.py"]
+        assert [entry["path"] for entry in omitted] == ["/a.txt"]
+
+
+class TestExcerpt:
+    """Tests pour l'extrait (début et fin) des fichiers trop volumineux"""
+    
+    def test_read_file_excerpt(self, tmp_path):
+        target = tmp_path / "big.log"
+        with open(target, "w", encoding="utf-8") as f:
+            for i in range(20000):
+                f.write(f"ligne {i} é\n")
+        
+        excerpt = read_file_excerpt(str(target), 1024)
+        
+        first_line, rest = excerpt.split("\n", 1)
+        assert first_line.startswith("[Extrait - Taille: ")
+        estimated = int(re.search(r"environ (\d+) lignes ;", first_line).group(1))
+        assert 15000 < estimated < 25000
+        assert rest.startswith("ligne 0 é\nligne 1 é\n")
+        assert excerpt.rstrip("\n").endswith("ligne 19999 é")
+        assert "lignes omises ...]" in excerpt
+        assert len(excerpt.encode("utf-8")) < 2 * 1024 + 300
+    
+    def test_large_files_kept_in_excerpt_mode(self, tmp_path, monkeypatch):
+        import app.utils.file_utils as file_utils
+        monkeypatch.setattr(file_utils, "MAX_FILE_SIZE", 100)
+        (tmp_path / "small.txt").write_text("petit")
+        (tmp_path / "big.csv").write_text("a,b\n" * 1000)
+        
+        assert [f["name"] for f in scan_directory(str(tmp_path))["files"]] == ["small.txt"]
+        
+        files = scan_directory(str(tmp_path), scan_filter=ScanFilter(include_large_files=True))["files"]
+        big = [f for f in files if f["name"] == "big.csv"][0]
+        assert big["excerpt"] is True
+        
+        path = str(tmp_path / "big.csv")
+        assert read_file_content(path).startswith("[Erreur de valeur")
+        assert read_file_content(path, excerpt_bytes=1024).startswith("[Extrait")
+
+
+class TestPrefetcher:
+    """Tests pour le préchargement du cache"""
+    
+    def test_new_selection_cancels_previous(self):
+        started = threading.Event()
+        release = threading.Event()
+        read_paths = []
+        
+        def slow_read(path):
+            read_paths.append(path)
+            started.set()
+            release.wait(5)
+            return ""
+        
+        prefetcher = Prefetcher()
+        prefetcher.start([{"path": f"/a{i}", "size": 1} for i in range(100)], read_func=slow_read, max_bytes=1000)
+        started.wait(5)
+        prefetcher.start([{"path": "/b", "size": 1}], read_func=read_paths.append, max_bytes=1000)
+        release.set()
+        prefetcher.join(5)
+        time.sleep(0.05)
+        
+        # Le premier préchargement s'arrête après le fichier en cours
+        assert len([path for path in read_paths if path.startswith("/a")]) <= 2
+        assert "/b" in read_paths
+        assert prefetcher.stats()["status"] == "terminé"
+    
+    def test_memory_cap(self):
+        read_paths = []
+        matches = [{"path": "/big", "size": 800}, {"path": "/medium", "size": 300}, {"path": "/small", "size": 100}]
+        sizes = {match["path"]: match["size"] for match in matches}
+        
+        def read(path):
+            read_paths.append(path)
+            return "x" * sizes[path]
+        
+        prefetcher = Prefetcher()
+        prefetcher.start(matches, read_func=read, max_bytes=1000)
+        prefetcher.join(5)
+        
+        assert read_paths == ["/big", "/small"]
+        assert prefetcher.stats()["skipped"] == 1
+        assert prefetcher.stats()["bytes"] == sys.getsizeof("x" * 800) + sys.getsizeof("x" * 100)
+    
+    def test_memory_cap_counts_cached_text(self):
+        """Le plafond porte sur le texte mis en cache, pas sur la taille disque"""
+        read_paths = []
+        
+        def read(path):
+            read_paths.append(path)
+            if path == "/error":
+                return "[Erreur de lecture]"
+            # Texte décodé deux fois plus gros que le fichier
+            return "€" * 300
+        
+        prefetcher = Prefetcher()
+        matches = [{"path": "/error", "size": 300}] + [{"path": f"/{name}", "size": 300} for name in "abc"]
+        prefetcher.start(matches, read_func=read, max_bytes=1000)
+        prefetcher.join(5)
+        
+        assert read_paths == ["/error", "/a"]
+        stats = prefetcher.stats()
+        assert stats["files"] == 1 and stats["skipped"] == 3
+        assert stats["bytes"] == sys.getsizeof("€" * 300) <= 1000
+        
+        # Un extrait est compté après lecture, quelle que soit la taille du fichier
+        prefetcher.start([{"path": "/huge", "size": 10 ** 9, "excerpt": True}], read_func=lambda path: "x" * 100, max_bytes=1000)
+        prefetcher.join(5)
+        assert prefetcher.stats()["files"] == 1
+        assert prefetcher.stats()["bytes"] == sys.getsizeof("x" * 100)
+
+
+class TestArtifacts:
+    """Tests pour les sorties écrites sur disque"""
+    
+    def test_writer_and_expiration(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(artifacts, "ARTIFACT_DIR", tmp_path)
+        
+        with artifacts.ArtifactWriter() as writer:
+            writer.write("=== a ===\n\nété\n\n---\n\n")
+        assert artifacts.get_artifact_path(writer.artifact_id).read_text(encoding="utf-8").startswith("=== a ===")
+        assert writer.size == len("=== a ===\n\nété\n\n---\n\n".encode("utf-8"))
+        
+        # Une écriture interrompue ne laisse rien derrière elle
+        with pytest.raises(RuntimeError):
+            with artifacts.ArtifactWriter() as failed:
+                failed.write("partiel")
+                raise RuntimeError("interrompu")
+        assert artifacts.get_artifact_path(failed.artifact_id) is None
+        assert len(list(tmp_path.iterdir())) == 1
+        
+        assert artifacts.collect_expired_artifacts(ttl=3600) == 0
+        old = time.time() - 7200
+        os.utime(writer.path, (old, old))
+        assert artifacts.collect_expired_artifacts(ttl=3600) == 1
+        assert artifacts.get_artifact_path(writer.artifact_id) is None